@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     
     'rest_framework',
@@ -49,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -92,13 +94,72 @@ DATABASES = {
 }
 """
 
+# Connections persist for DB_CONN_MAX_AGE seconds and are pinged before
+# reuse once idle for CONN_HEALTH_CHECK_INTERVAL seconds. Set DB_POOL=1 to
+# share a pool of up to DB_POOL_MAX connections between the threads of each
+# process instead, keeping DB_POOL_MIN of them when pruning idle ones; a
+# connection then returns to the pool at the end of every request, and
+# requests wait up to DB_POOL_TIMEOUT seconds for a free one. See
+# core/backends/postgresql/base.py.
+
+DB_POOL = os.environ.get('DB_POOL') == '1'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECK_INTERVAL': int(
+            os.environ.get('DB_HEALTH_CHECK_INTERVAL', 30)
+        ),
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN', 2)),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX', 10)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+            'MAX_IDLE': int(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+        } if DB_POOL else None,
+    }
+}
+
+# Safe requests to the recipe and user APIs read from the DATABASE_REPLICAS
+# aliases, picked at random per request. Set DB_REPLICA_HOST (and, if they
+# differ, DB_REPLICA_NAME/USER/PASS) to enable the 'replica' alias; without
+# it the alias points at the primary and is not used. Tests treat it as a
+# mirror of the default database. Users who wrote read from the primary for
+# REPLICA_PIN_SECONDS afterwards; REPLICA_PIN_CACHE must be shared between
+# workers for this to hold across them.
+
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'HOST': os.environ.get('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+    'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+    'USER': os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+    'PASSWORD': os.environ.get(
+        'DB_REPLICA_PASS',
+        DATABASES['default']['PASSWORD'],
+    ),
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_REPLICAS = ['replica'] if os.environ.get('DB_REPLICA_HOST') else []
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+REPLICA_PIN_CACHE = os.environ.get('REPLICA_PIN_CACHE', 'default')
+
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# The local-memory backend is per process; point CACHE_LOCATION at a shared
+# backend (e.g. memcached or a file path) when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
@@ -144,6 +205,47 @@ MEDIA_URL = '/static/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# Raw image uploads still carry their metadata (EXIF, GPS), so they are
+# stored under PRIVATE_MEDIA_ROOT, outside MEDIA_ROOT, where neither the
+# media view nor a proxy serving MEDIA_URL can reach them. Only their
+# re-encoded variants are written to MEDIA_ROOT.
+
+PRIVATE_MEDIA_ROOT = '/vol/web/private'
+
+# How recipe images and other media are served. 'django' streams files
+# with FileResponse (sendfile under gunicorn/uWSGI), 'x-accel-redirect'
+# hands the transfer to nginx through MEDIA_ACCEL_REDIRECT_PREFIX, an
+# internal location aliased to MEDIA_ROOT, and 'x-sendfile' to Apache or
+# lighttpd. Unset, Django serves no media and MEDIA_URL is left to the
+# front proxy. Only paths matching MEDIA_SERVE_PATTERNS, the generated
+# image variants, are served; anything else under MEDIA_ROOT is a 404.
+
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', '')
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 3600
+MEDIA_SERVE_PATTERNS = [
+    r'^uploads/recipe/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}/'
+    r'\w+-[0-9a-f]{12}\.\w+$',
+]
+
+# Files under these prefixes never change: image variants are named by
+# their source's content and their size and encoding settings.
+MEDIA_IMMUTABLE_PREFIXES = ['uploads/recipe/']
+
+# Serve recipe, tag and ingredient reads as async views running the ORM
+# in a pool of ASYNC_DB_WORKERS threads. app/asgi.py turns this on; keep
+# the workers below the database connections available to each process so
+# writes and the image workers still get one. With DB_POOL on they default
+# to half the pool. Requests beyond ASYNC_DB_MAX_WAITING queued ones get a
+# 503 with Retry-After.
+
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS') == '1'
+ASYNC_DB_WORKERS = int(os.environ.get(
+    'ASYNC_DB_WORKERS',
+    max(1, DATABASES['default']['POOL']['MAX_SIZE'] // 2) if DB_POOL else 10,
+))
+ASYNC_DB_MAX_WAITING = int(os.environ.get('ASYNC_DB_MAX_WAITING', 100))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -153,8 +255,98 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.UserBucketThrottle',
+        'core.throttling.IPBucketThrottle',
+        'core.throttling.EndpointBucketThrottle',
+    ],
+    # Client IPs for throttling come from REMOTE_ADDR, unless NUM_PROXIES
+    # trusted proxies in front of the app append to X-Forwarded-For.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
 }
 
+# Throttling
+# Token buckets per authenticated user, per client IP and per endpoint
+# class (a view's throttle_scope), each a refill rate and a burst. Remove a
+# scope to stop throttling it. Buckets live in the THROTTLE_CACHE alias,
+# which must be shared by all workers for the limits to be global.
+
+THROTTLE_CACHE = os.environ.get('THROTTLE_CACHE', 'default')
+THROTTLE_BUCKETS = {
+    'user': {'rate': '20/s', 'burst': 100},
+    'ip': {'rate': '50/s', 'burst': 200},
+    # Logins and sign ups hash a password, which costs a CPU for ~0.1s.
+    'auth': {'rate': '10/m', 'burst': 20},
+    'recipe-write': {'rate': '5/s', 'burst': 30},
+}
+
+# Request metrics
+# Every request is timed into per-endpoint histograms served on /metrics.
+# A METRICS_SAMPLE_RATE share of requests also records its query count and
+# SQL, auth and serialization time, sent back in a Server-Timing header
+# when METRICS_SERVER_TIMING is on. Metrics are per process. /metrics
+# requires "Authorization: Bearer <METRICS_TOKEN>", and without a token is
+# only served when DEBUG is on.
+
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 1.0))
+METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', '1') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Token authentication cache
+# Tokens are cached in-process for TOKEN_AUTH_CACHE_TTL seconds and, when
+# TOKEN_AUTH_SHARED_CACHE names an alias in CACHES, shared across workers.
+
+TOKEN_AUTH_CACHE_SIZE = 10000
+TOKEN_AUTH_CACHE_TTL = 5
+TOKEN_AUTH_SHARED_CACHE = os.environ.get('TOKEN_AUTH_SHARED_CACHE')
+TOKEN_AUTH_SHARED_CACHE_TTL = 300
+
+# Signed access tokens
+# POST /api/user/token/signed/ issues a short-lived access token, verified
+# by signature alone, and a single-use refresh token. They are enabled by
+# SIGNED_TOKEN_KEYS, comma separated "<key id>:<secret>" pairs. The first key
+# signs; all of them verify, so rotate by prepending a new key and remove
+# the old one after SIGNED_TOKEN_REFRESH_TTL seconds.
+
+SIGNED_TOKEN_KEYS = [
+    tuple(pair.split(':', 1))
+    for pair in os.environ.get('SIGNED_TOKEN_KEYS', '').split(',')
+    if pair
+]
+SIGNED_TOKEN_ACCESS_TTL = int(os.environ.get('SIGNED_TOKEN_ACCESS_TTL', 300))
+SIGNED_TOKEN_REFRESH_TTL = int(
+    os.environ.get('SIGNED_TOKEN_REFRESH_TTL', 14 * 24 * 3600)
+)
+SIGNED_TOKEN_REVOCATION_REFRESH = 5
+
+# Per-user versioned response cache for recipe, tag and ingredient lists.
+# Set RECIPE_RESPONSE_CACHE to None to disable it.
+
+RECIPE_RESPONSE_CACHE = 'default'
+RECIPE_RESPONSE_CACHE_TTL = 300
+RECIPE_AUTOCOMPLETE_CACHE_TTL = 30
+
+# Uploaded recipe images are re-encoded in a background thread pool.
+# Set RECIPE_IMAGE_WORKERS to 0 to process them inline after commit. The API
+# links only to the re-encoded variants; "original" is the upload without
+# metadata, capped at RECIPE_IMAGE_ORIGINAL_SIZE pixels on its longest edge.
+
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+RECIPE_IMAGE_FORMAT = 'WEBP'
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_VARIANTS = {'large': 1600, 'medium': 800, 'small': 320}
+RECIPE_IMAGE_ORIGINAL_SIZE = 4096
+
+# Limits checked while an image upload streams in and from its header.
+
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 40_000_000
+RECIPE_IMAGE_FORMATS = ['JPEG', 'PNG', 'WEBP']
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
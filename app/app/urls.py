@@ -17,12 +17,19 @@ from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularSwaggerView
 )
+import re
+
+
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, re_path, include
 from django.conf import settings
 
 
+from core.views import metrics, serve_media
+
+
+media_prefix = re.escape(settings.MEDIA_URL.lstrip('/'))
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
@@ -33,11 +40,9 @@ urlpatterns = [
 
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
-]
 
+    path('metrics', metrics, name='metrics'),
 
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_ROOT,
-        document_root=settings.MEDIA_ROOT,
-    )
+    # serve_media answers 404 unless MEDIA_SERVE_MODE is set.
+    re_path(rf'^{media_prefix}(?P<path>.*)$', serve_media, name='media'),
+]
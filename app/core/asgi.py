@@ -0,0 +1,65 @@
+"""
+ASGI handler that streams responses without blocking the event loop.
+"""
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """
+    ASGI handler producing streaming response chunks in a sync thread.
+
+    Django 3.2 iterates streaming responses on the event loop, so a
+    generator that queries the database, such as the recipe export, fails
+    with SynchronousOnlyOperation. Here every chunk is pulled through
+    sync_to_async instead, in the same thread that later closes the
+    response, so server-side cursors stay on one connection.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': self._headers(response),
+        })
+        # Access `__iter__` and not `streaming_content` directly in case it
+        # has been overridden in a subclass.
+        parts = iter(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        while True:
+            part = await next_part(parts, None)
+            if part is None:
+                break
+            for chunk, _ in self.chunk_bytes(part):
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+    @staticmethod
+    def _headers(response):
+        """Return the response headers and cookies as ASGI header pairs."""
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            value = cookie.output(header='').encode('ascii').strip()
+            headers.append((b'Set-Cookie', value))
+        return headers
+
+
+def get_asgi_application():
+    """Set up Django and return the project's ASGI application."""
+    django.setup(set_prefix=False)
+    return ASGIHandler()
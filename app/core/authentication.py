@@ -0,0 +1,146 @@
+"""
+Authentication classes for the API.
+"""
+import hashlib
+
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    BaseAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+
+
+from core import metrics, tokens
+from core.cache import LocalTTLCache
+
+
+local_token_cache = LocalTTLCache(
+    maxsize=getattr(settings, 'TOKEN_AUTH_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 5),
+)
+
+
+def _shared_cache():
+    """Return the configured shared token cache, or None if disabled."""
+    alias = getattr(settings, 'TOKEN_AUTH_SHARED_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _shared_key(key):
+    """Return the shared cache key for a token without exposing it."""
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'auth:token:{digest}'
+
+
+def invalidate_token(key):
+    """Drop a cached token-to-user resolution."""
+    local_token_cache.delete(key)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(_shared_key(key))
+
+
+def _cached_fields(user):
+    """Return the user's field values worth caching, without secrets."""
+    return {
+        field.attname: getattr(user, field.attname)
+        for field in user._meta.concrete_fields
+        if field.name != 'password'
+    }
+
+
+def _cached_user(fields):
+    """Return a new user built from cached field values.
+
+    The password is deferred and loads on first access; save() writes back
+    only the loaded fields.
+    """
+    return get_user_model().from_db(
+        'default', list(fields), list(fields.values()),
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that caches token-to-user lookups.
+
+    Lookups are kept in an in-process LRU and, when TOKEN_AUTH_SHARED_CACHE
+    names a cache alias, in that shared cache as well. Only the user's field
+    values are cached, without the password hash, and every request gets
+    its own user instance. Entries are dropped when a token is deleted or
+    its user is saved (deactivated, password changed, ...). Other processes
+    only see the local drop once their own entry expires, so
+    TOKEN_AUTH_CACHE_TTL bounds cross-process staleness.
+    """
+
+    def authenticate(self, request):
+        with metrics.timed('auth'):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        fields = local_token_cache.get(key)
+
+        if fields is None:
+            shared = _shared_cache()
+            if shared is not None:
+                fields = shared.get(_shared_key(key))
+                if fields is not None:
+                    local_token_cache.set(key, fields)
+
+        if fields is not None:
+            user = _cached_user(fields)
+            return (user, self.get_model()(key=key, user=user))
+
+        user, token = super().authenticate_credentials(key)
+        fields = _cached_fields(user)
+        local_token_cache.set(key, fields)
+        shared = _shared_cache()
+        if shared is not None:
+            shared.set(
+                _shared_key(key),
+                fields,
+                getattr(settings, 'TOKEN_AUTH_SHARED_CACHE_TTL', 300),
+            )
+
+        return (user, token)
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Authentication with "Authorization: Bearer <access token>".
+
+    Access tokens are verified by their signature alone, so a deactivated
+    user keeps access until the token expires, within
+    SIGNED_TOKEN_ACCESS_TTL. Revoked tokens are rejected once the
+    revocation list is reloaded, within SIGNED_TOKEN_REVOCATION_REFRESH.
+    """
+
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if not tokens.enabled():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(
+                'Invalid token header. Credentials must be one token.'
+            )
+
+        with metrics.timed('auth'):
+            try:
+                claims = tokens.unsign(auth[1].decode(), tokens.ACCESS)
+            except (tokens.InvalidToken, UnicodeError) as exc:
+                raise exceptions.AuthenticationFailed(str(exc))
+            if claims['jti'] in tokens.revocations:
+                raise exceptions.AuthenticationFailed('Token revoked.')
+            return (tokens.user_from_claims(claims), claims)
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,137 @@
+"""
+PostgreSQL backend with connection health checks and optional pooling.
+
+Besides the settings of django.db.backends.postgresql it reads:
+
+* CONN_HEALTH_CHECK_INTERVAL: seconds a persistent connection may sit
+  unused before it is pinged at the start of the next request (and before
+  a pooled connection is handed out again). 0 checks every time.
+* POOL: None to open a connection per thread as Django does, or a dict
+  with MIN_SIZE (idle connections kept when pruning), MAX_SIZE, TIMEOUT
+  (seconds to wait for a free connection) and MAX_IDLE (seconds before
+  surplus idle connections are closed) to share a process-wide pool
+  between threads. Pooled connections go back to the pool at the end of
+  every request, whatever CONN_MAX_AGE says, so idle threads never hold
+  one.
+
+Connections are bound to the process that opened them; one inherited
+across fork() is dropped without being closed and replaced on next use.
+"""
+import os
+import time
+
+
+from django.db.backends.postgresql import base
+
+
+from core.backends.postgresql import pool as pools
+from core.backends.postgresql.creation import DatabaseCreation
+
+
+DEFAULT_HEALTH_CHECK_INTERVAL = 30
+POOL_DEFAULTS = {
+    'MIN_SIZE': 0,
+    'MAX_SIZE': 10,
+    'TIMEOUT': 5,
+    'MAX_IDLE': 300,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connection_pid = None
+        self.health_checked_at = None
+
+    @property
+    def health_check_interval(self):
+        return self.settings_dict.get(
+            'CONN_HEALTH_CHECK_INTERVAL', DEFAULT_HEALTH_CHECK_INTERVAL,
+        )
+
+    @property
+    def pool_options(self):
+        options = self.settings_dict.get('POOL')
+        if not options:
+            return None
+        return {**POOL_DEFAULTS, **options}
+
+    def get_pool(self, conn_params=None):
+        """Return the pool of this alias, or None when pooling is off."""
+        options = self.pool_options
+        if options is None:
+            return None
+        if conn_params is None:
+            conn_params = self.get_connection_params()
+
+        def factory():
+            return pools.ConnectionPool(
+                lambda: super(DatabaseWrapper, self).get_new_connection(
+                    conn_params,
+                ),
+                min_size=options['MIN_SIZE'],
+                max_size=options['MAX_SIZE'],
+                timeout=options['TIMEOUT'],
+                max_idle=options['MAX_IDLE'],
+                health_check_interval=self.health_check_interval,
+            )
+
+        return pools.get_pool(self.alias, conn_params, factory)
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool(conn_params)
+        if pool is None:
+            connection = super().get_new_connection(conn_params)
+        else:
+            connection = pool.getconn()
+            # The isolation level is read from the connection on connect.
+            self.isolation_level = connection.isolation_level
+        self.connection_pid = os.getpid()
+        self.health_checked_at = time.monotonic()
+        return connection
+
+    def connect(self):
+        super().connect()
+        if self.pool_options is not None:
+            # Act as CONN_MAX_AGE = 0: the end of the request returns the
+            # connection to the pool instead of the thread holding on to it.
+            self.close_at = time.monotonic()
+
+    def _forget_inherited_connection(self):
+        """Drop a connection opened by the parent of a forked process."""
+        if self.connection is not None \
+                and self.connection_pid != os.getpid():
+            pools.inherit(self.connection)
+            self.connection = None
+
+    def ensure_connection(self):
+        self._forget_inherited_connection()
+        super().ensure_connection()
+
+    def _close(self):
+        self._forget_inherited_connection()
+        if self.connection is None:
+            return
+        pool = self.get_pool()
+        if pool is None:
+            return super()._close()
+        # Closing inside an atomic block leaves the wrapper holding the
+        # connection, so it must not go back to other threads.
+        discard = self.errors_occurred or self.in_atomic_block
+        with self.wrap_database_errors:
+            pool.putconn(self.connection, discard=discard)
+
+    def close_if_unusable_or_obsolete(self):
+        self._forget_inherited_connection()
+        super().close_if_unusable_or_obsolete()
+        if self.connection is None or self.in_atomic_block:
+            return
+
+        now = time.monotonic()
+        if now - self.health_checked_at >= self.health_check_interval:
+            if not self.is_usable():
+                self.close()
+                return
+        self.health_checked_at = now
@@ -0,0 +1,23 @@
+"""
+Test database creation for the PostgreSQL backend.
+"""
+from django.db.backends.postgresql import creation
+
+
+from core.backends.postgresql import pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections, and persistent ones left open by worker
+        # threads (async reads, image processing), would keep the database
+        # from being dropped.
+        pool.close_pool(self.connection.alias)
+        with self._nodb_cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_terminate_backend(pid) FROM pg_stat_activity '
+                'WHERE datname = %s AND pid <> pg_backend_pid()',
+                [test_database_name],
+            )
+        super()._destroy_test_db(test_database_name, verbosity)
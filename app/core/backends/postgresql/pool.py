@@ -0,0 +1,259 @@
+"""
+In-process pool of psycopg2 connections.
+"""
+import logging
+import os
+import threading
+import time
+
+
+import psycopg2
+from psycopg2 import extensions
+
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No connection became available within the pool timeout."""
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of psycopg2 connections.
+
+    Connections are opened on demand and handed out most recently used
+    first, so surplus ones age out past max_idle and are closed down to
+    min_size. min_size is only that floor; no connections are opened
+    ahead of use. A connection idle for longer than health_check_interval
+    is pinged before reuse.
+    When max_size connections are checked out, getconn() waits up to
+    timeout seconds for one to be returned.
+    """
+
+    def __init__(self, connect, min_size=0, max_size=10, timeout=5.0,
+                 max_idle=300.0, health_check_interval=30.0):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError('Pool sizes must satisfy 0 <= min <= max >= 1.')
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self._reset()
+
+    def _reset(self):
+        self._cond = threading.Condition()
+        # (connection, monotonic time it was returned), newest last.
+        self._idle = []
+        self._size = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        self.health_check_failures = 0
+
+    def after_fork(self):
+        """Forget connections inherited from the parent process.
+
+        The sockets are shared with the parent, so they must neither be
+        used nor closed here: closing would send a terminate message on
+        the parent's session. They are kept referenced for the lifetime of
+        the child instead of being garbage collected.
+        """
+        for conn, _ in self._idle:
+            inherit(conn)
+        self._reset()
+
+    def getconn(self):
+        """Check a connection out, waiting for one when the pool is full."""
+        start = time.monotonic()
+        while True:
+            conn, stale = self._checkout(start)
+            if conn is None:
+                break
+            # Ping outside the lock so other threads are not held up.
+            if not stale or self._ping(conn):
+                return conn
+            with self._cond:
+                self.health_check_failures += 1
+                self._discard(conn)
+                self._cond.notify()
+
+        try:
+            return self.connect()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _checkout(self, start):
+        """Take an idle connection or a slot for a new one.
+
+        Returns (connection, whether it needs a ping), or (None, False)
+        when the caller is to open a connection in the reserved slot.
+        """
+        waited = False
+        with self._cond:
+            while True:
+                item = self._pop_idle()
+                if item is not None:
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    item = (None, False)
+                    break
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f'No connection available after {self.timeout}s '
+                        f'({self.max_size} in use).'
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            if waited:
+                elapsed = time.monotonic() - start
+                self.waits += 1
+                self.wait_seconds += elapsed
+                self.max_wait_seconds = max(self.max_wait_seconds, elapsed)
+        return item
+
+    def _pop_idle(self):
+        """Return (idle connection, whether it needs a ping) or None.
+
+        Must be called holding the lock.
+        """
+        now = time.monotonic()
+        while self._idle:
+            conn, returned_at = self._idle.pop()
+            if not conn.closed:
+                return conn, now - returned_at >= self.health_check_interval
+            self.health_check_failures += 1
+            self._discard(conn)
+        return None
+
+    @staticmethod
+    def _ping(conn):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not conn.autocommit:
+                conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def putconn(self, conn, discard=False):
+        """Return a connection, closing it when it cannot be reused."""
+        if not discard and not conn.closed:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+
+        with self._cond:
+            if discard or conn.closed:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+                self._prune()
+            self._cond.notify()
+
+    def _prune(self):
+        """Close surplus connections idle past max_idle, holding the lock."""
+        cutoff = time.monotonic() - self.max_idle
+        while len(self._idle) > 1 and self._size > self.min_size \
+                and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.pop(0)
+            self._discard(conn)
+
+    def _discard(self, conn):
+        self._size -= 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            logger.warning('Error closing a pooled connection.', exc_info=True)
+
+    def closeall(self):
+        """Close every idle connection."""
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+
+    def stats(self):
+        """Return the pool size and wait-time counters."""
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+                'waits': self.waits,
+                'wait_seconds': self.wait_seconds,
+                'max_wait_seconds': self.max_wait_seconds,
+                'timeouts': self.timeouts,
+                'health_check_failures': self.health_check_failures,
+            }
+
+
+# Connections inherited across fork(), kept alive so they are never closed.
+_inherited = []
+# alias -> (connection parameters, pool)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def inherit(conn):
+    """Keep a connection opened by the parent process from being closed."""
+    _inherited.append(conn)
+
+
+def get_pool(alias, params, factory):
+    """Return the pool for a database alias, creating it with factory.
+
+    A pool created for other connection parameters, such as before the
+    test runner switched to the test database, is closed and replaced.
+    """
+    with _pools_lock:
+        current = _pools.get(alias)
+        if current is not None and current[0] == params:
+            return current[1]
+        pool = factory()
+        _pools[alias] = (params, pool)
+    if current is not None:
+        current[1].closeall()
+    return pool
+
+
+def close_pool(alias):
+    """Close the idle connections of an alias and forget its pool."""
+    with _pools_lock:
+        current = _pools.pop(alias, None)
+    if current is not None:
+        current[1].closeall()
+
+
+def pool_stats():
+    """Return stats of every pool in this process, keyed by alias."""
+    with _pools_lock:
+        pools = {alias: pool for alias, (_, pool) in _pools.items()}
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+def _after_fork_in_child():
+    global _pools_lock
+    # The lock may have been held by another thread at the time of fork.
+    _pools_lock = threading.Lock()
+    for _, pool in _pools.values():
+        pool.after_fork()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
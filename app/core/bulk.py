@@ -0,0 +1,40 @@
+"""
+Bulk loading of rows with PostgreSQL COPY.
+"""
+import csv
+import io
+
+
+from django.db import connection
+
+
+def copy_into(model, columns, rows):
+    """Load rows into the table of model with PostgreSQL COPY."""
+    buffer = io.StringIO()
+    # Quoting keeps empty strings from being read as NULL.
+    csv.writer(buffer, quoting=csv.QUOTE_ALL).writerows(rows)
+    if not buffer.tell():
+        return
+    buffer.seek(0)
+
+    quote = connection.ops.quote_name
+    sql = (
+        f'COPY {quote(model._meta.db_table)} '
+        f'({", ".join(quote(column) for column in columns)}) '
+        f'FROM STDIN WITH (FORMAT csv)'
+    )
+    with connection.cursor() as cursor:
+        cursor.copy_expert(sql, buffer)
+
+
+def reserve_ids(model, count):
+    """Return count new primary keys from the sequence of model."""
+    if not count:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+            'FROM generate_series(1, %s)',
+            [model._meta.db_table, model._meta.pk.column, count],
+        )
+        return [row[0] for row in cursor.fetchall()]
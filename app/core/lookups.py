@@ -0,0 +1,27 @@
+"""
+Custom lookups for the Postgres backend.
+"""
+from django.db import models
+
+
+@models.CharField.register_lookup
+class IPrefix(models.Lookup):
+    """Case-insensitive prefix match that pg_trgm indexes can serve.
+
+    Django's ``istartswith`` compiles to ``UPPER(col) LIKE UPPER(%s)``,
+    which no index on the bare column can answer. ``ILIKE`` can be
+    answered by a ``gin_trgm_ops`` index on the column itself.
+    """
+    lookup_name = 'iprefix'
+    prepare_rhs = False
+
+    def process_rhs(self, qn, connection):
+        rhs, params = super().process_rhs(qn, connection)
+        if params:
+            params[0] = f'{connection.ops.prep_for_like_query(params[0])}%'
+        return rhs, params
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} ILIKE {rhs}', lhs_params + rhs_params
@@ -0,0 +1,39 @@
+"""
+Helpers shared by the benchmark commands.
+"""
+from django.contrib.auth import get_user_model
+
+
+from core.management.commands.seed_data import Seeder, chunks, recipe_counts
+
+
+BATCH_SIZE = 5000
+
+
+def percentile(values, fraction):
+    """Return the value below which fraction of values fall."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed(domain, users, recipes, tag_pool=50, fan_out=3, stdout=None):
+    """Seed users at domain with recipes, tags and ingredients.
+
+    The data is generated by seed_data's Seeder: tag and ingredient
+    popularity and recipes per user follow Zipf's law, and recipes are
+    loaded in transactions of about BATCH_SIZE. Returns the seeded users.
+    """
+    seeder = Seeder(
+        domain=domain,
+        tags=tag_pool,
+        ingredients=tag_pool,
+        tags_per_recipe=fan_out,
+        ingredients_per_recipe=fan_out,
+    )
+    total = 0
+    for chunk in chunks(recipe_counts(users, recipes, 1.0, 0), BATCH_SIZE):
+        total += seeder.seed_chunk(chunk)
+        if stdout is not None:
+            stdout.write(f'Seeded {total}/{recipes} recipes.')
+    return get_user_model().objects.filter(email__endswith=f'@{domain}')
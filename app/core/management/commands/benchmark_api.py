@@ -0,0 +1,402 @@
+"""
+Django command to benchmark the API against a large seeded dataset.
+"""
+import datetime
+import io
+import json
+import os
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+
+from core.management.benchmarks import percentile, seed
+from core.management.commands.seed_data import word
+from core.models import Ingredient, Recipe, Tag
+
+
+EMAIL_DOMAIN = 'scale.benchmark.invalid'
+
+
+def population():
+    """Return the users of a previously seeded population."""
+    return get_user_model().objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+
+
+@transaction.atomic
+def delete_population():
+    """Delete the seeded users and everything they own."""
+    users = population()
+    # Recipes with images go through the ORM to release their references;
+    # the bulk of the rows is deleted without loading them.
+    Recipe.objects.filter(user__in=users, image__gt='').delete()
+    recipes = Recipe.objects.filter(user__in=users)
+    for through in (Recipe.tags.through, Recipe.ingredients.through):
+        links = through.objects.filter(recipe__in=recipes)
+        links._raw_delete(links.db)
+    for model in (Recipe, Tag, Ingredient):
+        rows = model.objects.filter(user__in=users)
+        rows._raw_delete(rows.db)
+    users.delete()
+
+
+def jpeg(size=(800, 600)):
+    """Return the bytes of a sample JPEG photo."""
+    buffer = io.BytesIO()
+    Image.effect_mandelbrot(size, (-2, -1.5, 1, 1.5), 100) \
+        .convert('RGB').save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def git_commit():
+    """Return the commit of the working tree, if it is a git checkout."""
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(__file__),
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+class Scenario:
+    """One kind of request, built freshly for every iteration."""
+
+    def __init__(self, name, method, url, data=None, fmt='json'):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.data = data
+        self.fmt = fmt
+
+    def request(self, client, n):
+        url = self.url(n) if callable(self.url) else self.url
+        data = self.data(n) if callable(self.data) else self.data
+        call = getattr(client, self.method)
+        if self.method == 'get':
+            return call(url, data)
+        return call(url, data, format=self.fmt)
+
+
+def scenarios(user):
+    """Return the scenarios for every API view, run as user."""
+    recipe_ids = list(
+        Recipe.objects.filter(user=user)
+        .order_by('-id').values_list('id', flat=True)[:100]
+    )
+    tag_ids = list(Tag.objects.filter(user=user).values_list('id', flat=True))
+    ingredient_ids = list(
+        Ingredient.objects.filter(user=user).values_list('id', flat=True)
+    )
+    if not (recipe_ids and tag_ids and ingredient_ids):
+        raise CommandError('The benchmark user has no recipes to work on.')
+    image = jpeg()
+
+    def pick(ids):
+        return lambda n: ids[n % len(ids)]
+
+    recipe_id, tag_id, ingredient_id = (
+        pick(recipe_ids), pick(tag_ids), pick(ingredient_ids),
+    )
+
+    def upload(n):
+        return {
+            'image': SimpleUploadedFile('photo.jpg', image, 'image/jpeg'),
+        }
+
+    return [
+        Scenario('recipes.list', 'get', reverse('recipe:recipe-list')),
+        Scenario(
+            'recipes.list_filtered', 'get', reverse('recipe:recipe-list'),
+            lambda n: {'tags': f'{tag_id(n)}'},
+        ),
+        Scenario(
+            'recipes.detail', 'get',
+            lambda n: reverse('recipe:recipe-detail', args=[recipe_id(n)]),
+        ),
+        Scenario(
+            'recipes.create', 'post', reverse('recipe:recipe-list'),
+            lambda n: {
+                'title': f'Benchmark recipe {n}',
+                'time_minutes': 10,
+                'price': '4.50',
+                'tags': [{'name': word(n % 5)}],
+                'ingredients': [{'name': word(n % 5)}],
+            },
+        ),
+        Scenario(
+            'recipes.update', 'patch',
+            lambda n: reverse('recipe:recipe-detail', args=[recipe_id(n)]),
+            lambda n: {'title': f'Updated recipe {n}'},
+        ),
+        Scenario(
+            'recipes.upload_image', 'post',
+            lambda n: reverse(
+                'recipe:recipe-upload-image', args=[recipe_id(n)],
+            ),
+            upload,
+            fmt='multipart',
+        ),
+        Scenario('tags.list', 'get', reverse('recipe:tag-list')),
+        Scenario(
+            'tags.autocomplete', 'get', reverse('recipe:tag-autocomplete'),
+            lambda n: {'q': word(n % 10)[:2]},
+        ),
+        Scenario(
+            'tags.update', 'patch',
+            lambda n: reverse('recipe:tag-detail', args=[tag_id(n)]),
+            lambda n: {'name': f'Renamed tag {tag_id(n)}'},
+        ),
+        Scenario('ingredients.list', 'get',
+                 reverse('recipe:ingredient-list')),
+        Scenario(
+            'ingredients.update', 'patch',
+            lambda n: reverse(
+                'recipe:ingredient-detail', args=[ingredient_id(n)],
+            ),
+            lambda n: {'name': f'Renamed ingredient {ingredient_id(n)}'},
+        ),
+        Scenario('user.me', 'get', reverse('user:me')),
+        Scenario(
+            'user.update', 'patch', reverse('user:me'),
+            lambda n: {'name': f'User {n}'},
+        ),
+    ]
+
+
+def measure(client, scenario, iterations, warmup, memory_samples):
+    """Return latency, query and memory statistics for a scenario."""
+    for n in range(warmup):
+        scenario.request(client, n)
+
+    latencies, queries, statuses = [], [], []
+    for n in range(warmup, warmup + iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            resp = scenario.request(client, n)
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(captured))
+        statuses.append(resp.status_code)
+
+    # Allocation tracing slows requests down, so it gets its own runs.
+    peaks = []
+    for n in range(memory_samples):
+        tracemalloc.start()
+        try:
+            scenario.request(client, warmup + iterations + n)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'requests': iterations,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'queries_mean': statistics.mean(queries),
+        'queries_max': max(queries),
+        'peak_memory_kb': max(peaks) // 1024 if peaks else None,
+        'statuses': {
+            str(code): count for code, count in Counter(statuses).items()
+        },
+    }
+
+
+class Command(BaseCommand):
+    """Django command to benchmark API requests at production volumes."""
+
+    help = (
+        'Seed many users with recipes, tags and ingredients, drive every '
+        'API view through the test client and write latency percentiles, '
+        'queries per request and peak memory to a JSON file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument(
+            '--tag-pool',
+            type=int,
+            default=50,
+            help='Distinct tag and ingredient names to draw from.',
+        )
+        parser.add_argument(
+            '--fan-out',
+            type=int,
+            default=3,
+            help='Average tags and ingredients per recipe.',
+        )
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--memory-samples', type=int, default=3)
+        parser.add_argument(
+            '--scenarios',
+            nargs='+',
+            help='Only run scenarios whose names start with these prefixes.',
+        )
+        parser.add_argument(
+            '--reuse',
+            action='store_true',
+            help='Benchmark a population seeded by an earlier --keep run.',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Leave the seeded population in place for --reuse.',
+        )
+        parser.add_argument(
+            '--response-cache',
+            action='store_true',
+            help='Measure with the response cache instead of bypassing it.',
+        )
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument(
+            '--compare',
+            help='Earlier results to compare p95 latency and queries with.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['reuse']:
+            if not population().exists():
+                raise CommandError('No seeded population to reuse.')
+        else:
+            if population().exists():
+                raise CommandError(
+                    'A seeded population exists; pass --reuse or delete it.'
+                )
+            start = time.perf_counter()
+            seed(
+                EMAIL_DOMAIN,
+                options['users'],
+                options['recipes'],
+                options['tag_pool'],
+                options['fan_out'],
+                stdout=self.stdout if options['verbosity'] > 1 else None,
+            )
+            self.stdout.write(
+                f'Seeded in {time.perf_counter() - start:.1f}s.'
+            )
+
+        try:
+            report = self._run(options)
+        finally:
+            if not options['keep']:
+                delete_population()
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)['results']
+        self._print(report['results'], baseline)
+
+    def _run(self, options):
+        """Run every scenario as the user with the most recipes."""
+        user = population().annotate(
+            recipe_count=Count('recipe'),
+        ).order_by('-recipe_count', 'id').first()
+        dataset = {
+            'users': population().count(),
+            'recipes': Recipe.objects.filter(user__in=population()).count(),
+            'benchmark_user_recipes': user.recipe_count,
+        }
+        token, _ = Token.objects.get_or_create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        selected = [
+            scenario for scenario in scenarios(user)
+            if not options['scenarios']
+            or scenario.name.startswith(tuple(options['scenarios']))
+        ]
+
+        overrides = {
+            'ALLOWED_HOSTS': ['testserver'],
+            'RECIPE_IMAGE_WORKERS': 0,
+            'THROTTLE_BUCKETS': {},
+        }
+        if not options['response_cache']:
+            overrides['RECIPE_RESPONSE_CACHE'] = None
+        results = {}
+        with tempfile.TemporaryDirectory() as media, \
+                tempfile.TemporaryDirectory() as private, \
+                override_settings(MEDIA_ROOT=media,
+                                  PRIVATE_MEDIA_ROOT=private, **overrides):
+            for scenario in selected:
+                results[scenario.name] = measure(
+                    client,
+                    scenario,
+                    options['iterations'],
+                    options['warmup'],
+                    options['memory_samples'],
+                )
+
+        return {
+            'commit': git_commit(),
+            'created': datetime.datetime.now(
+                datetime.timezone.utc,
+            ).isoformat(),
+            'dataset': dataset,
+            'options': {
+                key: options[key] for key in (
+                    'iterations', 'warmup', 'memory_samples',
+                    'response_cache',
+                )
+            },
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'results': results,
+        }
+
+    def _print(self, results, baseline):
+        header = (
+            f'{"scenario":<24} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+            f'{"queries":>8} {"peak KB":>8}'
+        )
+        if baseline:
+            header += f' {"p95 vs base":>12} {"queries vs base":>16}'
+        self.stdout.write(header)
+
+        for name, result in results.items():
+            line = (
+                f'{name:<24} {result["p50_ms"]:>8.1f} '
+                f'{result["p95_ms"]:>8.1f} {result["p99_ms"]:>8.1f} '
+                f'{result["queries_mean"]:>8.1f} '
+                f'{result["peak_memory_kb"] or 0:>8}'
+            )
+            base = (baseline or {}).get(name)
+            if base:
+                change = result['p95_ms'] / base['p95_ms'] - 1
+                queries = result['queries_mean'] - base['queries_mean']
+                line += f' {change:>+12.0%} {queries:>+16.1f}'
+            self.stdout.write(line)
+
+        for name, result in results.items():
+            failed = {
+                code: count for code, count in result['statuses'].items()
+                if int(code) >= 400
+            }
+            if failed:
+                self.stderr.write(f'{name} returned errors: {failed}')
@@ -0,0 +1,123 @@
+"""
+Django command to benchmark the cost of authenticating API requests.
+"""
+import secrets
+import time
+
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+
+from core import tokens
+from core.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+    local_token_cache,
+)
+from user.serializers import AuthTokenSerializer
+
+
+PASSWORD = 'benchmark-pass'
+
+
+def measure(iterations, func):
+    """Return (mean microseconds, queries per call) over iterations."""
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - start
+    return elapsed / iterations * 1e6, len(queries) / iterations
+
+
+class Command(BaseCommand):
+    """Django command to compare token and signed token authentication."""
+
+    help = (
+        'Benchmark authenticating a request with DRF tokens, cached tokens '
+        'and signed access tokens, and issuing tokens.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+        parser.add_argument(
+            '--logins',
+            type=int,
+            default=5,
+            help='Iterations of the password checking paths.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        keys = settings.SIGNED_TOKEN_KEYS or [
+            ('benchmark', secrets.token_urlsafe(32)),
+        ]
+        with override_settings(SIGNED_TOKEN_KEYS=keys):
+            results = self._run(options)
+
+        self.stdout.write(f'{"path":<22} {"us/call":>10} {"queries":>8}')
+        for name, (micros, queries) in results:
+            self.stdout.write(f'{name:<22} {micros:>10.1f} {queries:>8.2f}')
+
+    def _run(self, options):
+        iterations = options['iterations']
+        factory = APIRequestFactory()
+        # Seed inside a transaction that is always rolled back.
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                'benchmark-auth@example.com', PASSWORD, is_active=True,
+            )
+            key = Token.objects.create(user=user).key
+            pair = tokens.issue(user)
+            tokens.revocations.clear()
+
+            def authenticate(authentication, header):
+                request = factory.get('/', HTTP_AUTHORIZATION=header)
+                return lambda: authentication.authenticate(Request(request))
+
+            def login():
+                serializer = AuthTokenSerializer(
+                    data={'email': user.email, 'password': PASSWORD},
+                )
+                serializer.is_valid(raise_exception=True)
+
+            refresh_tokens = [pair['refresh']]
+
+            def refresh():
+                refresh_tokens.append(
+                    tokens.refresh(refresh_tokens.pop())['refresh']
+                )
+
+            cached = authenticate(CachedTokenAuthentication(), f'Token {key}')
+            local_token_cache.clear()
+            cold = measure(1, cached)
+            signed = authenticate(
+                SignedTokenAuthentication(), f'Bearer {pair["access"]}',
+            )
+            # Load the revocation list, reloaded only every few seconds.
+            signed()
+            results = [
+                ('token', measure(iterations, authenticate(
+                    TokenAuthentication(), f'Token {key}',
+                ))),
+                ('cached token (cold)', cold),
+                ('cached token (warm)', measure(iterations, cached)),
+                ('signed access token', measure(iterations, signed)),
+                ('login (password)', measure(options['logins'], login)),
+                ('refresh token', measure(options['logins'], refresh)),
+            ]
+
+            local_token_cache.clear()
+            tokens.revocations.clear()
+            transaction.set_rollback(True)
+
+        return results
@@ -0,0 +1,95 @@
+"""
+Django command to benchmark the recipe list serialization paths.
+"""
+import time
+
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+
+from core.management.benchmarks import seed
+from core.models import Recipe, Tag, Ingredient
+from recipe.serializers import RecipeSerializer, RecipeRowSerializer
+
+
+def best_of(repeat, func):
+    """Return (best elapsed seconds, result) over repeat runs of func."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+class Command(BaseCommand):
+    """Django command to compare recipe serializer throughput."""
+
+    help = 'Benchmark RecipeSerializer against RecipeRowSerializer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 100000],
+        )
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Verify both paths render identical JSON.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        self.stdout.write(
+            f'{"rows":>8} {"model (s)":>10} {"rows (s)":>10} {"speedup":>8}'
+        )
+        for size in options['sizes']:
+            model_time, row_time = self._run(size, options)
+            self.stdout.write(
+                f'{size:>8} {model_time:>10.3f} {row_time:>10.3f} '
+                f'{model_time / row_time:>7.1f}x'
+            )
+
+    def _run(self, size, options):
+        # Seed inside a transaction that is always rolled back.
+        with transaction.atomic():
+            user = seed('serializers.benchmark.invalid', 1, size).get()
+            recipes = Recipe.objects.filter(user=user).order_by('-id')
+
+            model_time, expected = best_of(
+                options['repeat'],
+                lambda: RecipeSerializer(
+                    recipes.prefetch_related(
+                        Prefetch('tags', Tag.objects.order_by('id')),
+                        Prefetch(
+                            'ingredients',
+                            Ingredient.objects.order_by('id'),
+                        ),
+                    ),
+                    many=True,
+                ).data,
+            )
+            row_time, fast = best_of(
+                options['repeat'],
+                lambda: RecipeRowSerializer(
+                    recipes.values(*RecipeRowSerializer.value_fields()),
+                    many=True,
+                ).data,
+            )
+
+            if options['check']:
+                renderer = JSONRenderer()
+                if renderer.render(fast) != renderer.render(expected):
+                    raise CommandError(f'Output differs at {size} rows.')
+
+            transaction.set_rollback(True)
+
+        return model_time, row_time
@@ -0,0 +1,291 @@
+"""
+Django command to compare the WSGI and ASGI serving paths.
+"""
+import asyncio
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+
+from core.management.benchmarks import percentile, seed
+from core.models import Recipe
+
+
+HOST = 'localhost'
+
+
+def summarize(mode, latencies, elapsed, statuses):
+    """Return benchmark results as a dict."""
+    return {
+        'mode': mode,
+        'requests': len(latencies),
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'statuses': {
+            str(code): count for code, count in Counter(statuses).items()
+        },
+    }
+
+
+class WSGIBench:
+    """Serve requests with a fixed number of blocking sync workers."""
+
+    def __init__(self, workers, slow_read):
+        self.application = get_wsgi_application()
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.slow_read = slow_read
+
+    def _handle(self, path, token):
+        status = []
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': HOST,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': HOST,
+            'HTTP_AUTHORIZATION': f'Token {token}',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        body = self.application(
+            environ,
+            lambda line, headers: status.append(int(line.split()[0])),
+        )
+        try:
+            for _ in body:
+                # A sync worker stays blocked while the client drains it.
+                time.sleep(self.slow_read)
+        finally:
+            body.close()
+        return status[0]
+
+    def run(self, paths, token, clients, requests):
+        latencies, statuses = [], []
+        lock = threading.Lock()
+        per_client = max(1, requests // clients)
+
+        def client(offset):
+            for n in range(per_client):
+                path = paths[(offset + n) % len(paths)]
+                start = time.perf_counter()
+                code = self.pool.submit(self._handle, path, token).result()
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+                    statuses.append(code)
+
+        threads = [
+            threading.Thread(target=client, args=(i,))
+            for i in range(clients)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        self.pool.shutdown()
+        return latencies, elapsed, statuses
+
+
+class ASGIBench:
+    """Serve requests from one event loop, as uvicorn would."""
+
+    def __init__(self, slow_read):
+        self.application = get_asgi_application()
+        self.slow_read = slow_read
+
+    async def _handle(self, path, token):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [
+                (b'host', HOST.encode()),
+                (b'authorization', f'Token {token}'.encode()),
+            ],
+            'client': ('127.0.0.1', 1234),
+            'server': (HOST, 80),
+        }
+        status = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif message['type'] == 'http.response.body':
+                # A slow client only holds this coroutine, not a thread.
+                await asyncio.sleep(self.slow_read)
+
+        await self.application(scope, receive, send)
+        return status[0]
+
+    async def _run(self, paths, token, clients, requests):
+        latencies, statuses = [], []
+        per_client = max(1, requests // clients)
+
+        async def client(offset):
+            for n in range(per_client):
+                path = paths[(offset + n) % len(paths)]
+                start = time.perf_counter()
+                statuses.append(await self._handle(path, token))
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(i) for i in range(clients)))
+        return latencies, time.perf_counter() - start, statuses
+
+    def run(self, paths, token, clients, requests):
+        return asyncio.run(self._run(paths, token, clients, requests))
+
+
+class Command(BaseCommand):
+    """Django command to benchmark WSGI against ASGI under slow clients."""
+
+    help = (
+        'Drive the API in-process through WSGI with a fixed pool of sync '
+        'workers and through ASGI with async reads, using many concurrent '
+        'slow clients, and report throughput and latency percentiles.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            choices=['wsgi', 'asgi', 'both'],
+            default='both',
+        )
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument(
+            '--slow-read',
+            type=float,
+            default=0.2,
+            help='Seconds each client takes to read a response chunk.',
+        )
+        parser.add_argument(
+            '--wsgi-workers',
+            type=int,
+            default=8,
+            help='Sync worker threads on the WSGI path.',
+        )
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print machine readable results.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['mode'] == 'both':
+            results = [
+                self._spawn(mode, options) for mode in ('wsgi', 'asgi')
+            ]
+        else:
+            results = [self._run(options)]
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+            return
+
+        self.stdout.write(
+            f'{"mode":<6} {"req/s":>9} {"p50 ms":>9} {"p99 ms":>9} '
+            f'{"statuses":>20}'
+        )
+        for result in results:
+            self.stdout.write(
+                f'{result["mode"]:<6} {result["throughput"]:>9.1f} '
+                f'{result["p50_ms"]:>9.1f} {result["p99_ms"]:>9.1f} '
+                f'{json.dumps(result["statuses"]):>20}'
+            )
+
+    def _spawn(self, mode, options):
+        """Run one mode in a fresh process with its URL configuration."""
+        env = dict(os.environ, ASYNC_READ_VIEWS='1' if mode == 'asgi' else '0')
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_serving',
+            '--mode', mode, '--json',
+            '--clients', str(options['clients']),
+            '--requests', str(options['requests']),
+            '--slow-read', str(options['slow_read']),
+            '--wsgi-workers', str(options['wsgi_workers']),
+            '--recipes', str(options['recipes']),
+        ]
+        result = subprocess.run(
+            command, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+        return json.loads(result.stdout)[0]
+
+    def _run(self, options):
+        """Seed data, drive the requested mode and clean up."""
+        # Seeded data must be committed for the pool threads to see it.
+        user = seed(
+            f'{uuid.uuid4().hex}.benchmark.invalid', 1, options['recipes'],
+        ).get()
+        try:
+            token = Token.objects.create(user=user).key
+            recipe_ids = list(Recipe.objects.filter(
+                user=user,
+            ).values_list('id', flat=True)[:50])
+            paths = [reverse('recipe:recipe-list'), reverse('recipe:tag-list')]
+            paths += [
+                reverse('recipe:recipe-detail', args=[pk])
+                for pk in recipe_ids
+            ]
+
+            if options['mode'] == 'wsgi':
+                bench = WSGIBench(
+                    options['wsgi_workers'],
+                    options['slow_read'],
+                )
+            else:
+                bench = ASGIBench(options['slow_read'])
+
+            # Measure the serving path rather than response cache hits or
+            # throttled requests.
+            with override_settings(
+                ALLOWED_HOSTS=[HOST],
+                RECIPE_RESPONSE_CACHE=None,
+                THROTTLE_BUCKETS={},
+            ):
+                latencies, elapsed, statuses = bench.run(
+                    paths, token, options['clients'], options['requests'],
+                )
+        finally:
+            user.delete()
+
+        return summarize(options['mode'], latencies, elapsed, statuses)
@@ -0,0 +1,134 @@
+"""
+Django command to delete recipe images no recipe references.
+"""
+import datetime
+import os
+
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+
+from core.models import RECIPE_IMAGE_DIR, ImageBlob, Recipe
+
+
+class Command(BaseCommand):
+    """Django command to garbage collect recipe images."""
+
+    help = (
+        'Delete image files whose reference count dropped to zero, in '
+        'batches, along with their processed variants.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=3600,
+            help='Seconds an unreferenced file is kept before deletion.',
+        )
+        parser.add_argument(
+            '--orphans',
+            action='store_true',
+            help='Also delete stored files that were never counted, such '
+                 'as uploads whose transaction rolled back.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        storage = Recipe._meta.get_field('image').storage
+        cutoff = timezone.now() - datetime.timedelta(seconds=options['grace'])
+
+        deleted = 0
+        while True:
+            count = self._collect_batch(storage, cutoff, options['batch_size'])
+            deleted += count
+            if count < options['batch_size']:
+                break
+
+        if options['orphans']:
+            deleted += self._collect_orphans(storage, cutoff)
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} images.'))
+
+    def _collect_batch(self, storage, cutoff, batch_size):
+        """Delete one batch of unreferenced blobs, returning its size."""
+        with transaction.atomic():
+            # Locking the rows makes a concurrent upload of the same bytes
+            # wait in ImageBlob.objects.touch() and then rewrite the file.
+            blobs = list(
+                ImageBlob.objects.select_for_update(skip_locked=True).filter(
+                    ~Exists(Recipe.objects.filter(image=OuterRef('name'))),
+                    refcount=0,
+                    updated_at__lt=cutoff,
+                ).order_by('id').values_list('id', 'name')[:batch_size]
+            )
+            for _, name in blobs:
+                self._delete_image(storage, name)
+            ImageBlob.objects.filter(id__in=[pk for pk, _ in blobs]).delete()
+
+        return len(blobs)
+
+    def _collect_orphans(self, storage, cutoff):
+        """Delete files and variants without a blob older than cutoff."""
+        deleted = 0
+        for shard in self._shards(storage):
+            names = [
+                os.path.join(shard, filename)
+                for filename in storage.listdir(shard)[1]
+            ]
+            tracked = set(ImageBlob.objects.filter(
+                name__in=names,
+            ).values_list('name', flat=True))
+            for name in names:
+                if name in tracked:
+                    continue
+                if storage.get_modified_time(name) >= cutoff:
+                    continue
+                self._delete_image(storage, name)
+                deleted += 1
+
+        # Variants whose original is already gone, e.g. after a crash
+        # between deleting the file and its variant directory.
+        for shard in self._shards(default_storage):
+            tracked = {
+                os.path.splitext(name)[0]
+                for name in ImageBlob.objects.filter(
+                    name__startswith=f'{shard}/',
+                ).values_list('name', flat=True)
+            }
+            for directory in default_storage.listdir(shard)[0]:
+                variants = os.path.join(shard, directory)
+                if variants in tracked:
+                    continue
+                if default_storage.get_modified_time(variants) >= cutoff:
+                    continue
+                self._delete_variants(variants)
+                deleted += 1
+        return deleted
+
+    def _shards(self, storage):
+        """Yield the two-level shard directories holding recipe images."""
+        if not storage.exists(RECIPE_IMAGE_DIR):
+            return
+
+        for top in storage.listdir(RECIPE_IMAGE_DIR)[0]:
+            top = os.path.join(RECIPE_IMAGE_DIR, top)
+            for sub in storage.listdir(top)[0]:
+                yield os.path.join(top, sub)
+
+    def _delete_image(self, storage, name):
+        """Delete an image file and the directory of its variants."""
+        storage.delete_unreferenced(name)
+        self._delete_variants(os.path.splitext(name)[0])
+
+    def _delete_variants(self, variants):
+        """Delete a directory of image variants, if it exists."""
+        if default_storage.exists(variants):
+            for filename in default_storage.listdir(variants)[1]:
+                default_storage.delete(os.path.join(variants, filename))
+            os.rmdir(default_storage.path(variants))
@@ -0,0 +1,242 @@
+"""
+Django command to bulk import recipes from JSONL or CSV files.
+"""
+import csv
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from decimal import Decimal, InvalidOperation
+
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    OutputWrapper,
+)
+from django.db import connections, transaction
+
+
+from core.bulk import copy_into
+from core.models import ImportProgress, Recipe, Tag, Ingredient
+from recipe import cache
+
+
+def read_records(path):
+    """Yield recipe dicts from a JSONL (one object per line) or CSV file."""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, newline='', encoding='utf-8') as source:
+        if ext == '.csv':
+            for row in csv.DictReader(source):
+                for field in ['tags', 'ingredients']:
+                    row[field] = [
+                        name for name in (row.get(field) or '').split(';')
+                        if name
+                    ]
+                yield row
+        else:
+            for number, line in enumerate(source, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as exc:
+                    raise CommandError(
+                        f'{path}: line {number} is not valid JSON ({exc})'
+                    )
+
+
+def names_of(items):
+    """Return names from a list of strings or {'name': ...} objects."""
+    return {
+        item['name'] if isinstance(item, dict) else item
+        for item in items or []
+    }
+
+
+def batched(iterable, size):
+    """Yield lists of up to size items from iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class RecipeImporter:
+    """Load recipe records for one user in batched transactions."""
+
+    def __init__(self, user, batch_size, stdout):
+        self.user = user
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self._ids = {Tag: {}, Ingredient: {}}
+
+    def import_file(self, path, resume=False):
+        """Import path, returning the number of records loaded."""
+        progress, _created = ImportProgress.objects.get_or_create(
+            user=self.user,
+            source=os.path.abspath(path),
+        )
+        if not resume:
+            progress.records = 0
+            progress.completed = False
+            progress.save()
+        elif progress.completed:
+            self.stdout.write(f'{path}: already imported, skipping')
+            return 0
+
+        start = position = progress.records
+        records = itertools.islice(read_records(path), start, None)
+        for batch in batched(records, self.batch_size):
+            with transaction.atomic():
+                self._load_batch(path, position, batch)
+                position += len(batch)
+                ImportProgress.objects.filter(pk=progress.pk).update(
+                    records=position,
+                )
+                # Cached list and search responses include the new recipes.
+                cache.schedule_version_bump(self.user.pk)
+            self.stdout.write(f'{path}: {position} records imported')
+
+        ImportProgress.objects.filter(pk=progress.pk).update(completed=True)
+        return position - start
+
+    def _build_recipe(self, path, position, record):
+        try:
+            return Recipe(
+                user=self.user,
+                title=record['title'],
+                time_minutes=int(record['time_minutes']),
+                price=Decimal(str(record['price'])),
+                description=record.get('description') or '',
+                link=record.get('link') or '',
+            )
+        except (KeyError, TypeError, ValueError, InvalidOperation) as exc:
+            raise CommandError(
+                f'{path}: record {position + 1} is invalid ({exc!r})'
+            )
+
+    def _resolve(self, model, names):
+        """Return {name: id}, creating names not seen before."""
+        ids = self._ids[model]
+        missing = names - ids.keys()
+        if missing:
+            for obj in model.objects.get_or_create_many(self.user, missing):
+                ids[obj.name] = obj.id
+        return ids
+
+    def _load_batch(self, path, position, batch):
+        recipes = [
+            self._build_recipe(path, position + offset, record)
+            for offset, record in enumerate(batch)
+        ]
+        Recipe.objects.bulk_create(recipes)
+
+        for field, model, column in [('tags', Tag, 'tag_id'),
+                                     ('ingredients', Ingredient,
+                                      'ingredient_id')]:
+            names = [names_of(record.get(field)) for record in batch]
+            ids = self._resolve(model, set().union(*names))
+            rows = [
+                (recipe.id, ids[name])
+                for recipe, recipe_names in zip(recipes, names)
+                for name in recipe_names
+            ]
+            copy_into(
+                getattr(Recipe, field).through, ['recipe_id', column], rows,
+            )
+
+        Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes],
+        ).update_search_vector()
+
+
+def _init_worker():
+    """Set up Django in a worker process that was not forked from it."""
+    django.setup()
+
+
+def _import_in_worker(path, user_id, batch_size, resume):
+    """Import one file in a worker process."""
+    user = get_user_model().objects.get(pk=user_id)
+    importer = RecipeImporter(user, batch_size, OutputWrapper(sys.stdout))
+    return importer.import_file(path, resume=resume)
+
+
+class Command(BaseCommand):
+    """Django command to import recipes for a user."""
+
+    help = 'Bulk import recipes for a user from JSONL or CSV files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+')
+        parser.add_argument('--user', required=True, help='User email.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes importing files in parallel.',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue after the last committed batch of each file.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User {options["user"]} does not exist.')
+
+        for path in options['files']:
+            if not os.path.exists(path):
+                raise CommandError(f'{path} does not exist.')
+
+        if options['workers'] > 1 and len(options['files']) > 1:
+            total = self._import_parallel(user, options)
+        else:
+            importer = RecipeImporter(
+                user,
+                options['batch_size'],
+                self.stdout,
+            )
+            total = sum(
+                importer.import_file(path, resume=options['resume'])
+                for path in options['files']
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {total} recipes.'))
+
+    def _import_parallel(self, user, options):
+        # Forked workers must not share the parent's database connection.
+        connections.close_all()
+
+        total = 0
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            initializer=_init_worker,
+        ) as pool:
+            futures = {
+                pool.submit(
+                    _import_in_worker,
+                    path,
+                    user.pk,
+                    options['batch_size'],
+                    options['resume'],
+                ): path
+                for path in options['files']
+            }
+            for future in as_completed(futures):
+                count = future.result()
+                total += count
+                self.stdout.write(f'{futures[future]}: done ({count} new)')
+
+        return total
@@ -0,0 +1,46 @@
+"""
+Django command to process recipe images left pending.
+"""
+from django.core.management.base import BaseCommand
+
+
+from core.models import Recipe
+from recipe.images import process_recipe_image
+
+
+class Command(BaseCommand):
+    """Django command to process pending recipe images."""
+
+    help = (
+        'Process recipe images whose background job never ran, for example '
+        'uploads queued before a restart or existing images after upgrade.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Queue images that failed to process again.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['retry_failed']:
+            Recipe.objects.filter(
+                image_status=Recipe.ImageStatus.FAILED,
+            ).update(image_status=Recipe.ImageStatus.PENDING)
+
+        recipe_ids = list(Recipe.objects.filter(
+            image_status=Recipe.ImageStatus.PENDING,
+        ).order_by('id').values_list('id', flat=True))
+
+        results = {}
+        for recipe_id in recipe_ids:
+            status = process_recipe_image(recipe_id)
+            if status is not None:
+                results[status] = results.get(status, 0) + 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {results.get(Recipe.ImageStatus.READY, 0)} images, '
+            f'{results.get(Recipe.ImageStatus.FAILED, 0)} failed.'
+        ))
@@ -0,0 +1,335 @@
+"""
+Django command to seed large volumes of synthetic users and recipes.
+"""
+import bisect
+import itertools
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+
+from core.bulk import copy_into, reserve_ids
+from core.management.commands.import_recipes import _init_worker
+from core.models import Ingredient, Recipe, Tag
+
+
+SYLLABLES = ['ba', 'ko', 'ri', 'mu', 'sel', 'tan', 'vo', 'pi', 'den', 'lu']
+DISHES = ['Stew', 'Salad', 'Soup', 'Pie', 'Curry', 'Bake', 'Roast', 'Bowl']
+DEFAULT_DOMAIN = 'seed.example.com'
+
+
+def word(rank):
+    """Return a pronounceable name, distinct for every rank."""
+    return ''.join(SYLLABLES[int(digit)] for digit in str(rank)).title()
+
+
+def zipf_cum_weights(n, skew):
+    """Return cumulative weights of ranks 0..n-1 under Zipf's law."""
+    return list(itertools.accumulate(
+        1 / (rank + 1) ** skew for rank in range(n)
+    ))
+
+
+def recipe_counts(users, recipes, skew, seed):
+    """Split recipes over users with a long tail of light users.
+
+    The user of rank r gets a share proportional to 1 / (r + 1) ** skew,
+    rounded so the counts add up to recipes. Ranks are shuffled so the
+    heavy users are spread over the user indexes.
+    """
+    weights = [1 / (rank + 1) ** skew for rank in range(users)]
+    total = sum(weights)
+    shares = [recipes * weight / total for weight in weights]
+    counts = [int(share) for share in shares]
+    by_remainder = sorted(
+        range(users),
+        key=lambda rank: shares[rank] - counts[rank],
+        reverse=True,
+    )
+    for rank in by_remainder[:recipes - sum(counts)]:
+        counts[rank] += 1
+
+    random.Random(seed).shuffle(counts)
+    return counts
+
+
+class Seeder:
+    """Generate and load users, recipes, tags and ingredients.
+
+    Every user's data is drawn from its own generator, seeded from the
+    seed and the user index, so the same options produce the same data
+    whichever way the users are split into chunks and processes.
+    """
+
+    def __init__(self, domain=DEFAULT_DOMAIN, seed=0, tags=1000,
+                 ingredients=5000, tags_per_recipe=3,
+                 ingredients_per_recipe=8, tag_skew=1.1,
+                 search_vectors=True):
+        self.domain = domain
+        self.seed = seed
+        self.tags = tags
+        self.ingredients = ingredients
+        self.tags_per_recipe = tags_per_recipe
+        self.ingredients_per_recipe = ingredients_per_recipe
+        self.search_vectors = search_vectors
+        self._tag_weights = zipf_cum_weights(tags, tag_skew)
+        self._ingredient_weights = zipf_cum_weights(ingredients, tag_skew)
+
+    def _pick(self, rng, cum_weights, mean):
+        """Return distinct Zipf distributed ranks, mean of them on average."""
+        count = rng.randint(1, 2 * mean - 1) if mean > 0 else 0
+        top = cum_weights[-1]
+        return {
+            bisect.bisect(cum_weights, rng.random() * top)
+            for _ in range(count)
+        }
+
+    def _recipes(self, index, count):
+        """Yield (title, description, minutes, price, tags, ingredients)."""
+        rng = random.Random(f'{self.seed}:{index}')
+        for _ in range(count):
+            tags = self._pick(rng, self._tag_weights, self.tags_per_recipe)
+            ingredients = self._pick(
+                rng, self._ingredient_weights, self.ingredients_per_recipe,
+            )
+            main = word(min(ingredients)) if ingredients else word(index)
+            title = f'{main} {rng.choice(DISHES)}'
+            description = ' '.join(
+                word(rank) for rank in sorted(ingredients)
+            ).capitalize()
+            cents = rng.randint(100, 5000)
+            yield (
+                title,
+                description,
+                rng.randint(5, 240),
+                f'{cents // 100}.{cents % 100:02d}',
+                tags,
+                ingredients,
+            )
+
+    def seed_chunk(self, chunk):
+        """Load users given as (index, recipe count) pairs in one commit.
+
+        Returns the number of recipes created.
+        """
+        User = get_user_model()
+        password = make_password(None)
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(
+                    email=f'user{index}@{self.domain}',
+                    name=f'{word(index)} {word(index * 7 + 3)}',
+                    password=password,
+                    is_active=True,
+                )
+                for index, _ in chunk
+            )
+
+            recipes, links = [], []
+            names = {Tag: {}, Ingredient: {}}
+            for user, (index, count) in zip(users, chunk):
+                for row in self._recipes(index, count):
+                    *fields, tags, ingredients = row
+                    recipes.append((user.id, *fields))
+                    links.append((user.id, tags, ingredients))
+                    for model, ranks in ((Tag, tags),
+                                         (Ingredient, ingredients)):
+                        names[model].setdefault(user.id, set()).update(ranks)
+
+            ids = {
+                model: self._load_names(model, used)
+                for model, used in names.items()
+            }
+            recipe_ids = reserve_ids(Recipe, len(recipes))
+            copy_into(
+                Recipe,
+                ['id', 'user_id', 'title', 'description', 'time_minutes',
+                 'price', 'link', 'image', 'image_status', 'image_variants'],
+                (
+                    (pk, *row, '', '', Recipe.ImageStatus.NONE, '{}')
+                    for pk, row in zip(recipe_ids, recipes)
+                ),
+            )
+            for field, model, column, position in [
+                ('tags', Tag, 'tag_id', 1),
+                ('ingredients', Ingredient, 'ingredient_id', 2),
+            ]:
+                copy_into(
+                    getattr(Recipe, field).through,
+                    ['recipe_id', column],
+                    (
+                        (pk, ids[model][link[0], rank])
+                        for pk, link in zip(recipe_ids, links)
+                        for rank in link[position]
+                    ),
+                )
+
+            if self.search_vectors and recipe_ids:
+                Recipe.objects.filter(
+                    user__in=[user.id for user in users],
+                ).update_search_vector()
+        return len(recipes)
+
+    def _load_names(self, model, used):
+        """Create the tags or ingredients each user uses.
+
+        Returns {(user id, rank): id}.
+        """
+        keys = [
+            (user_id, rank)
+            for user_id, ranks in used.items()
+            for rank in sorted(ranks)
+        ]
+        pks = reserve_ids(model, len(keys))
+        copy_into(
+            model,
+            ['id', 'user_id', 'name'],
+            (
+                (pk, user_id, word(rank))
+                for pk, (user_id, rank) in zip(pks, keys)
+            ),
+        )
+        return dict(zip(keys, pks))
+
+
+def chunks(counts, batch_size):
+    """Split (index, count) pairs into chunks of about batch_size recipes."""
+    chunk, size = [], 0
+    for index, count in enumerate(counts):
+        chunk.append((index, count))
+        size += count
+        if size >= batch_size or len(chunk) >= batch_size:
+            yield chunk
+            chunk, size = [], 0
+    if chunk:
+        yield chunk
+
+
+def _seed_in_worker(options, chunk):
+    """Load one chunk in a worker process."""
+    return Seeder(**options).seed_chunk(chunk)
+
+
+class Command(BaseCommand):
+    """Django command to seed synthetic data at production volumes."""
+
+    help = (
+        'Bulk load users, recipes, tags and ingredients with Zipfian tag '
+        'and ingredient popularity and a long tail of recipes per user.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument(
+            '--tags',
+            type=int,
+            default=1000,
+            help='Number of distinct tag names to draw from.',
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=5000,
+            help='Number of distinct ingredient names to draw from.',
+        )
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument(
+            '--tag-skew',
+            type=float,
+            default=1.1,
+            help='Zipf exponent of tag and ingredient popularity.',
+        )
+        parser.add_argument(
+            '--user-skew',
+            type=float,
+            default=1.0,
+            help='Zipf exponent of the number of recipes per user.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--domain', default=DEFAULT_DOMAIN)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20000,
+            help='Recipes loaded per transaction.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes loading chunks in parallel.',
+        )
+        parser.add_argument(
+            '--no-search-vectors',
+            action='store_true',
+            help='Leave the full-text search vectors empty.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        domain = options['domain']
+        if get_user_model().objects.filter(
+            email__endswith=f'@{domain}',
+        ).exists():
+            raise CommandError(f'Users @{domain} exist; pick another domain.')
+
+        start = time.perf_counter()
+        total = self.seed(options, self.stdout)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {options["users"]} users and {total} recipes '
+            f'in {elapsed:.1f}s.'
+        ))
+
+    @staticmethod
+    def seed(options, stdout=None):
+        """Seed data as described by command options, returning recipes."""
+        seeder_options = {
+            'domain': options['domain'],
+            'seed': options['seed'],
+            'tags': options['tags'],
+            'ingredients': options['ingredients'],
+            'tags_per_recipe': options['tags_per_recipe'],
+            'ingredients_per_recipe': options['ingredients_per_recipe'],
+            'tag_skew': options['tag_skew'],
+            'search_vectors': not options['no_search_vectors'],
+        }
+        counts = recipe_counts(
+            options['users'],
+            options['recipes'],
+            options['user_skew'],
+            options['seed'],
+        )
+        work = list(chunks(counts, options['batch_size']))
+
+        total = 0
+        if options['workers'] > 1:
+            # Forked workers must not share the parent's database connection.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options['workers'],
+                initializer=_init_worker,
+            ) as pool:
+                futures = [
+                    pool.submit(_seed_in_worker, seeder_options, chunk)
+                    for chunk in work
+                ]
+                for future in as_completed(futures):
+                    total += future.result()
+                    if stdout is not None:
+                        stdout.write(f'{total} recipes loaded')
+        else:
+            seeder = Seeder(**seeder_options)
+            for chunk in work:
+                total += seeder.seed_chunk(chunk)
+                if stdout is not None:
+                    stdout.write(f'{total} recipes loaded')
+        return total
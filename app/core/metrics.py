@@ -0,0 +1,315 @@
+"""
+Per-request timings reported as Server-Timing headers and Prometheus metrics.
+
+MetricsMiddleware times every request and, for a METRICS_SAMPLE_RATE share
+of them, also the number of queries and the time spent in SQL, in
+authentication and in serializing the response: building the data of
+serializers using core.serializers.TimedSerializerMixin, including the
+queries that runs (also counted as SQL), and rendering it. Sampled
+requests carry the breakdown in a Server-Timing header. Everything is
+aggregated into per-endpoint histograms, rendered in the Prometheus text
+format by render_metrics(). Metrics are kept per process.
+"""
+import asyncio
+import contextlib
+import contextvars
+import random
+import threading
+import time
+
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+
+from core.backends.postgresql.pool import pool_stats
+
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+COMPONENTS = ('db', 'auth', 'serialize')
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Time spent by one request in each component, in seconds."""
+
+    __slots__ = ('queries', 'db', 'auth', 'serialize')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.auth = 0.0
+        self.serialize = 0.0
+
+
+@contextlib.contextmanager
+def timed(component):
+    """Add the time spent in the block to a component of the request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        setattr(timings, component, getattr(timings, component) + elapsed)
+
+
+def query_timer(execute, sql, params, many, context):
+    """Database execute wrapper counting the queries of sampled requests."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - start
+        timings.queries += 1
+
+
+def install_query_timer(connection):
+    """Wrap the queries of a connection with query_timer."""
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, query_timer)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"') \
+        .replace('\n', r'\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}'
+
+
+class Histogram:
+    """A labelled histogram with cumulative buckets."""
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [count per bucket, sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [
+                    [0] * len(self.buckets), 0.0, 0,
+                ]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self._lock:
+            series = {
+                labels: (list(counts), total, count)
+                for labels, (counts, total, count) in self._series.items()
+            }
+        for labels, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = _labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            le = _labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{le} {count}')
+            names = _labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{names} {total}')
+            lines.append(f'{self.name}_count{names} {count}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    """A labelled monotonic counter."""
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} counter',
+        ]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(
+                f'{self.name}{_labels(self.labelnames, labels)} {value}'
+            )
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+ENDPOINT_LABELS = ('endpoint', 'method')
+
+requests_total = Counter(
+    'http_requests_total',
+    'Requests by endpoint, method and status code.',
+    ENDPOINT_LABELS + ('status',),
+)
+request_seconds = Histogram(
+    'http_request_duration_seconds',
+    'Time to produce the response, for every request.',
+    ENDPOINT_LABELS,
+    DURATION_BUCKETS,
+)
+component_seconds = {
+    component: Histogram(
+        f'http_request_{component}_seconds',
+        f'Time spent in {component} by sampled requests.',
+        ENDPOINT_LABELS,
+        DURATION_BUCKETS,
+    )
+    for component in COMPONENTS
+}
+request_queries = Histogram(
+    'http_request_db_queries',
+    'Database queries run by sampled requests.',
+    ENDPOINT_LABELS,
+    QUERY_BUCKETS,
+)
+METRICS = [requests_total, request_seconds, request_queries] \
+    + list(component_seconds.values())
+
+
+def observe(endpoint, method, status, elapsed, timings=None):
+    """Aggregate the timings of one request."""
+    labels = (endpoint, method)
+    requests_total.inc(labels + (str(status),))
+    request_seconds.observe(labels, elapsed)
+    if timings is None:
+        return
+    request_queries.observe(labels, timings.queries)
+    for component, histogram in component_seconds.items():
+        histogram.observe(labels, getattr(timings, component))
+
+
+def _pool_lines():
+    """Return gauges and counters of the database connection pools."""
+    stats = pool_stats()
+    if not stats:
+        return []
+    metrics = [
+        ('db_pool_connections', 'gauge', 'size',
+         'Open pooled connections.'),
+        ('db_pool_connections_in_use', 'gauge', 'in_use',
+         'Pooled connections checked out.'),
+        ('db_pool_waits_total', 'counter', 'waits',
+         'Checkouts that waited for a free connection.'),
+        ('db_pool_wait_seconds_total', 'counter', 'wait_seconds',
+         'Time spent waiting for a free connection.'),
+        ('db_pool_timeouts_total', 'counter', 'timeouts',
+         'Checkouts that gave up waiting.'),
+        ('db_pool_health_check_failures_total', 'counter',
+         'health_check_failures', 'Idle connections that failed a ping.'),
+    ]
+    lines = []
+    for name, kind, key, documentation in metrics:
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} {kind}')
+        for alias, values in sorted(stats.items()):
+            lines.append(f'{name}{_labels(("alias",), (alias,))} '
+                         f'{values[key]}')
+    return lines
+
+
+def render_metrics():
+    """Return all metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(_pool_lines())
+    return '\n'.join(lines) + '\n'
+
+
+def server_timing(timings, elapsed):
+    """Return the Server-Timing header value for a sampled request."""
+    return ', '.join([
+        f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries"',
+        f'auth;dur={timings.auth * 1000:.1f}',
+        f'serialize;dur={timings.serialize * 1000:.1f}',
+        f'total;dur={elapsed * 1000:.1f}',
+    ])
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """Time requests and aggregate the timings per endpoint."""
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self._acall(request)
+        timings, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                _current.reset(token)
+        return self._finish(request, response, timings, start)
+
+    async def _acall(self, request):
+        timings, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                _current.reset(token)
+        return self._finish(request, response, timings, start)
+
+    @staticmethod
+    def _start():
+        timings = token = None
+        if random.random() < settings.METRICS_SAMPLE_RATE:
+            timings = RequestTimings()
+            token = _current.set(timings)
+        return timings, token, time.perf_counter()
+
+    @staticmethod
+    def _finish(request, response, timings, start):
+        elapsed = time.perf_counter() - start
+        match = request.resolver_match
+        endpoint = match.view_name if match else '<unmatched>'
+        observe(endpoint, request.method, response.status_code, elapsed,
+                timings)
+        if timings is not None and settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = server_timing(timings, elapsed)
+        return response
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:22
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge tags and ingredients sharing a (user, name) into one row."""
+    Recipe = apps.get_model('core', 'Recipe')
+
+    for model_name, field_name in [('Tag', 'tags'),
+                                   ('Ingredient', 'ingredients')]:
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field_name).through
+        fk = f'{model_name.lower()}_id'
+
+        duplicates = model.objects.values('user_id', 'name').annotate(
+            keep_id=Min('id'),
+            total=Count('id'),
+        ).filter(total__gt=1)
+
+        for row in duplicates:
+            ids = list(model.objects.filter(
+                user_id=row['user_id'],
+                name=row['name'],
+            ).values_list('id', flat=True))
+            links = through.objects.filter(**{f'{fk}__in': ids})
+            recipe_ids = set(links.values_list('recipe_id', flat=True))
+
+            links.delete()
+            through.objects.bulk_create([
+                through(recipe_id=recipe_id, **{fk: row['keep_id']})
+                for recipe_id in recipe_ids
+            ])
+            model.objects.filter(id__in=ids).exclude(
+                id=row['keep_id']
+            ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
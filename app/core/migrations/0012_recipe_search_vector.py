@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:39
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipe_relation_reverse_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='core_recipe_search_gin_idx'),
+        ),
+        # Backfill existing recipes, mirroring core.models.SEARCH_VECTOR_SQL.
+        migrations.RunSQL(
+            """
+            UPDATE core_recipe SET search_vector =
+                setweight(to_tsvector('english', title), 'A')
+                || setweight(to_tsvector('english', coalesce((
+                    SELECT string_agg(t.name, ' ')
+                    FROM core_tag t
+                    JOIN core_recipe_tags rt ON rt.tag_id = t.id
+                    WHERE rt.recipe_id = core_recipe.id
+                ), '')), 'B')
+                || setweight(to_tsvector('english', coalesce((
+                    SELECT string_agg(i.name, ' ')
+                    FROM core_ingredient i
+                    JOIN core_recipe_ingredients ri
+                        ON ri.ingredient_id = i.id
+                    WHERE ri.recipe_id = core_recipe.id
+                ), '')), 'B')
+                || setweight(to_tsvector('english', description), 'C');
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_trigram_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(choices=[('none', 'None'), ('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='none', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        # Queue existing uploads for the process_images command.
+        migrations.RunSQL(
+            "UPDATE core_recipe SET image_status = 'pending' "
+            "WHERE image IS NOT NULL AND image <> '';",
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:05
+
+import core.models
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recipe_image_processing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(null=True, storage=core.storage.ContentAddressedStorage(), upload_to=core.models.recipe_image_file_path),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('image__gt', '')), fields=['image'], name='core_recipe_image_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imageblob',
+            index=models.Index(condition=models.Q(('refcount', 0)), fields=['updated_at'], name='core_imageblob_unused_idx'),
+        ),
+        # Count references to images uploaded before blobs were tracked.
+        migrations.RunSQL(
+            """
+            INSERT INTO core_imageblob (name, refcount, updated_at)
+            SELECT image, count(*), now()
+            FROM core_recipe
+            WHERE image > ''
+            GROUP BY image;
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:49
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_revoked_token'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='core_recipe_search_gin_idx',
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['user', 'search_vector'], name='core_recipe_user_search_idx', opclasses=['int8_ops', 'tsvector_ops']),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-17 07:30
+
+import os
+import shutil
+
+from django.conf import settings
+from django.db import migrations
+
+
+def move_uploads(source_root, target_root):
+    """Move the stored recipe images from source_root to target_root."""
+    def move(apps, schema_editor):
+        ImageBlob = apps.get_model('core', 'ImageBlob')
+        names = ImageBlob.objects.values_list('name', flat=True)
+        for name in names.iterator():
+            source = os.path.join(source_root(), name)
+            target = os.path.join(target_root(), name)
+            if not os.path.isfile(source) or os.path.exists(target):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(source, target)
+    return move
+
+
+def media_root():
+    return settings.MEDIA_ROOT
+
+
+def private_media_root():
+    return settings.PRIVATE_MEDIA_ROOT
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_recipe_user_search_index'),
+    ]
+
+    operations = [
+        # Raw uploads leave the served media tree; their variants stay.
+        migrations.RunPython(
+            move_uploads(media_root, private_media_root),
+            move_uploads(private_media_root, media_root),
+        ),
+    ]
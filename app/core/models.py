@@ -5,21 +5,88 @@ import uuid
 import os
 
 
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, connections
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.utils import timezone
+
+
+# Registers the iprefix lookup used by tag and ingredient autocomplete.
+from core import lookups  # noqa: F401
+from core.storage import ContentAddressedStorage
+
+
+RECIPE_IMAGE_DIR = os.path.join('uploads', 'recipe')
 
 
 def recipe_image_file_path(instance, filename):
-    """Generate file path for new recipe image."""
+    """Generate file path for new recipe image.
+
+    ContentAddressedStorage keeps the directory and extension and replaces
+    the file name with the digest of the content.
+    """
     ext = os.path.splitext(filename)[1]
     filename = f'{uuid.uuid4()}{ext}'
 
-    return os.path.join('uploads', 'recipe', filename)
+    return os.path.join(RECIPE_IMAGE_DIR, filename)
+
+
+class ImageBlobManager(models.Manager):
+    """Reference counting for content-addressed image files."""
+
+    def acquire(self, name):
+        """Add a reference to the stored file name."""
+        opts = self.model._meta
+        quote = connections[self.db].ops.quote_name
+        table = quote(opts.db_table)
+        sql = (
+            f'INSERT INTO {table} (name, refcount, updated_at) '
+            f'VALUES (%s, 1, %s) '
+            f'ON CONFLICT (name) DO UPDATE SET '
+            f'refcount = {table}.refcount + 1, '
+            f'updated_at = EXCLUDED.updated_at'
+        )
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, [name, timezone.now()])
+
+    def release(self, name):
+        """Drop a reference to the stored file name."""
+        self.filter(name=name, refcount__gt=0).update(
+            refcount=models.F('refcount') - 1,
+            updated_at=timezone.now(),
+        )
+
+    def touch(self, name):
+        """Mark a file as in use, returning False if it is not tracked."""
+        return bool(self.filter(name=name).update(updated_at=timezone.now()))
+
+
+class ImageBlob(models.Model):
+    """A stored image file and the number of recipes using it."""
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    objects = ImageBlobManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['updated_at'],
+                name='core_imageblob_unused_idx',
+                condition=models.Q(refcount=0),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return self.name
 
 
 class UserManager(BaseUserManager):
@@ -49,6 +116,51 @@ class UserManager(BaseUserManager):
         return user
 
 
+class UserNamedManager(models.Manager):
+    """Manager for per-user named objects such as tags and ingredients."""
+
+    def get_or_create_many(self, user, names):
+        """Return objects for names, creating missing ones in one upsert."""
+        names = set(names)
+        if not names:
+            return []
+
+        objs = {
+            obj.name: obj
+            for obj in self.filter(user=user, name__in=names)
+        }
+        missing = sorted(names - objs.keys())
+        if missing:
+            for obj in self._upsert(user, missing):
+                objs[obj.name] = obj
+
+        return list(objs.values())
+
+    def _upsert(self, user, names):
+        """Insert names for user with INSERT ... ON CONFLICT, return rows."""
+        opts = self.model._meta
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        user_column = quote(opts.get_field('user').column)
+        name_column = quote(opts.get_field('name').column)
+
+        # DO UPDATE rather than DO NOTHING so that RETURNING also yields
+        # rows inserted by a concurrent request that won the race.
+        sql = (
+            f'INSERT INTO {quote(opts.db_table)} '
+            f'({user_column}, {name_column}) '
+            f'SELECT %s, unnest(%s::varchar[]) '
+            f'ON CONFLICT ({user_column}, {name_column}) '
+            f'DO UPDATE SET {name_column} = EXCLUDED.{name_column} '
+            f'RETURNING {quote(opts.pk.column)}, {name_column}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user.pk, list(names)])
+            rows = cursor.fetchall()
+
+        return [self.model(pk=pk, user=user, name=name) for pk, name in rows]
+
+
 class User(AbstractBaseUser, PermissionsMixin):
     """User in the system."""
 
@@ -62,8 +174,54 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+SEARCH_CONFIG = 'english'
+
+# Title weighs most, then tag and ingredient names, then the description.
+SEARCH_VECTOR_SQL = """
+UPDATE core_recipe SET search_vector =
+    setweight(to_tsvector(%s::regconfig, title), 'A')
+    || setweight(to_tsvector(%s::regconfig, coalesce((
+        SELECT string_agg(t.name, ' ')
+        FROM core_tag t
+        JOIN core_recipe_tags rt ON rt.tag_id = t.id
+        WHERE rt.recipe_id = core_recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector(%s::regconfig, coalesce((
+        SELECT string_agg(i.name, ' ')
+        FROM core_ingredient i
+        JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id
+        WHERE ri.recipe_id = core_recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector(%s::regconfig, description), 'C')
+"""
+
+
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet for recipes."""
+
+    def update_search_vector(self):
+        """Recompute the stored full-text search vector of these recipes."""
+        try:
+            ids_sql, ids_params = self.values('pk').query.sql_with_params()
+        except EmptyResultSet:
+            return
+
+        sql = f'{SEARCH_VECTOR_SQL}WHERE id IN ({ids_sql})'
+        params = [SEARCH_CONFIG] * SEARCH_VECTOR_SQL.count('%s')
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params + list(ids_params))
+
+
 class Recipe(models.Model):
     """Recipe object."""
+
+    class ImageStatus(models.TextChoices):
+        NONE = 'none'
+        PENDING = 'pending'
+        PROCESSING = 'processing'
+        READY = 'ready'
+        FAILED = 'failed'
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
@@ -71,12 +229,54 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
 
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=ContentAddressedStorage(),
+    )
+    image_status = models.CharField(
+        max_length=10,
+        choices=ImageStatus.choices,
+        default=ImageStatus.NONE,
+        editable=False,
+    )
+    image_variants = models.JSONField(default=dict, editable=False)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-id'],
+                name='core_recipe_user_id_idx',
+            ),
+            # Searches are per user, so user_id leads (int8_ops from
+            # btree_gin) to keep other users' matches out of the scan.
+            GinIndex(
+                fields=['user', 'search_vector'],
+                name='core_recipe_user_search_idx',
+                opclasses=['int8_ops', 'tsvector_ops'],
+            ),
+            models.Index(
+                fields=['image'],
+                name='core_recipe_image_idx',
+                condition=models.Q(image__gt=''),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored image to count references when it changes.
+        if 'image' in instance.__dict__:
+            instance._stored_image = instance.__dict__['image']
+        return instance
 
     def __str__(self) -> str:
         return self.title
@@ -90,6 +290,27 @@ class Tag(models.Model):
     )
     name = models.CharField(max_length=255)
 
+    objects = UserNamedManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-name', '-id'],
+                name='core_tag_user_name_id_idx',
+            ),
+            GinIndex(
+                fields=['user', 'name'],
+                opclasses=['int8_ops', 'gin_trgm_ops'],
+                name='core_tag_user_name_trgm_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='core_tag_user_name_uniq',
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
@@ -102,5 +323,58 @@ class Ingredient(models.Model):
     )
     name = models.CharField(max_length=255)
 
+    objects = UserNamedManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-name', '-id'],
+                name='core_ingr_user_name_id_idx',
+            ),
+            GinIndex(
+                fields=['user', 'name'],
+                opclasses=['int8_ops', 'gin_trgm_ops'],
+                name='core_ingr_user_name_trgm_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='core_ingredient_user_name_uniq',
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.name
+
+
+class ImportProgress(models.Model):
+    """Number of records imported from a source file, for resuming."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    source = models.CharField(max_length=1024)
+    records = models.PositiveBigIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'source'],
+                name='core_importprogress_user_source_uniq',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.source}: {self.records}'
+
+
+class RevokedToken(models.Model):
+    """A signed token no longer accepted before its expiry."""
+    jti = models.CharField(max_length=32, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self) -> str:
+        return self.jti
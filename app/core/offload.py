@@ -0,0 +1,128 @@
+"""
+Async views that run the ORM in a bounded thread pool.
+
+Under ASGI, Django runs every sync view on one shared thread, so a single
+slow query stalls all requests. Wrapping a view with
+``offload_safe_methods`` makes it async: safe requests run the sync view
+in a pool with one thread (and so one database connection) per slot of
+the connection pool, while the event loop is free to serve slow clients.
+When every thread is busy and ASYNC_DB_MAX_WAITING requests are queued,
+further requests are rejected with 503 instead of piling up.
+
+The pool only runs the view. The body of a streaming response, such as
+the recipe export, is produced later, chunk by chunk, by the
+core.asgi.ASGIHandler that app/asgi.py serves.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class PoolSaturated(Exception):
+    """Every thread is busy and the wait queue is full."""
+
+
+class DatabaseThreadPool:
+    """A thread pool with a bounded number of waiting calls."""
+
+    def __init__(self, max_workers, max_waiting):
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_waiting
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='db',
+        )
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self):
+        """Number of calls running or waiting for a thread."""
+        return self._in_flight
+
+    async def run(self, func, *args, **kwargs):
+        """Run func in the pool, raising PoolSaturated when it is full."""
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                raise PoolSaturated()
+            self._in_flight += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            call = functools.partial(self._call, func, *args, **kwargs)
+            # Carry context variables, such as request timings, over to
+            # the pool thread like sync_to_async does.
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self.executor, context.run, call)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    @staticmethod
+    def _call(func, *args, **kwargs):
+        # Pool threads keep their own connections, which are not covered
+        # by the request_started/request_finished handlers.
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide database thread pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DatabaseThreadPool(
+                max_workers=settings.ASYNC_DB_WORKERS,
+                max_waiting=settings.ASYNC_DB_MAX_WAITING,
+            )
+    return _pool
+
+
+def _render(view, request, *args, **kwargs):
+    """Call a sync view and render its response in the same thread."""
+    response = view(request, *args, **kwargs)
+    if callable(getattr(response, 'render', None)) \
+            and not response.is_rendered:
+        response.render()
+    return response
+
+
+def offload_safe_methods(view):
+    """Wrap a sync view in an async view running reads in the pool."""
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return await sync_to_async(view)(request, *args, **kwargs)
+
+        try:
+            return await get_pool().run(
+                _render, view, request, *args, **kwargs
+            )
+        except PoolSaturated:
+            response = JsonResponse(
+                {'detail': 'Server busy, retry shortly.'},
+                status=503,
+            )
+            response['Retry-After'] = '1'
+            return response
+
+    return async_view
@@ -0,0 +1,15 @@
+"""
+Renderers for the API.
+"""
+from rest_framework.renderers import JSONRenderer
+
+
+from core import metrics
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSON renderer reporting its time as the request's serialization."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with metrics.timed('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
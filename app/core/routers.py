@@ -0,0 +1,105 @@
+"""
+Database routing of API reads to replicas.
+
+Views using ReplicaReadMixin run the queries of safe requests on one of
+DATABASE_REPLICAS once the user is authenticated; everything else, and
+all writes, goes to the primary. A successful write pins the user to the
+primary for REPLICA_PIN_SECONDS so they read their own changes while the
+replicas catch up. Pins live in the REPLICA_PIN_CACHE alias of CACHES,
+which must be shared between workers for the pin to hold across them.
+"""
+import contextvars
+import random
+
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+
+def pin_key(user):
+    return f'replica-pin:{user.pk}'
+
+
+def pin_to_primary(user):
+    """Send the user's reads to the primary for the pin window."""
+    caches[settings.REPLICA_PIN_CACHE].set(
+        pin_key(user), True, settings.REPLICA_PIN_SECONDS,
+    )
+
+
+def is_pinned(user):
+    """Return whether the user wrote within the pin window."""
+    return caches[settings.REPLICA_PIN_CACHE].get(pin_key(user), False)
+
+
+def choose_replica():
+    """Return the alias of a replica, or None when there are none."""
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas:
+        return None
+    return random.choice(replicas)
+
+
+class ReplicaRouter:
+    """Route reads to the replica chosen for the current request."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Run the reads of safe requests on a replica after authentication.
+
+    Authentication and permission checks read from the primary, so a
+    freshly created token or user is always found. Queries evaluated after
+    the view returns, such as those of a streamed response, also run on
+    the primary.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS or is_pinned(request.user):
+            return
+        alias = choose_replica()
+        if alias is not None:
+            self._read_alias_token = _read_alias.set(alias)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs,
+        )
+        if request.method not in SAFE_METHODS \
+                and response.status_code < 400 \
+                and request.user.is_authenticated:
+            pin_to_primary(request.user)
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            token = self.__dict__.pop('_read_alias_token', None)
+            if token is not None:
+                _read_alias.reset(token)
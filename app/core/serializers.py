@@ -0,0 +1,31 @@
+"""
+Serializers for the API.
+"""
+from rest_framework import serializers
+
+
+from core import metrics
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """List serializer reporting its data as the request's serialization."""
+
+    @property
+    def data(self):
+        with metrics.timed('serialize'):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """
+    Report building a serializer's data as the request's serialization.
+
+    Only .data is timed, which views read from the outermost serializer;
+    nested serializers are built by their parent's to_representation().
+    Set Meta.list_serializer_class to TimedListSerializer to time lists.
+    """
+
+    @property
+    def data(self):
+        with metrics.timed('serialize'):
+            return super().data
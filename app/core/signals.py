@@ -0,0 +1,61 @@
+"""
+Signal handlers for the core app.
+"""
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+
+from core import metrics
+from core.authentication import invalidate_token
+from core.models import ImageBlob, Recipe
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a token from cache once it is deleted."""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Re-resolve a user's tokens after the user changes."""
+    if created:
+        return
+
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    for key in keys:
+        invalidate_token(key)
+
+
+@receiver(post_save, sender=Recipe)
+def count_image_reference(sender, instance, update_fields=None, **kwargs):
+    """Move the recipe's image reference when its image changes."""
+    if update_fields is not None and 'image' not in update_fields:
+        return
+
+    stored = getattr(instance, '_stored_image', None) or None
+    current = instance.image.name or None
+    if stored == current:
+        return
+
+    if current:
+        ImageBlob.objects.acquire(current)
+    if stored:
+        ImageBlob.objects.release(stored)
+    instance._stored_image = current
+
+
+@receiver(post_delete, sender=Recipe)
+def release_image_reference(sender, instance, **kwargs):
+    """Drop the deleted recipe's image reference."""
+    if instance.image.name:
+        ImageBlob.objects.release(instance.image.name)
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    """Count the queries of sampled requests on every connection."""
+    metrics.install_query_timer(connection)
@@ -0,0 +1,94 @@
+"""
+Content-addressed file storage for recipe images.
+"""
+import hashlib
+import os
+
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+
+EXTENSION_ALIASES = {'.jpeg': '.jpg'}
+
+
+def file_digest(content, chunk_size=64 * 1024):
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(chunk_size):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def content_name(directory, digest, ext):
+    """Return the storage name for content with the given digest."""
+    ext = ext.lower()
+    ext = EXTENSION_ALIASES.get(ext, ext)
+    return os.path.join(directory, digest[:2], digest[2:4], f'{digest}{ext}')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names files by the SHA-256 of their bytes.
+
+    The name passed to save() only contributes its directory and
+    extension. Identical uploads map to the same name and are written once,
+    so a stored file never changes and can be cached indefinitely. Files
+    are shared, so they are tracked by ImageBlob reference counts and only
+    removed by the gc_images command, never by FieldFile.delete().
+
+    Files live under PRIVATE_MEDIA_ROOT and have no URL: they are raw
+    uploads, metadata included, and only their processed variants are
+    served.
+    """
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(
+            self._location, settings.PRIVATE_MEDIA_ROOT,
+        )
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'PRIVATE_MEDIA_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+    def url(self, name):
+        raise ValueError(f'{name} is a private upload and is not served.')
+
+    def get_available_name(self, name, max_length=None):
+        # _save() picks the final name, which is unique by construction.
+        return name
+
+    def _save(self, name, content):
+        # core.models imports this module for the Recipe.image field.
+        from core.models import ImageBlob
+
+        directory, filename = os.path.split(name)
+        ext = os.path.splitext(filename)[1]
+        name = content_name(directory, file_digest(content), ext)
+
+        # Touching the blob keeps gc_images from reclaiming it while this
+        # upload is attached. A file without a blob row may be mid-GC, so
+        # it is written again.
+        if self.exists(name):
+            if ImageBlob.objects.touch(name):
+                return name
+            self.delete_unreferenced(name)
+
+        return super()._save(name, content)
+
+    def delete(self, name):
+        # Only gc_images deletes shared files, through delete_unreferenced.
+        pass
+
+    def delete_unreferenced(self, name):
+        """Delete a file that no recipe references anymore."""
+        super().delete(name)
@@ -0,0 +1,309 @@
+"""
+Tests for cached token authentication.
+"""
+from unittest.mock import patch
+
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+
+from core import tokens
+from core.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+    local_token_cache,
+)
+from core.cache import LocalTTLCache
+
+
+ME_URL = reverse('user:me')
+SIGNED_TOKEN_URL = reverse('user:signed-token')
+REFRESH_URL = reverse('user:token-refresh')
+REVOKE_URL = reverse('user:token-revoke')
+KEYS = [('k1', 'first-secret')]
+
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-tokens',
+    },
+}
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    """Create and return an active user."""
+    return get_user_model().objects.create_user(
+        email, password, is_active=True
+    )
+
+
+class LocalTTLCacheTests(TestCase):
+    """Test the in-process LRU cache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest unused entry is evicted when full."""
+        cache = LocalTTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    @patch('core.cache.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        """Test entries are dropped after their TTL."""
+        patched_monotonic.return_value = 100
+        cache = LocalTTLCache(ttl=5)
+        cache.set('a', 1)
+
+        patched_monotonic.return_value = 104
+        self.assertEqual(cache.get('a'), 1)
+
+        patched_monotonic.return_value = 105
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test token lookups are cached and invalidated."""
+
+    def setUp(self):
+        local_token_cache.clear()
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        return super().setUp()
+
+    def tearDown(self):
+        local_token_cache.clear()
+        return super().tearDown()
+
+    def test_cached_token_skips_database(self):
+        """Test a repeated request does not look up the token again."""
+        with self.assertNumQueries(1):
+            resp = self.client.get(ME_URL)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            resp = self.client.get(ME_URL)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['email'], self.user.email)
+
+    def test_cached_user_not_shared(self):
+        """Test the cache holds no password and requests get own users."""
+        auth = CachedTokenAuthentication()
+        auth.authenticate_credentials(self.token.key)
+
+        first, _ = auth.authenticate_credentials(self.token.key)
+        first.name = 'Unsaved name'
+        second, _ = auth.authenticate_credentials(self.token.key)
+
+        self.assertNotIn('password', local_token_cache.get(self.token.key))
+        self.assertIsNot(first, second)
+        self.assertEqual(second.name, self.user.name)
+        self.assertTrue(second.check_password('testpass123'))
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is rejected and not cached."""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        resp = self.client.get(ME_URL)
+
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(len(local_token_cache), 0)
+
+    def test_deleted_token_invalidated(self):
+        """Test deleting a token stops it from authenticating."""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        resp = self.client.get(ME_URL)
+
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test deactivating a user stops their token authenticating."""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        resp = self.client.get(ME_URL)
+
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_refreshes_user(self):
+        """Test changing the password drops the cached user."""
+        self.client.get(ME_URL)
+
+        self.user.set_password('newpass123')
+        self.user.save()
+
+        with self.assertNumQueries(1):
+            resp = self.client.get(ME_URL)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    @override_settings(
+        CACHES=SHARED_CACHES,
+        TOKEN_AUTH_SHARED_CACHE='tokens',
+    )
+    def test_shared_cache_used_across_processes(self):
+        """Test a lookup cached by another process skips the database."""
+        self.client.get(ME_URL)
+        local_token_cache.clear()
+
+        with self.assertNumQueries(0):
+            resp = self.client.get(ME_URL)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+        self.token.delete()
+        local_token_cache.clear()
+        resp = self.client.get(ME_URL)
+
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(SIGNED_TOKEN_KEYS=KEYS)
+class SignedTokenAuthenticationTests(TestCase):
+    """Test stateless signed access and refresh tokens."""
+
+    def setUp(self):
+        tokens.revocations.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        resp = self.client.post(SIGNED_TOKEN_URL, {
+            'email': 'user@example.com',
+            'password': 'testpass123',
+        })
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.pair = resp.data
+
+    def get_me(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return self.client.get(ME_URL)
+
+    def test_access_token_skips_database(self):
+        """Test an access token authenticates without queries."""
+        request = APIRequestFactory().get(
+            ME_URL, HTTP_AUTHORIZATION=f'Bearer {self.pair["access"]}',
+        )
+        # Load the revocation list, which is reloaded every few seconds.
+        self.assertNotIn('unknown', tokens.revocations)
+
+        with self.assertNumQueries(0):
+            user, claims = SignedTokenAuthentication().authenticate(
+                Request(request),
+            )
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.email, self.user.email)
+        self.assertEqual(claims['typ'], tokens.ACCESS)
+        self.assertEqual(
+            self.get_me(self.pair['access']).data['name'], self.user.name,
+        )
+
+    def test_update_through_access_token(self):
+        """Test saving the token's user keeps unloaded fields intact."""
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.pair["access"]}',
+        )
+
+        resp = self.client.patch(ME_URL, {'name': 'New name'})
+
+        self.user.refresh_from_db()
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user.name, 'New name')
+        self.assertTrue(self.user.check_password('testpass123'))
+
+    def test_tampered_and_expired_tokens_rejected(self):
+        """Test forged, expired and refresh tokens do not authenticate."""
+        kid, payload, signature = self.pair['access'].split('.')
+        claims = tokens.unsign(self.pair['access'], tokens.ACCESS)
+        forged = tokens._b64encode(b'{"typ":"access","sub":1}')
+        with patch('core.tokens.time.time', return_value=claims['exp']):
+            expired = self.get_me(self.pair['access'])
+
+        for token in [f'{kid}.{forged}.{signature}', self.pair['refresh'],
+                      'garbage']:
+            with self.subTest(token=token):
+                resp = self.get_me(token)
+                self.assertEqual(
+                    resp.status_code, status.HTTP_401_UNAUTHORIZED,
+                )
+        self.assertEqual(expired.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_key_rotation(self):
+        """Test tokens signed with a retired key verify until it is gone."""
+        new_keys = [('k2', 'second-secret')] + KEYS
+
+        with override_settings(SIGNED_TOKEN_KEYS=new_keys):
+            old = self.get_me(self.pair['access'])
+            access = tokens.issue(self.user)['access']
+        with override_settings(SIGNED_TOKEN_KEYS=new_keys[:1]):
+            retired = self.get_me(self.pair['access'])
+            new = self.get_me(access)
+
+        self.assertTrue(access.startswith('k2.'))
+        self.assertEqual(old.status_code, status.HTTP_200_OK)
+        self.assertEqual(retired.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(new.status_code, status.HTTP_200_OK)
+
+    def test_refresh_token_is_single_use(self):
+        """Test a refresh token issues a new pair exactly once."""
+        client = APIClient()
+
+        resp = client.post(REFRESH_URL, {'token': self.pair['refresh']})
+        reused = client.post(REFRESH_URL, {'token': self.pair['refresh']})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.get_me(resp.data['access']).status_code,
+            status.HTTP_200_OK,
+        )
+        self.assertEqual(reused.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_password_change_stops_refresh(self):
+        """Test refresh tokens stop working after a password change."""
+        self.user.set_password('newpass123')
+        self.user.save()
+
+        resp = APIClient().post(REFRESH_URL, {'token': self.pair['refresh']})
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revoked_access_token_rejected(self):
+        """Test revoked tokens are rejected, by other processes too."""
+        resp = APIClient().post(REVOKE_URL, {'token': self.pair['access']})
+        local = self.get_me(self.pair['access'])
+        tokens.revocations.clear()
+        other = self.get_me(self.pair['access'])
+
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(local.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(other.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(SIGNED_TOKEN_KEYS=[])
+    def test_disabled_without_keys(self):
+        """Test signed tokens are unavailable when no key is configured."""
+        resp = APIClient().post(SIGNED_TOKEN_URL, {
+            'email': 'user@example.com',
+            'password': 'testpass123',
+        })
+
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.get_me(self.pair['access']).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
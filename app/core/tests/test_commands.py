@@ -1,14 +1,32 @@
 """
 Test custom Django management commands.
 """
+import json
+import os
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
 
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+
+
+from core.models import ImageBlob, ImportProgress, Recipe, Tag, Ingredient
+from recipe import cache
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -33,3 +51,432 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(6, patched_check.call_count)
         patched_check.assert_called_with(databases=['default'])
+
+
+def write_jsonl(directory, name, records):
+    """Write records to a JSONL file and return its path."""
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    return path
+
+
+def sample_record(index, **kwargs):
+    """Return a recipe record for import."""
+    record = {
+        'title': f'Recipe {index}',
+        'time_minutes': 10,
+        'price': '2.50',
+        'tags': ['Dinner', {'name': f'Tag {index}'}],
+        'ingredients': ['Salt'],
+    }
+    record.update(kwargs)
+    return record
+
+
+class ImportRecipesCommandTests(TestCase):
+    """Test the import_recipes command."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.dir = tempfile.TemporaryDirectory()
+        return super().setUp()
+
+    def tearDown(self):
+        self.dir.cleanup()
+        return super().tearDown()
+
+    def test_import_jsonl(self):
+        """Test importing recipes with deduplicated tags and ingredients."""
+        Tag.objects.create(user=self.user, name='Dinner')
+        path = write_jsonl(
+            self.dir.name,
+            'recipes.jsonl',
+            [sample_record(i) for i in range(5)],
+        )
+        out = StringIO()
+
+        call_command(
+            'import_recipes', path,
+            user=self.user.email, batch_size=2, stdout=out,
+        )
+
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 5)
+        self.assertEqual(Tag.objects.filter(name='Dinner').count(), 1)
+        self.assertEqual(Tag.objects.count(), 6)
+        self.assertEqual(Ingredient.objects.count(), 1)
+        recipe = recipes.get(title='Recipe 3')
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)),
+            {'Dinner', 'Tag 3'},
+        )
+        self.assertEqual(recipe.ingredients.get().name, 'Salt')
+        self.assertFalse(recipes.filter(search_vector__isnull=True).exists())
+        self.assertIn('4 records imported', out.getvalue())
+        self.assertIn('Imported 5 recipes.', out.getvalue())
+
+    def test_import_csv(self):
+        """Test importing recipes from CSV as written by the export."""
+        path = os.path.join(self.dir.name, 'recipes.csv')
+        with open(path, 'w') as f:
+            f.write(
+                'id,title,time_minutes,price,link,description,image,'
+                'tags,ingredients\n'
+                '7,Soup,15,3.20,,Hot,,Lunch;Vegan,Water;Salt\n'
+            )
+
+        call_command(
+            'import_recipes', path, user=self.user.email, stdout=StringIO(),
+        )
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, 'Soup')
+        self.assertEqual(recipe.description, 'Hot')
+        self.assertEqual(recipe.tags.count(), 2)
+        self.assertEqual(recipe.ingredients.count(), 2)
+
+    def test_resume_after_failure(self):
+        """Test a failed import resumes after the last committed batch."""
+        records = [sample_record(i) for i in range(5)]
+        records[3] = sample_record(3, price='not a price')
+        path = write_jsonl(self.dir.name, 'recipes.jsonl', records)
+
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_recipes', path,
+                user=self.user.email, batch_size=2, stdout=StringIO(),
+            )
+
+        self.assertEqual(Recipe.objects.count(), 2)
+        progress = ImportProgress.objects.get(user=self.user)
+        self.assertEqual(progress.records, 2)
+        self.assertFalse(progress.completed)
+
+        records[3] = sample_record(3)
+        write_jsonl(self.dir.name, 'recipes.jsonl', records)
+        call_command(
+            'import_recipes', path,
+            user=self.user.email, batch_size=2, resume=True,
+            stdout=StringIO(),
+        )
+
+        titles = sorted(Recipe.objects.values_list('title', flat=True))
+        self.assertEqual(titles, [f'Recipe {i}' for i in range(5)])
+        progress.refresh_from_db()
+        self.assertTrue(progress.completed)
+
+    def test_invalid_json(self):
+        """Test malformed JSON fails with the line number."""
+        path = os.path.join(self.dir.name, 'recipes.jsonl')
+        with open(path, 'w') as f:
+            f.write('{"title": "Soup"}\n\n{"title": \n')
+
+        with self.assertRaisesRegex(CommandError, 'line 3 is not valid'):
+            call_command(
+                'import_recipes', path, user='user@example.com',
+                stdout=StringIO(),
+            )
+
+    @override_settings(RECIPE_RESPONSE_CACHE='default')
+    def test_import_invalidates_cached_responses(self):
+        """Test each committed batch bumps the user's data version."""
+        path = write_jsonl(self.dir.name, 'recipes.jsonl', [
+            {'title': 'Soup', 'time_minutes': 5, 'price': '1.00'},
+        ])
+        before = cache.get_data_version(self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                'import_recipes', path, user='user@example.com',
+                stdout=StringIO(),
+            )
+
+        self.assertNotEqual(cache.get_data_version(self.user.pk), before)
+
+    def test_unknown_user(self):
+        """Test importing for a missing user fails."""
+        path = write_jsonl(self.dir.name, 'recipes.jsonl', [])
+
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', path, user='nobody@example.com')
+
+
+class ImportRecipesParallelTests(TransactionTestCase):
+    """Test importing several files with a process pool."""
+
+    def test_import_files_in_parallel(self):
+        """Test each file is imported by a worker process."""
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [
+                write_jsonl(
+                    directory,
+                    f'part{n}.jsonl',
+                    [sample_record(f'{n}-{i}') for i in range(3)],
+                )
+                for n in range(3)
+            ]
+
+            call_command(
+                'import_recipes', *paths,
+                user=user.email, workers=2, stdout=StringIO(),
+            )
+
+        self.assertEqual(Recipe.objects.filter(user=user).count(), 9)
+        self.assertEqual(Tag.objects.filter(name='Dinner').count(), 1)
+        self.assertEqual(ImportProgress.objects.filter(
+            completed=True
+        ).count(), 3)
+
+
+class BenchmarkSerializersCommandTests(TestCase):
+    """Test the benchmark_serializers command."""
+
+    def test_benchmark_reports_sizes(self):
+        """Test the benchmark checks output and leaves no data behind."""
+        out = StringIO()
+
+        call_command(
+            'benchmark_serializers',
+            sizes=[5, 20], repeat=1, check=True, stdout=out,
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[1].split()[0], '5')
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class BenchmarkAuthCommandTests(TestCase):
+    """Test the benchmark_auth command."""
+
+    def test_benchmark_reports_each_path(self):
+        """Test every path is measured and no data is left behind."""
+        out = StringIO()
+
+        call_command('benchmark_auth', iterations=3, logins=1, stdout=out)
+
+        rows = {
+            line[:22].strip(): line[22:].split()
+            for line in out.getvalue().splitlines()[1:]
+        }
+        self.assertEqual(rows['signed access token'][1], '0.00')
+        self.assertEqual(rows['token'][1], '1.00')
+        self.assertIn('refresh token', rows)
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class GcImagesCommandTests(TestCase):
+    """Test the gc_images command."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.private = tempfile.TemporaryDirectory()
+        self.addCleanup(self.private.cleanup)
+        settings = self.settings(
+            MEDIA_ROOT=self.media.name,
+            PRIVATE_MEDIA_ROOT=self.private.name,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+
+    def _recipe_with_image(self, data):
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Recipe',
+            time_minutes=5,
+            price='2.50',
+        )
+        recipe.image.save('photo.jpg', ContentFile(data))
+        return recipe
+
+    def _stored(self, name):
+        return os.path.exists(os.path.join(self.private.name, name))
+
+    def _exists(self, name):
+        return os.path.exists(os.path.join(self.media.name, name))
+
+    def test_gc_deletes_unreferenced_images(self):
+        """Test unreferenced images and variants are deleted in batches."""
+        kept = self._recipe_with_image(b'kept')
+        names = []
+        for index in range(3):
+            recipe = self._recipe_with_image(f'gone {index}'.encode())
+            names.append(recipe.image.name)
+            variant = f'{os.path.splitext(recipe.image.name)[0]}/small.webp'
+            default_storage.save(variant, ContentFile(b'variant'))
+            recipe.delete()
+
+        out = StringIO()
+        call_command('gc_images', grace=0, batch_size=2, stdout=out)
+
+        self.assertIn('Deleted 3 images.', out.getvalue())
+        self.assertTrue(self._stored(kept.image.name))
+        for name in names:
+            self.assertFalse(self._stored(name))
+            self.assertFalse(self._exists(os.path.splitext(name)[0]))
+        self.assertEqual(
+            list(ImageBlob.objects.values_list('name', flat=True)),
+            [kept.image.name],
+        )
+
+    def test_gc_keeps_recent_images(self):
+        """Test images released within the grace period are kept."""
+        recipe = self._recipe_with_image(b'recent')
+        name = recipe.image.name
+        recipe.delete()
+
+        call_command('gc_images', stdout=StringIO())
+
+        self.assertTrue(self._stored(name))
+
+    def test_gc_orphans(self):
+        """Test files that were never counted are deleted with --orphans."""
+        recipe = self._recipe_with_image(b'orphan')
+        name = recipe.image.name
+        ImageBlob.objects.all().delete()
+        Recipe.objects.all().delete()
+
+        call_command('gc_images', grace=0, stdout=StringIO())
+        self.assertTrue(self._stored(name))
+
+        call_command('gc_images', grace=0, orphans=True, stdout=StringIO())
+        self.assertFalse(self._stored(name))
+
+    def test_gc_orphan_variants(self):
+        """Test variant directories without a blob are deleted."""
+        kept = self._recipe_with_image(b'kept')
+        kept_variants = os.path.splitext(kept.image.name)[0]
+        default_storage.save(f'{kept_variants}/small.webp', ContentFile(b'v'))
+        orphan = os.path.join(
+            os.path.dirname(kept_variants), 'f' * 64, 'small.webp',
+        )
+        default_storage.save(orphan, ContentFile(b'variant'))
+
+        call_command('gc_images', grace=0, orphans=True, stdout=StringIO())
+
+        self.assertTrue(self._exists(f'{kept_variants}/small.webp'))
+        self.assertFalse(self._exists(os.path.dirname(orphan)))
+
+
+class BenchmarkServingCommandTests(TransactionTestCase):
+    """Test the benchmark_serving command."""
+
+    def test_benchmark_reports_each_mode(self):
+        """Test both serving paths answer and the seed data is removed."""
+        for mode in ['wsgi', 'asgi']:
+            with self.subTest(mode=mode):
+                out = StringIO()
+
+                call_command(
+                    'benchmark_serving',
+                    mode=mode, clients=2, requests=4, slow_read=0,
+                    recipes=3, json=True, stdout=out,
+                )
+
+                result = json.loads(out.getvalue())[0]
+                self.assertEqual(result['mode'], mode)
+                self.assertEqual(result['statuses'], {'200': 4})
+                self.assertFalse(get_user_model().objects.exists())
+
+
+class BenchmarkApiCommandTests(TestCase):
+    """Test the benchmark_api command."""
+
+    def test_benchmark_writes_results(self):
+        """Test every scenario succeeds and results can be compared."""
+        output = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        output.close()
+        self.addCleanup(os.remove, output.name)
+        options = {
+            'users': 3, 'recipes': 12, 'tag_pool': 4, 'iterations': 2,
+            'warmup': 1, 'memory_samples': 1, 'output': output.name,
+        }
+
+        call_command('benchmark_api', stdout=StringIO(), **options)
+        with open(output.name) as f:
+            report = json.load(f)
+        out, err = StringIO(), StringIO()
+        call_command(
+            'benchmark_api', compare=output.name, stdout=out, stderr=err,
+            **options,
+        )
+
+        self.assertEqual(report['dataset']['recipes'], 12)
+        self.assertIn('recipes.upload_image', report['results'])
+        for name, result in report['results'].items():
+            with self.subTest(scenario=name):
+                self.assertEqual(sum(result['statuses'].values()), 2)
+                self.assertTrue(all(
+                    int(code) < 400 for code in result['statuses']
+                ))
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertIn('p95 vs base', out.getvalue())
+        self.assertEqual(err.getvalue(), '')
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class SeedDataCommandTests(TestCase):
+    """Test the seed_data command."""
+
+    def seed(self, domain, **options):
+        call_command(
+            'seed_data', users=20, recipes=300, tags=50, ingredients=80,
+            domain=domain, stdout=StringIO(), **options,
+        )
+        return Recipe.objects.filter(user__email__endswith=f'@{domain}')
+
+    def test_seed_data(self):
+        """Test the requested volume is loaded with skewed popularity."""
+        recipes = self.seed('seed.test')
+
+        self.assertEqual(
+            get_user_model().objects.filter(
+                email__endswith='@seed.test', is_active=True,
+            ).count(),
+            20,
+        )
+        self.assertEqual(recipes.count(), 300)
+        self.assertFalse(recipes.filter(search_vector=None).exists())
+        self.assertTrue(all(recipe.tags.exists() for recipe in recipes[:20]))
+        per_user = sorted(
+            recipes.values('user').annotate(n=Count('id'))
+            .values_list('n', flat=True),
+            reverse=True,
+        )
+        self.assertGreater(per_user[0], 5 * per_user[-1])
+        with self.assertRaises(CommandError):
+            self.seed('seed.test')
+
+    def test_seed_is_deterministic(self):
+        """Test the data depends on the seed, not on the batching."""
+        def dump(recipes):
+            return sorted(
+                (
+                    recipe.user.email.split('@')[0],
+                    recipe.title,
+                    recipe.description,
+                    str(recipe.price),
+                    tuple(sorted(tag.name for tag in recipe.tags.all())),
+                )
+                for recipe in recipes.select_related('user')
+                .prefetch_related('tags')
+            )
+
+        first = dump(self.seed('one.test'))
+        second = dump(self.seed('two.test', batch_size=7))
+        other = dump(self.seed('three.test', seed=1))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
@@ -0,0 +1,233 @@
+"""
+Tests for the pooled PostgreSQL backend.
+"""
+import os
+import threading
+from unittest import mock
+
+
+import psycopg2
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+
+from core.backends.postgresql import pool as pools
+
+
+def connect():
+    return psycopg2.connect(**connection.get_connection_params())
+
+
+class ConnectionPoolTests(TransactionTestCase):
+    """Test the in-process connection pool."""
+
+    def _pool(self, **kwargs):
+        pool = pools.ConnectionPool(connect, **kwargs)
+        self.addCleanup(pool.closeall)
+        return pool
+
+    def test_reuses_connections(self):
+        """Test returned connections are handed out again."""
+        pool = self._pool(max_size=2)
+
+        conn = pool.getconn()
+        pool.putconn(conn)
+
+        self.assertIs(pool.getconn(), conn)
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+    def test_waits_for_free_connection(self):
+        """Test a full pool blocks until a connection is returned."""
+        pool = self._pool(max_size=1, timeout=5)
+        conn = pool.getconn()
+        timer = threading.Timer(0.1, pool.putconn, [conn])
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        self.assertIs(pool.getconn(), conn)
+
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreater(stats['wait_seconds'], 0)
+        self.assertEqual(stats['max_wait_seconds'], stats['wait_seconds'])
+
+    def test_timeout(self):
+        """Test waiting past the timeout raises an OperationalError."""
+        pool = self._pool(max_size=1, timeout=0.05)
+        conn = pool.getconn()
+        self.addCleanup(conn.close)
+
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.getconn()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_connect_failure_frees_slot(self):
+        """Test a failed connection attempt does not use up the pool."""
+        pool = self._pool(max_size=1)
+
+        with mock.patch.object(
+            pool, 'connect', side_effect=psycopg2.OperationalError,
+        ):
+            with self.assertRaises(psycopg2.OperationalError):
+                pool.getconn()
+
+        self.assertEqual(pool.stats()['size'], 0)
+        pool.putconn(pool.getconn())
+
+    def test_health_check_replaces_dead_connection(self):
+        """Test idle connections failing a ping are replaced."""
+        pool = self._pool(max_size=1, health_check_interval=0)
+        dead = pool.getconn()
+        with connect() as admin, admin.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)',
+                           [dead.get_backend_pid()])
+        admin.close()
+        pool.putconn(dead)
+
+        conn = pool.getconn()
+
+        self.assertIsNot(conn, dead)
+        self.assertTrue(dead.closed)
+        self.assertEqual(pool.stats()['health_check_failures'], 1)
+
+    def test_health_check_outside_lock(self):
+        """Test pings run without holding up other threads."""
+        pool = self._pool(max_size=1, health_check_interval=0)
+        pool.putconn(pool.getconn())
+        locked = []
+
+        def ping(conn):
+            free = pool._cond.acquire(blocking=False)
+            if free:
+                pool._cond.release()
+            locked.append(not free)
+            return True
+
+        with mock.patch.object(pool, '_ping', ping):
+            pool.putconn(pool.getconn())
+
+        self.assertEqual(locked, [False])
+
+    def test_rolls_back_returned_transaction(self):
+        """Test connections are returned outside of a transaction."""
+        pool = self._pool(max_size=1)
+        conn = pool.getconn()
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+        pool.putconn(conn)
+
+        self.assertEqual(
+            conn.info.transaction_status,
+            psycopg2.extensions.TRANSACTION_STATUS_IDLE,
+        )
+
+    def test_prunes_idle_connections(self):
+        """Test surplus connections idle past max_idle are closed."""
+        pool = self._pool(min_size=1, max_size=3, max_idle=0)
+        conns = [pool.getconn() for _ in range(3)]
+
+        for conn in conns:
+            pool.putconn(conn)
+
+        self.assertEqual(pool.stats()['size'], 1)
+        self.assertEqual(sum(not conn.closed for conn in conns), 1)
+
+    def test_after_fork_leaves_connections_open(self):
+        """Test a forked child neither reuses nor closes inherited ones."""
+        pool = self._pool(max_size=1)
+        conn = pool.getconn()
+        pool.putconn(conn)
+
+        pool.after_fork()
+        self.addCleanup(pools._inherited.remove, conn)
+
+        self.assertEqual(pool.stats()['size'], 0)
+        self.assertFalse(conn.closed)
+        self.assertIn(conn, pools._inherited)
+        fresh = pool.getconn()
+        self.assertIsNot(fresh, conn)
+        conn.close()
+        fresh.close()
+
+
+class PooledBackendTests(SimpleTestCase):
+    """Test the database wrapper borrows from and returns to the pool."""
+
+    databases = {'default'}
+
+    def _wrapper(self, **settings):
+        wrapper = connection.copy()
+        wrapper.settings_dict.update(settings)
+        self.addCleanup(pools.close_pool, 'default')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_close_returns_connection(self):
+        """Test closing the wrapper checks the connection back in."""
+        wrapper = self._wrapper(POOL={'MAX_SIZE': 1})
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+
+        wrapper.close()
+        wrapper.ensure_connection()
+
+        self.assertIs(wrapper.connection, raw)
+        self.assertFalse(raw.closed)
+        self.assertEqual(pools.pool_stats()['default']['size'], 1)
+
+    def test_request_end_returns_connection(self):
+        """Test threads give pooled connections back after each request."""
+        wrappers = [
+            self._wrapper(POOL={'MAX_SIZE': 1, 'TIMEOUT': 0},
+                          CONN_MAX_AGE=60)
+            for _ in range(2)
+        ]
+
+        for wrapper in wrappers:
+            wrapper.ensure_connection()
+            # What request_finished does through close_old_connections().
+            wrapper.close_if_unusable_or_obsolete()
+
+            self.assertIsNone(wrapper.connection)
+            self.assertEqual(pools.pool_stats()['default']['in_use'], 0)
+
+    def test_unpooled_close(self):
+        """Test connections are closed when pooling is off."""
+        wrapper = self._wrapper(POOL=None)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+
+        wrapper.close()
+
+        self.assertTrue(raw.closed)
+        self.assertNotIn('default', pools.pool_stats())
+
+    def test_health_check_on_request(self):
+        """Test an idle persistent connection is replaced when dead."""
+        wrapper = self._wrapper(
+            POOL=None, CONN_MAX_AGE=60, CONN_HEALTH_CHECK_INTERVAL=0,
+        )
+        wrapper.ensure_connection()
+        with connect() as admin, admin.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)',
+                           [wrapper.connection.get_backend_pid()])
+        admin.close()
+
+        wrapper.close_if_unusable_or_obsolete()
+
+        self.assertIsNone(wrapper.connection)
+
+    def test_inherited_connection_not_reused(self):
+        """Test a connection opened before fork is replaced, not closed."""
+        wrapper = self._wrapper(POOL=None)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        self.addCleanup(raw.close)
+        self.addCleanup(pools._inherited.remove, raw)
+
+        with mock.patch('os.getpid', return_value=os.getpid() + 1):
+            wrapper.ensure_connection()
+
+        self.assertIsNot(wrapper.connection, raw)
+        self.assertFalse(raw.closed)
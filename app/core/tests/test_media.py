@@ -0,0 +1,160 @@
+"""
+Tests for serving media files.
+"""
+import os
+import tempfile
+
+
+from django.test import SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+
+MEDIA_URL = '/static/media/'
+DIGEST = 'abcd' + '0' * 60
+IMAGE = f'uploads/recipe/ab/cd/{DIGEST}/large-0123456789ab.webp'
+CONTENT = bytes(range(256)) * 4
+
+
+class ServeMediaTests(SimpleTestCase):
+    """Test the production media view."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        settings = self.settings(
+            MEDIA_ROOT=self.media.name,
+            MEDIA_SERVE_MODE='django',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.path = os.path.join(self.media.name, IMAGE)
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'wb') as f:
+            f.write(CONTENT)
+
+    def _get(self, name=IMAGE, **headers):
+        return self.client.get(f'{MEDIA_URL}{name}', **headers)
+
+    def test_serve_file(self):
+        """Test files are streamed with validators and cache headers."""
+        resp = self._get()
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(b''.join(resp.streaming_content), CONTENT)
+        self.assertEqual(resp['Content-Type'], 'image/webp')
+        self.assertEqual(resp['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(resp['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', resp)
+        self.assertIn('Last-Modified', resp)
+        self.assertIn('immutable', resp['Cache-Control'])
+
+    @override_settings(MEDIA_SERVE_PATTERNS=[r'^notes\.txt$'])
+    def test_mutable_paths_short_cache(self):
+        """Test paths outside the immutable prefixes are not immutable."""
+        with open(os.path.join(self.media.name, 'notes.txt'), 'w') as f:
+            f.write('notes')
+
+        resp = self._get('notes.txt')
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('immutable', resp['Cache-Control'])
+
+    def test_not_modified(self):
+        """Test matching validators are answered with 304."""
+        resp = self._get()
+
+        etag_resp = self._get(HTTP_IF_NONE_MATCH=resp['ETag'])
+        date_resp = self._get(HTTP_IF_MODIFIED_SINCE=resp['Last-Modified'])
+
+        for resp in (etag_resp, date_resp):
+            self.assertEqual(resp.status_code, 304)
+            self.assertEqual(resp.content, b'')
+            self.assertIn('immutable', resp['Cache-Control'])
+
+    def test_range(self):
+        """Test single byte ranges are served with 206."""
+        cases = [
+            ('bytes=10-19', 10, 19),
+            ('bytes=1000-', 1000, len(CONTENT) - 1),
+            ('bytes=-24', len(CONTENT) - 24, len(CONTENT) - 1),
+            ('bytes=1020-5000', 1020, len(CONTENT) - 1),
+        ]
+        for header, start, end in cases:
+            with self.subTest(header=header):
+                resp = self._get(HTTP_RANGE=header)
+
+                self.assertEqual(resp.status_code, 206)
+                self.assertEqual(
+                    b''.join(resp.streaming_content),
+                    CONTENT[start:end + 1],
+                )
+                self.assertEqual(resp['Content-Length'], str(end - start + 1))
+                self.assertEqual(
+                    resp['Content-Range'],
+                    f'bytes {start}-{end}/{len(CONTENT)}',
+                )
+
+    def test_range_not_satisfiable(self):
+        """Test ranges past the end of the file are answered with 416."""
+        resp = self._get(HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(resp.status_code, 416)
+        self.assertEqual(resp['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_stale_if_range_sends_whole_file(self):
+        """Test a range is ignored when If-Range no longer matches."""
+        resp = self._get(
+            HTTP_RANGE='bytes=0-9',
+            HTTP_IF_RANGE=http_date(0),
+        )
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(b''.join(resp.streaming_content), CONTENT)
+
+    @override_settings(
+        MEDIA_SERVE_MODE='x-accel-redirect',
+        MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/',
+    )
+    def test_x_accel_redirect(self):
+        """Test the transfer is handed to nginx when configured."""
+        resp = self._get()
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['X-Accel-Redirect'], f'/protected-media/{IMAGE}')
+        self.assertEqual(resp.content, b'')
+        self.assertIn('ETag', resp)
+
+    @override_settings(MEDIA_SERVE_MODE='x-sendfile')
+    def test_x_sendfile(self):
+        """Test the transfer is handed to the proxy with X-Sendfile."""
+        resp = self._get()
+
+        self.assertEqual(resp['X-Sendfile'], self.path)
+        self.assertEqual(resp.content, b'')
+
+    def test_missing_and_outside_files(self):
+        """Test missing files, directories and traversal return 404."""
+        for name in ['missing.jpg', 'uploads/recipe', '../etc/passwd']:
+            with self.subTest(name=name):
+                self.assertEqual(self._get(name).status_code, 404)
+
+    def test_only_variants_served(self):
+        """Test files other than generated variants are never served."""
+        for name in [f'uploads/recipe/ab/cd/{DIGEST}.jpg', 'notes.txt']:
+            path = os.path.join(self.media.name, name)
+            with open(path, 'wb') as f:
+                f.write(CONTENT)
+            with self.subTest(name=name):
+                self.assertEqual(self._get(name).status_code, 404)
+
+    @override_settings(MEDIA_SERVE_MODE='')
+    def test_off_without_mode(self):
+        """Test nothing is served while MEDIA_SERVE_MODE is unset."""
+        self.assertEqual(self._get().status_code, 404)
+
+    def test_write_methods_not_allowed(self):
+        """Test media cannot be posted to."""
+        resp = self.client.post(f'{MEDIA_URL}{IMAGE}')
+
+        self.assertEqual(resp.status_code, 405)
@@ -0,0 +1,183 @@
+"""
+Tests for request timings and the metrics endpoint.
+"""
+import re
+import time
+from unittest import mock
+
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+
+from core import metrics, offload
+from core.authentication import local_token_cache
+from core.models import Recipe, Tag
+from recipe.serializers import TagSerializer
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+METRICS_URL = reverse('metrics')
+LABELS = 'endpoint="recipe:recipe-list",method="GET"'
+
+
+def clear_metrics():
+    for metric in metrics.METRICS:
+        metric.clear()
+
+
+class HistogramTests(SimpleTestCase):
+    """Test rendering of histograms."""
+
+    def test_cumulative_buckets(self):
+        """Test buckets count observations at or below their bound."""
+        histogram = metrics.Histogram(
+            'latency_seconds', 'Latency.', ('endpoint',), (0.1, 1.0),
+        )
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(('a "quoted" name',), value)
+
+        lines = histogram.render()
+
+        self.assertEqual(lines[2:], [
+            'latency_seconds_bucket{endpoint="a \\"quoted\\" name",'
+            'le="0.1"} 2',
+            'latency_seconds_bucket{endpoint="a \\"quoted\\" name",'
+            'le="1.0"} 3',
+            'latency_seconds_bucket{endpoint="a \\"quoted\\" name",'
+            'le="+Inf"} 4',
+            'latency_seconds_sum{endpoint="a \\"quoted\\" name"} 3.65',
+            'latency_seconds_count{endpoint="a \\"quoted\\" name"} 4',
+        ])
+
+
+class TimingContextTests(SimpleTestCase):
+    """Test timings follow the request across threads."""
+
+    def test_context_reaches_pool_threads(self):
+        """Test timings are recorded by views offloaded to the pool."""
+        pool = offload.DatabaseThreadPool(max_workers=1, max_waiting=0)
+        self.addCleanup(pool.executor.shutdown)
+        timings = metrics.RequestTimings()
+        token = metrics._current.set(timings)
+        self.addCleanup(metrics._current.reset, token)
+
+        self.assertIs(
+            async_to_sync(pool.run)(lambda: metrics._current.get()),
+            timings,
+        )
+
+
+@override_settings(
+    DEBUG=True,
+    METRICS_SAMPLE_RATE=1.0,
+    METRICS_SERVER_TIMING=True,
+    METRICS_TOKEN=None,
+    RECIPE_RESPONSE_CACHE=None,
+)
+class RequestMetricsTests(TestCase):
+    """Test requests are timed and aggregated."""
+
+    def setUp(self):
+        clear_metrics()
+        local_token_cache.clear()
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+            is_active=True,
+        )
+        Recipe.objects.create(
+            user=user,
+            title='Sample recipe',
+            time_minutes=5,
+            price='5.50',
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}',
+        )
+
+    def test_server_timing(self):
+        """Test sampled requests report their timings."""
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(RECIPES_URL)
+
+        self.assertEqual(resp.status_code, 200)
+        timing = resp['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        for name in ('db', 'auth', 'serialize', 'total'):
+            self.assertRegex(timing, rf'{name};dur=\d+\.\d')
+
+    def test_serialize_covers_representation(self):
+        """Test building the serializer data counts as serialization."""
+        Tag.objects.create(user=get_user_model().objects.get(), name='Vegan')
+
+        def slow(serializer, instance):
+            time.sleep(0.05)
+            return {'id': instance.id}
+
+        with mock.patch.object(TagSerializer, 'to_representation', slow):
+            resp = self.client.get(TAGS_URL)
+
+        serialize = re.search(r'serialize;dur=([\d.]+)', resp['Server-Timing'])
+        self.assertGreaterEqual(float(serialize[1]), 50)
+
+    def test_metrics_endpoint(self):
+        """Test timings are aggregated into per-endpoint histograms."""
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        resp = self.client.get(METRICS_URL)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp['Content-Type'].startswith('text/plain'))
+        body = resp.content.decode()
+        self.assertIn(
+            f'http_requests_total{{{LABELS},status="200"}} 2', body,
+        )
+        for name in ('duration', 'db', 'auth', 'serialize'):
+            self.assertIn(
+                f'http_request_{name}_seconds_count{{{LABELS}}} 2', body,
+            )
+        self.assertRegex(
+            body,
+            re.escape(f'http_request_db_queries_sum{{{LABELS}}} ') + r'\d',
+        )
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests(self):
+        """Test unsampled requests are only counted and timed overall."""
+        resp = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', resp)
+        body = metrics.render_metrics()
+        self.assertIn(
+            f'http_request_duration_seconds_count{{{LABELS}}} 1', body,
+        )
+        self.assertNotIn(f'http_request_db_seconds_count{{{LABELS}}}', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        """Test a configured token is required to read metrics."""
+        client = APIClient()
+
+        denied = client.get(METRICS_URL)
+        client.credentials(HTTP_AUTHORIZATION='Bearer secret')
+        allowed = client.get(METRICS_URL)
+
+        self.assertEqual(denied.status_code, 403)
+        self.assertEqual(allowed.status_code, 200)
+
+    @override_settings(DEBUG=False)
+    def test_metrics_closed_without_token(self):
+        """Test metrics are not served without a token outside DEBUG."""
+        resp = APIClient().get(METRICS_URL)
+
+        self.assertEqual(resp.status_code, 403)
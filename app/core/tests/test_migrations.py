@@ -0,0 +1,90 @@
+"""
+Tests for data migrations.
+"""
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MergeDuplicateNamesMigrationTests(TransactionTestCase):
+    """Test duplicate tags and ingredients are merged before uniqueness."""
+
+    migrate_from = [('core', '0007_keyset_pagination_indexes')]
+    migrate_to = [('core', '0009_unique_tag_ingredient_names')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        self.leaf = executor.loader.graph.leaf_nodes('core')
+        executor.migrate(self.migrate_from)
+        self.addCleanup(self._migrate, self.leaf)
+        self.apps = executor.loader.project_state(self.migrate_from).apps
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def _recipe(self, user, title):
+        Recipe = self.apps.get_model('core', 'Recipe')
+        return Recipe.objects.create(
+            user=user, title=title, time_minutes=5, price='1.00',
+        )
+
+    def test_duplicates_merged_and_links_kept(self):
+        """Test links move to the kept row and no recipe loses a name."""
+        User = self.apps.get_model('core', 'User')
+        Tag = self.apps.get_model('core', 'Tag')
+        Ingredient = self.apps.get_model('core', 'Ingredient')
+        user = User.objects.create(email='user@example.com')
+        other = User.objects.create(email='other@example.com')
+
+        first, second, both = (
+            self._recipe(user, title) for title in ('First', 'Second', 'Both')
+        )
+        dinner = [
+            Tag.objects.create(user=user, name='Dinner') for _ in range(2)
+        ]
+        lunch = Tag.objects.create(user=user, name='Lunch')
+        others = Tag.objects.create(user=other, name='Dinner')
+        salt = [
+            Ingredient.objects.create(user=user, name='Salt') for _ in range(2)
+        ]
+        first.tags.add(dinner[0], lunch)
+        second.tags.add(dinner[1])
+        both.tags.add(*dinner)
+        first.ingredients.add(salt[1])
+        both.ingredients.add(*salt)
+        self._recipe(other, 'Other').tags.add(others)
+
+        apps = self._migrate(self.migrate_to)
+
+        Recipe = apps.get_model('core', 'Recipe')
+        Tag = apps.get_model('core', 'Tag')
+        Ingredient = apps.get_model('core', 'Ingredient')
+        self.assertEqual(Recipe.objects.count(), 4)
+        self.assertEqual(
+            sorted(Tag.objects.filter(user_id=user.id).values_list(
+                'id', 'name',
+            )),
+            [(dinner[0].id, 'Dinner'), (lunch.id, 'Lunch')],
+        )
+        self.assertTrue(Tag.objects.filter(id=others.id).exists())
+        self.assertEqual(
+            list(Ingredient.objects.values_list('id', flat=True)),
+            [salt[0].id],
+        )
+
+        def names(title, field):
+            recipe = Recipe.objects.get(title=title)
+            return sorted(
+                getattr(recipe, field).values_list('name', flat=True)
+            )
+
+        self.assertEqual(names('First', 'tags'), ['Dinner', 'Lunch'])
+        self.assertEqual(names('Second', 'tags'), ['Dinner'])
+        self.assertEqual(names('Both', 'tags'), ['Dinner'])
+        self.assertEqual(names('Other', 'tags'), ['Dinner'])
+        self.assertEqual(names('First', 'ingredients'), ['Salt'])
+        self.assertEqual(names('Both', 'ingredients'), ['Salt'])
+        self.assertEqual(names('Second', 'ingredients'), [])
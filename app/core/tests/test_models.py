@@ -1,10 +1,15 @@
 """
 Tests for models.
 """
+import hashlib
+import os
+import tempfile
 from decimal import Decimal
 from unittest.mock import patch
 
 
+from django.core.files.base import ContentFile
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -96,6 +101,44 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(ingredient), ingredient.name)
 
+    def test_tag_name_unique_per_user(self):
+        """Test a user cannot have two tags with the same name."""
+        user = create_user()
+        other_user = create_user(email='other@example.com')
+        models.Tag.objects.create(user=user, name='Dinner')
+        models.Tag.objects.create(user=other_user, name='Dinner')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='Dinner')
+
+    def test_get_or_create_many(self):
+        """Test resolving names reuses existing rows and creates others."""
+        user = create_user()
+        existing = models.Ingredient.objects.create(user=user, name='Salt')
+
+        with self.assertNumQueries(2):
+            ingredients = models.Ingredient.objects.get_or_create_many(
+                user,
+                ['Salt', 'Pepper', 'Pepper'],
+            )
+
+        by_name = {ingredient.name: ingredient for ingredient in ingredients}
+        self.assertEqual(set(by_name), {'Salt', 'Pepper'})
+        self.assertEqual(by_name['Salt'].id, existing.id)
+        self.assertTrue(models.Ingredient.objects.filter(
+            id=by_name['Pepper'].id, user=user, name='Pepper'
+        ).exists())
+
+    def test_get_or_create_many_existing_only(self):
+        """Test resolving known names runs a single query."""
+        user = create_user()
+        models.Tag.objects.create(user=user, name='Vegan')
+
+        with self.assertNumQueries(1):
+            tags = models.Tag.objects.get_or_create_many(user, ['Vegan'])
+
+        self.assertEqual([tag.name for tag in tags], ['Vegan'])
+
     @patch('core.models.uuid.uuid4')
     def test_recipe_file_name_uuid(self, mock_uuid):
         """Test generating image path."""
@@ -104,3 +147,86 @@ class ModelTests(TestCase):
         file_path = models.recipe_image_file_path(None, 'example.jpg')
 
         self.assertEqual(file_path, f'uploads/recipe/{uuid}.jpg')
+
+
+class ImageBlobTests(TestCase):
+    """Test content-addressed recipe images and their reference counts."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.private = tempfile.TemporaryDirectory()
+        self.addCleanup(self.private.cleanup)
+        settings = self.settings(
+            MEDIA_ROOT=self.media.name,
+            PRIVATE_MEDIA_ROOT=self.private.name,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = create_user()
+
+    def _recipe(self, title='Recipe'):
+        return models.Recipe.objects.create(
+            user=self.user,
+            title=title,
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+
+    def _refcount(self, name):
+        return models.ImageBlob.objects.get(name=name).refcount
+
+    def test_image_named_by_content(self):
+        """Test images are stored under the digest of their bytes."""
+        recipe = self._recipe()
+        recipe.image.save('Photo.JPEG', ContentFile(b'image bytes'))
+
+        digest = hashlib.sha256(b'image bytes').hexdigest()
+        self.assertEqual(
+            recipe.image.name,
+            f'uploads/recipe/{digest[:2]}/{digest[2:4]}/{digest}.jpg',
+        )
+
+    def test_identical_images_stored_once(self):
+        """Test the same bytes uploaded twice share one counted file."""
+        first = self._recipe('First')
+        second = self._recipe('Second')
+
+        first.image.save('a.jpg', ContentFile(b'same'))
+        with patch('django.core.files.storage.FileSystemStorage._save') as s:
+            second.image.save('b.jpg', ContentFile(b'same'))
+
+        s.assert_not_called()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self._refcount(first.image.name), 2)
+
+    def test_replaced_and_deleted_images_released(self):
+        """Test references drop when images are replaced or deleted."""
+        recipe = self._recipe()
+        other = self._recipe('Other')
+        recipe.image.save('a.jpg', ContentFile(b'old'))
+        other.image.save('a.jpg', ContentFile(b'old'))
+        old = recipe.image.name
+
+        recipe = models.Recipe.objects.get(pk=recipe.pk)
+        recipe.image.save('b.jpg', ContentFile(b'new'))
+
+        self.assertEqual(self._refcount(old), 1)
+        self.assertEqual(self._refcount(recipe.image.name), 1)
+
+        other.delete()
+
+        self.assertEqual(self._refcount(old), 0)
+        self.assertTrue(os.path.exists(os.path.join(self.private.name, old)))
+
+    def test_unrelated_save_keeps_count(self):
+        """Test saving other fields does not count the image again."""
+        recipe = self._recipe()
+        recipe.image.save('a.jpg', ContentFile(b'bytes'))
+
+        recipe = models.Recipe.objects.get(pk=recipe.pk)
+        recipe.title = 'Renamed'
+        recipe.save()
+        models.Recipe.objects.only('title').get(pk=recipe.pk).save()
+
+        self.assertEqual(self._refcount(recipe.image.name), 1)
@@ -0,0 +1,175 @@
+"""
+Tests for running views in the database thread pool.
+"""
+import asyncio
+import json
+import threading
+
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import include, path
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+
+
+from core import offload
+from core.asgi import ASGIHandler
+from core.models import Recipe
+from recipe.urls import async_reads, router
+
+
+# Recipe routes as app/asgi.py serves them, for ASGIExportTests.
+urlpatterns = [
+    path('api/recipe/', include((async_reads(router.urls), 'recipe'))),
+]
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+def thread_view(request):
+    """Return the name of the thread serving the request."""
+    return Response({'thread': threading.current_thread().name})
+
+
+class DatabaseThreadPoolTests(SimpleTestCase):
+    """Test the bounded database thread pool."""
+
+    def test_rejects_when_saturated(self):
+        """Test calls beyond workers plus waiting slots are rejected."""
+        pool = offload.DatabaseThreadPool(max_workers=1, max_waiting=1)
+        release = threading.Event()
+
+        async def run():
+            busy = [
+                asyncio.ensure_future(pool.run(release.wait))
+                for _ in range(2)
+            ]
+            await asyncio.sleep(0.05)
+            self.assertEqual(pool.in_flight, 2)
+            with self.assertRaises(offload.PoolSaturated):
+                await pool.run(release.wait)
+            release.set()
+            await asyncio.gather(*busy)
+
+        async_to_sync(run)()
+
+        self.assertEqual(pool.in_flight, 0)
+        pool.executor.shutdown()
+
+
+@override_settings(ASYNC_DB_WORKERS=2, ASYNC_DB_MAX_WAITING=0)
+class OffloadSafeMethodsTests(SimpleTestCase):
+    """Test views wrapped with offload_safe_methods."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.view = offload.offload_safe_methods(thread_view)
+        offload._pool = None
+        self.addCleanup(setattr, offload, '_pool', None)
+
+    def test_reads_run_in_pool(self):
+        """Test safe requests run and render in a pool thread."""
+        resp = async_to_sync(self.view)(self.factory.get('/'))
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.is_rendered)
+        self.assertTrue(resp.data['thread'].startswith('db'))
+
+    def test_writes_not_offloaded(self):
+        """Test unsafe requests run like any other sync view."""
+        resp = async_to_sync(self.view)(self.factory.post('/'))
+        resp.render()
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.data['thread'].startswith('db'))
+
+    def test_view_attributes_kept(self):
+        """Test the wrapper stays csrf exempt like the DRF view."""
+        view = offload.offload_safe_methods(csrf_exempt(HttpResponse))
+
+        self.assertTrue(view.csrf_exempt)
+
+    def test_saturated_pool_returns_503(self):
+        """Test a saturated pool answers with 503 and Retry-After."""
+        offload.get_pool().capacity = 0
+
+        resp = async_to_sync(self.view)(self.factory.get('/'))
+
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp['Retry-After'], '1')
+
+    def test_async_recipe_routes(self):
+        """Test every recipe API route can be served as an async view."""
+        patterns = async_reads(router.urls)
+
+        self.assertEqual(len(patterns), len(router.urls))
+        for pattern in patterns:
+            self.assertTrue(asyncio.iscoroutinefunction(pattern.callback))
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    ASYNC_DB_WORKERS=2,
+    ASYNC_DB_MAX_WAITING=0,
+    THROTTLE_BUCKETS={},
+)
+class ASGIExportTests(TransactionTestCase):
+    """Test streaming responses of offloaded views under ASGI."""
+
+    def setUp(self):
+        offload._pool = None
+        self.addCleanup(setattr, offload, '_pool', None)
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123', is_active=True,
+        )
+        for i in range(3):
+            Recipe.objects.create(
+                user=user, title=f'Recipe {i}', time_minutes=5, price='1.00',
+            )
+        self.token = Token.objects.create(user=user).key
+
+    async def _get(self, path, query_string):
+        communicator = ApplicationCommunicator(ASGIHandler(), {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'query_string': query_string,
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token}'.encode()),
+            ],
+        })
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(5)
+        body = b''
+        while True:
+            message = await communicator.receive_output(5)
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        return start['status'], body
+
+    def test_export_streams_under_asgi(self):
+        """Test the export body, which queries as it streams, is served."""
+        status, body = async_to_sync(self._get)(
+            '/api/recipe/recipes/export/', b'type=ndjson',
+        )
+
+        self.assertEqual(status, 200)
+        titles = [json.loads(line)['title'] for line in body.splitlines()]
+        self.assertEqual(titles, ['Recipe 2', 'Recipe 1', 'Recipe 0'])
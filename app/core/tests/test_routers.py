@@ -0,0 +1,127 @@
+"""
+Tests for routing reads to database replicas.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+
+from core import routers
+from core.models import Recipe, Tag
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+ME_URL = reverse('user:me')
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    """Test the router outside of a request."""
+
+    def test_defaults_to_primary(self):
+        """Test reads outside replica views are left to the default."""
+        router = routers.ReplicaRouter()
+
+        self.assertIsNone(router.db_for_read(Recipe))
+        self.assertEqual(router.db_for_write(Recipe), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_no_migrations_on_replicas(self):
+        """Test replicas are left to replication."""
+        router = routers.ReplicaRouter()
+
+        self.assertFalse(router.allow_migrate('replica', 'core'))
+        self.assertIsNone(router.allow_migrate('default', 'core'))
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica'],
+    RECIPE_RESPONSE_CACHE=None,
+    REPLICA_PIN_CACHE='default',
+    REPLICA_PIN_SECONDS=60,
+)
+class ReplicaReadTests(TransactionTestCase):
+    """Test API reads go to the replica unless the user just wrote."""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price='5.50',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _get(self, url):
+        """Return the response and the queries run on each database."""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            resp = self.client.get(url)
+        return resp, primary.captured_queries, replica.captured_queries
+
+    def test_reads_from_replica(self):
+        """Test safe requests run their queries on the replica."""
+        resp, primary, replica = self._get(RECIPES_URL)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data['results']), 1)
+        self.assertEqual(primary, [])
+        self.assertTrue(replica)
+
+    def test_writes_pin_to_primary(self):
+        """Test a user reads from the primary after writing."""
+        resp = self.client.post(RECIPES_URL, {
+            'title': 'New recipe',
+            'time_minutes': 10,
+            'price': '2.00',
+            'tags': [{'name': 'Dinner'}],
+        }, format='json')
+        self.assertEqual(resp.status_code, 201)
+
+        for url in (RECIPES_URL, TAGS_URL):
+            with self.subTest(url=url):
+                resp, primary, replica = self._get(url)
+
+                self.assertEqual(resp.status_code, 200)
+                self.assertTrue(primary)
+                self.assertEqual(replica, [])
+        self.assertTrue(Tag.objects.filter(name='Dinner').exists())
+
+    def test_pin_expires(self):
+        """Test reads return to the replica once the pin is gone."""
+        self.client.patch(ME_URL, {'name': 'Updated'})
+        self.assertTrue(routers.is_pinned(self.user))
+
+        caches['default'].delete(routers.pin_key(self.user))
+        _, primary, replica = self._get(RECIPES_URL)
+
+        self.assertEqual(primary, [])
+        self.assertTrue(replica)
+
+    def test_failed_writes_do_not_pin(self):
+        """Test rejected writes leave reads on the replica."""
+        resp = self.client.post(RECIPES_URL, {'title': ''}, format='json')
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(routers.is_pinned(self.user))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """Test everything runs on the primary without replicas."""
+        resp, primary, replica = self._get(RECIPES_URL)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
@@ -0,0 +1,38 @@
+"""
+Tests for the generated OpenAPI schema.
+"""
+from django.test import SimpleTestCase
+from drf_spectacular.generators import SchemaGenerator
+
+
+class SchemaTests(SimpleTestCase):
+    """Test the schema documents the project's custom classes."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.schema = SchemaGenerator().get_schema(request=None, public=True)
+
+    def test_signed_token_security_scheme(self):
+        """Test signed access tokens are documented as bearer tokens."""
+        schemes = self.schema['components']['securitySchemes']
+
+        self.assertEqual(
+            schemes['signedTokenAuth'], {'type': 'http', 'scheme': 'bearer'},
+        )
+        security = self.schema['paths']['/api/user/me/']['get']['security']
+        self.assertIn({'signedTokenAuth': []}, security)
+
+    def test_recipe_image_fields(self):
+        """Test recipe images are documented as URLs."""
+        fields = self.schema['components']['schemas']['RecipeDetail'][
+            'properties'
+        ]
+
+        self.assertEqual(fields['image']['format'], 'uri')
+        self.assertTrue(fields['image']['nullable'])
+        self.assertEqual(fields['image_variants']['type'], 'object')
+        self.assertEqual(
+            fields['image_variants']['additionalProperties'],
+            {'type': 'string', 'format': 'uri'},
+        )
@@ -0,0 +1,164 @@
+"""
+Tests for token bucket throttles.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+
+from core import throttling
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TOKEN_URL = reverse('user:token')
+
+THROTTLE_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-throttle',
+    },
+}
+
+
+def client_for(email):
+    """Return a client authenticated as a new active user."""
+    user = get_user_model().objects.create_user(
+        email, 'testpass123', is_active=True,
+    )
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}',
+    )
+    return client
+
+
+@override_settings(CACHES=THROTTLE_CACHES, THROTTLE_CACHE='throttle')
+class ConsumeTests(SimpleTestCase):
+    """Test the token bucket arithmetic."""
+
+    def setUp(self):
+        caches['throttle'].clear()
+
+    def test_burst_then_refill(self):
+        """Test a full bucket admits burst requests, then refills at rate."""
+        allowed = [
+            throttling.consume('bucket', '1/s', 3, now=100)
+            for _ in range(3)
+        ]
+        denied = throttling.consume('bucket', '1/s', 3, now=100)
+        refilled = throttling.consume('bucket', '1/s', 3, now=101)
+        again = throttling.consume('bucket', '1/s', 3, now=101)
+
+        self.assertEqual(allowed, [0, 0, 0])
+        self.assertEqual(denied, 1)
+        self.assertEqual(refilled, 0)
+        self.assertEqual(again, 1)
+
+    def test_rates(self):
+        """Test rates are parsed like DRF rates."""
+        self.assertEqual(throttling.parse_rate('10/min'), (10, 60))
+        self.assertEqual(throttling.parse_rate('5/s'), (5, 1))
+        self.assertEqual(throttling.parse_rate('100/day'), (100, 86400))
+
+
+@override_settings(
+    CACHES=THROTTLE_CACHES,
+    THROTTLE_CACHE='throttle',
+    RECIPE_RESPONSE_CACHE=None,
+)
+class ThrottleApiTests(TestCase):
+    """Test requests are throttled per user, IP and endpoint."""
+
+    def setUp(self):
+        caches['throttle'].clear()
+
+    @override_settings(THROTTLE_BUCKETS={
+        'auth': {'rate': '1/m', 'burst': 2},
+    })
+    def test_login_throttled_per_ip(self):
+        """Test repeated logins get 429 with a Retry-After header."""
+        get_user_model().objects.create_user(
+            'user@example.com', 'testpass123', is_active=True,
+        )
+        payload = {'email': 'user@example.com', 'password': 'testpass123'}
+        client = APIClient()
+
+        statuses = [
+            client.post(TOKEN_URL, payload).status_code for _ in range(2)
+        ]
+        resp = client.post(TOKEN_URL, payload)
+        other_ip = client.post(TOKEN_URL, payload, REMOTE_ADDR='10.0.0.2')
+
+        self.assertEqual(statuses, [status.HTTP_200_OK] * 2)
+        self.assertEqual(resp.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertTrue(1 <= int(resp['Retry-After']) <= 60)
+        self.assertEqual(other_ip.status_code, status.HTTP_200_OK)
+
+    @override_settings(THROTTLE_BUCKETS={
+        'auth': {'rate': '1/m', 'burst': 2},
+    })
+    def test_forwarded_for_not_trusted(self):
+        """Test rotating X-Forwarded-For does not escape the IP bucket."""
+        payload = {'email': 'user@example.com', 'password': 'wrongpass'}
+        client = APIClient()
+
+        statuses = [
+            client.post(
+                TOKEN_URL, payload, HTTP_X_FORWARDED_FOR=f'10.1.0.{i}',
+            ).status_code
+            for i in range(3)
+        ]
+
+        self.assertEqual(statuses[-1], status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(THROTTLE_BUCKETS={
+        'recipe-write': {'rate': '1/m', 'burst': 1},
+    })
+    def test_recipe_writes_throttled_per_user(self):
+        """Test recipe writes are throttled apart from reads and users."""
+        client = client_for('user@example.com')
+        payload = {'title': 'Soup', 'time_minutes': 5, 'price': '5.00'}
+
+        created = client.post(RECIPES_URL, payload)
+        throttled = client.post(RECIPES_URL, payload)
+        listed = client.get(RECIPES_URL)
+        other = client_for('other@example.com').post(RECIPES_URL, payload)
+
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            throttled.status_code, status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+        self.assertIn('Retry-After', throttled)
+        self.assertEqual(listed.status_code, status.HTTP_200_OK)
+        self.assertEqual(other.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(THROTTLE_BUCKETS={
+        'user': {'rate': '1/m', 'burst': 2},
+    })
+    def test_user_bucket(self):
+        """Test all requests of a user draw from one bucket."""
+        client = client_for('user@example.com')
+
+        statuses = [client.get(RECIPES_URL).status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [
+            status.HTTP_200_OK,
+            status.HTTP_200_OK,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        ])
+
+    @override_settings(THROTTLE_BUCKETS={})
+    def test_unconfigured_scopes_not_throttled(self):
+        """Test scopes missing from THROTTLE_BUCKETS are not throttled."""
+        client = client_for('user@example.com')
+
+        statuses = {client.get(RECIPES_URL).status_code for _ in range(5)}
+
+        self.assertEqual(statuses, {status.HTTP_200_OK})
@@ -0,0 +1,141 @@
+"""
+Token bucket throttles per user, per client IP and per endpoint class.
+
+Every bucket is configured in THROTTLE_BUCKETS by scope as a rate, such as
+"20/s" or "10/min", and a burst, the number of requests a full bucket
+admits at once. Buckets are kept in the THROTTLE_CACHE cache as a single
+theoretical arrival time (the generic cell rate algorithm, equivalent to a
+token bucket), so each check is one cache read and one write. Throttled
+requests get a 429 response with a Retry-After header.
+
+Client IP addresses are REMOTE_ADDR, or the address the last of the
+NUM_PROXIES trusted proxies saw in X-Forwarded-For, so clients cannot pick
+their own IP bucket by sending the header.
+
+Checks in one process are serialized. Across processes two concurrent
+checks of the same bucket may both pass, letting a few extra requests
+through; point THROTTLE_CACHE at a cache shared by all workers (such as
+memcached) so they draw from the same buckets.
+"""
+import math
+import threading
+import time
+
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """Return (requests, period in seconds) of a rate like "10/min"."""
+    requests, period = rate.split('/')
+    return int(requests), PERIODS[period[0]]
+
+
+def consume(key, rate, burst, now=None):
+    """Take a token from the bucket under key.
+
+    Returns 0 if the request is allowed, otherwise the seconds until the
+    bucket holds a token again.
+    """
+    requests, period = parse_rate(rate)
+    interval = period / requests
+    # A full bucket admits burst requests before the next is delayed.
+    tolerance = (burst - 1) * interval
+    now = time.time() if now is None else now
+    cache = caches[settings.THROTTLE_CACHE]
+
+    with _lock:
+        arrival = max(cache.get(key, now), now)
+        wait = arrival - tolerance - now
+        if wait > 0:
+            return wait
+        arrival += interval
+        cache.set(key, arrival, math.ceil(arrival - now))
+    return 0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle requests with the bucket of self.get_scope().
+
+    Scopes missing from THROTTLE_BUCKETS are not throttled.
+    """
+
+    scope = None
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_ident_key(self, request, view):
+        """Return the bucket owner of the request, or None to skip it."""
+        raise NotImplementedError('.get_ident_key() must be overridden')
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope = self.get_scope(request, view)
+        bucket = settings.THROTTLE_BUCKETS.get(scope) if scope else None
+        if bucket is None:
+            return True
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+
+        wait = consume(
+            f'throttle:{scope}:{ident}',
+            bucket['rate'],
+            bucket.get('burst', parse_rate(bucket['rate'])[0]),
+        )
+        if wait:
+            self.wait_seconds = wait
+            return False
+        return True
+
+    def wait(self):
+        # Whole seconds, as Retry-After does not take fractions.
+        if self.wait_seconds is None:
+            return None
+        return math.ceil(self.wait_seconds)
+
+
+class UserBucketThrottle(TokenBucketThrottle):
+    """Throttle each authenticated user."""
+
+    scope = 'user'
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class IPBucketThrottle(TokenBucketThrottle):
+    """Throttle each client IP address."""
+
+    scope = 'ip'
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
+
+
+class EndpointBucketThrottle(TokenBucketThrottle):
+    """
+    Throttle the endpoints sharing a view's throttle_scope.
+
+    Each user, or each IP address for anonymous requests, has a separate
+    bucket per scope.
+    """
+
+    def get_scope(self, request, view):
+        return getattr(view, 'throttle_scope', None)
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
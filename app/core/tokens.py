@@ -0,0 +1,231 @@
+"""
+Stateless HMAC-signed access and refresh tokens.
+
+A token is "<key id>.<claims>.<signature>", the claims being base64url
+encoded JSON and the signature an HMAC-SHA256 of the first two parts.
+Access tokens carry the user's id and email and are verified without the
+database. Refresh tokens trade for a new pair on the refresh endpoint,
+which checks the user against the database and spends the refresh token.
+
+Tokens are signed with the first key in SIGNED_TOKEN_KEYS and verified with
+any of them, so a key is rotated by putting a new one first and dropping
+the old one once SIGNED_TOKEN_REFRESH_TTL has passed.
+"""
+import base64
+import binascii
+import hmac
+import json
+import secrets
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+
+from core.models import RevokedToken
+
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+KEY_SALT = 'core.tokens'
+
+
+class InvalidToken(Exception):
+    """The token is malformed, forged, expired or revoked."""
+
+
+def enabled():
+    """Return whether signed tokens are configured."""
+    return bool(settings.SIGNED_TOKEN_KEYS)
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _signature(secret, message):
+    return salted_hmac(
+        KEY_SALT, message, secret=secret, algorithm='sha256',
+    ).digest()
+
+
+def _password_fingerprint(user):
+    """Return a digest that changes whenever the user's password does."""
+    return salted_hmac(
+        f'{KEY_SALT}.password', user.password, algorithm='sha256',
+    ).hexdigest()[:16]
+
+
+def sign(claims):
+    """Return claims signed with the current key."""
+    kid, secret = settings.SIGNED_TOKEN_KEYS[0]
+    payload = _b64encode(
+        json.dumps(claims, separators=(',', ':')).encode()
+    )
+    message = f'{kid}.{payload}'
+    return f'{message}.{_b64encode(_signature(secret, message))}'
+
+
+def unsign(token, typ):
+    """Return the claims of a valid, unexpired token of type typ."""
+    try:
+        kid, payload, signature = token.split('.')
+    except (AttributeError, ValueError):
+        raise InvalidToken('Malformed token.')
+
+    secret = dict(settings.SIGNED_TOKEN_KEYS).get(kid)
+    if secret is None:
+        raise InvalidToken('Unknown signing key.')
+    try:
+        valid = hmac.compare_digest(
+            _b64decode(signature),
+            _signature(secret, f'{kid}.{payload}'),
+        )
+        claims = json.loads(_b64decode(payload)) if valid else None
+    except (binascii.Error, ValueError):
+        raise InvalidToken('Malformed token.')
+    if not valid:
+        raise InvalidToken('Invalid signature.')
+
+    if claims.get('typ') != typ:
+        raise InvalidToken(f'Not an {typ} token.')
+    if claims['exp'] <= time.time():
+        raise InvalidToken('Token expired.')
+    return claims
+
+
+def _claims(user, typ, ttl):
+    return {
+        'typ': typ,
+        'sub': user.pk,
+        'exp': int(time.time()) + ttl,
+        'jti': secrets.token_urlsafe(12),
+    }
+
+
+def issue(user):
+    """Return a new access and refresh token pair for user."""
+    access = _claims(user, ACCESS, settings.SIGNED_TOKEN_ACCESS_TTL)
+    access['email'] = user.email
+    refresh = _claims(user, REFRESH, settings.SIGNED_TOKEN_REFRESH_TTL)
+    refresh['pwd'] = _password_fingerprint(user)
+    return {
+        'access': sign(access),
+        'refresh': sign(refresh),
+        'token_type': 'Bearer',
+        'expires_in': settings.SIGNED_TOKEN_ACCESS_TTL,
+    }
+
+
+def _expires_at(claims):
+    return datetime.fromtimestamp(claims['exp'], tz=dt_timezone.utc)
+
+
+def _spend(claims):
+    """Record claims as revoked, returning False if they already were."""
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(
+                jti=claims['jti'],
+                expires_at=_expires_at(claims),
+            )
+    except IntegrityError:
+        return False
+    RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    revocations.add(claims['jti'])
+    return True
+
+
+def refresh(token):
+    """Spend a refresh token and return a new pair for its user.
+
+    A refresh token works once, and stops working when its user is
+    deactivated or changes password.
+    """
+    claims = unsign(token, REFRESH)
+    user = get_user_model().objects.filter(
+        pk=claims['sub'], is_active=True,
+    ).first()
+    if user is None or claims['pwd'] != _password_fingerprint(user):
+        raise InvalidToken('User is inactive or changed password.')
+    if not _spend(claims):
+        raise InvalidToken('Token revoked.')
+    return issue(user)
+
+
+def revoke(token):
+    """Stop accepting an access or refresh token before it expires."""
+    for typ in (ACCESS, REFRESH):
+        try:
+            claims = unsign(token, typ)
+        except InvalidToken:
+            continue
+        _spend(claims)
+        return
+    raise InvalidToken('Invalid token.')
+
+
+def user_from_claims(claims):
+    """Return the user of an access token without querying the database.
+
+    The user only has its id, email and active flag loaded; other fields
+    are deferred and load on first access, and save() writes back only the
+    loaded fields.
+    """
+    User = get_user_model()
+    return User.from_db(
+        'default',
+        [User._meta.pk.attname, User.USERNAME_FIELD, 'is_active'],
+        [claims['sub'], claims['email'], True],
+    )
+
+
+class RevocationList:
+    """In-process copy of the unexpired revoked token ids.
+
+    The copy is reloaded from the database at most every refresh seconds,
+    so a token revoked by another process is accepted by this one for up
+    to that long.
+    """
+
+    def __init__(self):
+        self._jtis = frozenset()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, jti):
+        interval = settings.SIGNED_TOKEN_REVOCATION_REFRESH
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at >= interval:
+            with self._lock:
+                if self._loaded_at is None \
+                        or now - self._loaded_at >= interval:
+                    self._jtis = frozenset(
+                        RevokedToken.objects.filter(
+                            expires_at__gt=timezone.now(),
+                        ).values_list('jti', flat=True)
+                    )
+                    self._loaded_at = now
+        return jti in self._jtis
+
+    def add(self, jti):
+        with self._lock:
+            self._jtis = self._jtis | {jti}
+
+    def clear(self):
+        with self._lock:
+            self._jtis = frozenset()
+            self._loaded_at = None
+
+
+revocations = RevocationList()
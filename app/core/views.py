@@ -0,0 +1,201 @@
+"""
+Views for serving uploaded media and metrics in production.
+"""
+import mimetypes
+import os
+import re
+import stat
+
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+
+from core.metrics import render_metrics
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+class FileRange:
+    """
+    A window of an open file, read like a file of its own.
+
+    It keeps fileno() and tell() of the underlying file, so WSGI servers
+    with a sendfile file wrapper (gunicorn, uWSGI) send the range straight
+    from the page cache using the response Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Return (start, length) for a single byte range, None to send it all.
+
+    Raises ValueError when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        # Multiple or malformed ranges may be answered with the whole file.
+        return None
+
+    first, last = match.groups()
+    if first == '':
+        length = min(int(last), size)
+        if not length:
+            raise ValueError(header)
+        return size - length, length
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end - start + 1
+
+
+def cache_control(path):
+    """Return the Cache-Control header value for a media path."""
+    prefixes = getattr(settings, 'MEDIA_IMMUTABLE_PREFIXES', ())
+    if any(path.startswith(prefix) for prefix in prefixes):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={getattr(settings, "MEDIA_CACHE_MAX_AGE", 0)}'
+
+
+def servable(path):
+    """Return whether path is one of the files media may be served from."""
+    patterns = getattr(settings, 'MEDIA_SERVE_PATTERNS', ())
+    return any(re.match(pattern, path) for pattern in patterns)
+
+
+def _range_applies(request, etag, last_modified):
+    """Return whether an If-Range precondition, if any, still holds."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    return if_range in (etag, http_date(last_modified))
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file under MEDIA_ROOT, honouring validators and ranges.
+
+    Only paths matching MEDIA_SERVE_PATTERNS are served, and nothing is
+    while MEDIA_SERVE_MODE is unset.
+    """
+    if not getattr(settings, 'MEDIA_SERVE_MODE', '') or not servable(path):
+        raise Http404()
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stats = os.stat(fullpath)
+    except (SuspiciousFileOperation, ValueError, OSError):
+        raise Http404()
+    if not stat.S_ISREG(stats.st_mode):
+        raise Http404()
+
+    size = stats.st_size
+    last_modified = int(stats.st_mtime)
+    etag = quote_etag(f'{stats.st_mtime_ns:x}-{size:x}')
+
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified,
+    )
+    if response is None:
+        response = _file_response(request, path, fullpath, size, etag,
+                                  last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control(path)
+    return response
+
+
+def _file_response(request, path, fullpath, size, etag, last_modified):
+    """Return the response transferring the file or the requested range."""
+    content_type = mimetypes.guess_type(fullpath)[0] \
+        or 'application/octet-stream'
+    mode = getattr(settings, 'MEDIA_SERVE_MODE', 'django')
+
+    if mode == 'x-accel-redirect':
+        # nginx serves the internal location, including any Range.
+        response = HttpResponse(content_type=content_type)
+        prefix = settings.MEDIA_ACCEL_REDIRECT_PREFIX
+        response['X-Accel-Redirect'] = f'{prefix.rstrip("/")}/{path}'
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = fullpath
+        return response
+
+    byte_range = None
+    header = request.META.get('HTTP_RANGE')
+    if header and _range_applies(request, etag, last_modified):
+        try:
+            byte_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = open(fullpath, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, length = byte_range
+        response = FileResponse(
+            FileRange(file, start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = \
+            f'bytes {start}-{start + length - 1}/{size}'
+    response.block_size = 64 * 1024
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def metrics(request):
+    """Expose request and connection pool metrics to Prometheus."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        # Open only in development; production must set a token.
+        if not settings.DEBUG:
+            return HttpResponse(status=403)
+    elif not constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''),
+        f'Bearer {token}',
+    ):
+        return HttpResponse(status=403)
+    return HttpResponse(
+        render_metrics(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,253 @@
+"""
+Bulk create, update and delete of recipes.
+"""
+from django.db.models import Q
+from django.utils.translation import gettext as _
+from rest_framework import serializers
+
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import schedule_version_bump
+from recipe.serializers import RecipeDetailSerializer
+
+
+# (recipe field, related model, through table column)
+RELATED_FIELDS = [
+    ('tags', Tag, 'tag_id'),
+    ('ingredients', Ingredient, 'ingredient_id'),
+]
+
+RESULT_STATUS = {
+    'create': 'created',
+    'update': 'updated',
+    'delete': 'deleted',
+}
+
+
+def is_id(value):
+    """Return whether value is a recipe id; JSON true is not 1."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class RecipeBulkOperation:
+    """
+    Validate and apply a batch of recipe writes.
+
+    Each item is a recipe payload as accepted by RecipeDetailSerializer.
+    Items without an ``id`` are created, items with an ``id`` are partially
+    updated and items with only an ``id`` and ``"delete": true`` are
+    deleted.
+    Tag and ingredient names are resolved once for the whole batch, and
+    recipe and through-table rows are written with one statement per kind.
+    Call it inside a transaction so that the batch is applied atomically.
+    """
+    max_items = 500
+
+    def __init__(self, items, context):
+        self.items = items
+        self.context = context
+        self.user = context['request'].user
+        self.errors = None
+        self._ops = []
+
+    def is_valid(self):
+        """Validate every item, returning False if any item is invalid."""
+        if not isinstance(self.items, list):
+            self.errors = {'non_field_errors': [_('Expected a list.')]}
+            return False
+
+        if len(self.items) > self.max_items:
+            msg = _('Ensure this list has at most {max} items.')
+            self.errors = {
+                'non_field_errors': [msg.format(max=self.max_items)],
+            }
+            return False
+
+        instances = self._get_instances()
+        seen = set()
+        errors = []
+        for item in self.items:
+            op, error = self._validate_item(item, instances, seen)
+            self._ops.append(op)
+            errors.append(error)
+
+        if any(errors):
+            self.errors = errors
+            return False
+
+        return True
+
+    def _get_instances(self):
+        """Lock and return the user's recipes referenced by the batch."""
+        ids = [
+            item['id'] for item in self.items
+            if isinstance(item, dict) and is_id(item.get('id'))
+        ]
+        if not ids:
+            return {}
+
+        recipes = Recipe.objects.filter(
+            user=self.user,
+            id__in=ids,
+        ).select_for_update().prefetch_related('tags', 'ingredients')
+        return {recipe.id: recipe for recipe in recipes}
+
+    def _validate_item(self, item, instances, seen):
+        """Return the (action, instance, data) op and errors for an item."""
+        if not isinstance(item, dict):
+            return None, {'non_field_errors': [_('Expected an object.')]}
+
+        payload = dict(item)
+        recipe_id = payload.pop('id', None)
+        try:
+            delete = serializers.BooleanField().run_validation(
+                payload.pop('delete', False),
+            )
+        except serializers.ValidationError as exc:
+            return None, {'delete': exc.detail}
+        if delete and payload:
+            msg = _('Deleted items may only have an id.')
+            return None, {'delete': [msg]}
+        instance = None
+
+        if recipe_id is None:
+            if delete:
+                return None, {'id': [_('This field is required.')]}
+        elif not is_id(recipe_id):
+            return None, {'id': [_('A valid integer is required.')]}
+        elif recipe_id in seen:
+            return None, {'id': [_('Duplicate id in batch.')]}
+        elif recipe_id not in instances:
+            return None, {'id': [_('Not found.')]}
+        else:
+            seen.add(recipe_id)
+            instance = instances[recipe_id]
+
+        if delete:
+            return ('delete', instance, None), {}
+
+        serializer = RecipeDetailSerializer(
+            instance,
+            data=payload,
+            partial=instance is not None,
+            context=self.context,
+        )
+        if not serializer.is_valid():
+            return None, serializer.errors
+
+        action = 'create' if instance is None else 'update'
+        return (action, instance, serializer.validated_data), {}
+
+    def _resolve_names(self):
+        """Return {field: {name: id}} for every name used in the batch."""
+        resolved = {}
+        for field, model, _column in RELATED_FIELDS:
+            names = {
+                item['name']
+                for action, instance, data in self._ops if data
+                for item in data.get(field, [])
+            }
+            resolved[field] = {
+                obj.name: obj.id
+                for obj in model.objects.get_or_create_many(self.user, names)
+            }
+        return resolved
+
+    def save(self):
+        """Apply the validated batch and return per-item results."""
+        resolved = self._resolve_names()
+        related = {field for field, _model, _column in RELATED_FIELDS}
+
+        created = []
+        updated = []
+        update_fields = set()
+        for action, instance, data in self._ops:
+            fields = {k: v for k, v in data.items() if k not in related} \
+                if data else {}
+            if action == 'create':
+                created.append(Recipe(user=self.user, **fields))
+            elif action == 'update':
+                for attr, value in fields.items():
+                    setattr(instance, attr, value)
+                update_fields.update(fields)
+                updated.append(instance)
+
+        Recipe.objects.bulk_create(created)
+        if updated and update_fields:
+            Recipe.objects.bulk_update(updated, sorted(update_fields))
+
+        created_iter = iter(created)
+        recipes = []
+        for action, instance, data in self._ops:
+            if action == 'create':
+                instance = next(created_iter)
+            recipes.append(instance)
+
+        self._write_links(recipes, resolved)
+
+        saved_ids = [
+            recipe.id for (action, _instance, _data), recipe
+            in zip(self._ops, recipes) if action != 'delete'
+        ]
+        Recipe.objects.filter(id__in=saved_ids).update_search_vector()
+
+        deleted_ids = [
+            instance.id for action, instance, data in self._ops
+            if action == 'delete'
+        ]
+        if deleted_ids:
+            Recipe.objects.filter(id__in=deleted_ids).delete()
+
+        schedule_version_bump(self.user.pk)
+        return self._results(recipes, saved_ids)
+
+    def _write_links(self, recipes, resolved):
+        """Add and remove through rows for every item in two statements."""
+        for field, model, column in RELATED_FIELDS:
+            through = getattr(Recipe, field).through
+            stale = Q()
+            added = []
+
+            for (action, instance, data), recipe in zip(self._ops, recipes):
+                if not data or field not in data:
+                    continue
+
+                names = resolved[field]
+                wanted = {names[item['name']] for item in data[field]}
+                current = set()
+                if action == 'update':
+                    current = {obj.id for obj in getattr(recipe, field).all()}
+
+                removed = current - wanted
+                if removed:
+                    stale |= Q(
+                        recipe_id=recipe.id,
+                        **{f'{column}__in': removed},
+                    )
+                added.extend(
+                    through(recipe_id=recipe.id, **{column: related_id})
+                    for related_id in wanted - current
+                )
+
+            if stale:
+                through.objects.filter(stale).delete()
+            through.objects.bulk_create(added)
+
+    def _results(self, recipes, saved_ids):
+        """Serialize the outcome of each item in request order."""
+        saved = Recipe.objects.prefetch_related(
+            'tags',
+            'ingredients',
+        ).in_bulk(saved_ids)
+
+        results = []
+        for (action, _instance, _data), recipe in zip(self._ops, recipes):
+            result = {'id': recipe.id, 'status': RESULT_STATUS[action]}
+            if action != 'delete':
+                result['data'] = RecipeDetailSerializer(
+                    saved[recipe.id],
+                    context=self.context,
+                ).data
+            results.append(result)
+
+        return results
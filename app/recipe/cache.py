@@ -0,0 +1,67 @@
+"""
+Per-user versioned response cache for the recipe API.
+
+Every user has a data version stored in the cache. Cached responses are
+keyed by that version, so bumping it after a write makes all older entries
+unreachable without having to find and purge them.
+"""
+import hashlib
+import time
+
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def get_cache():
+    """Return the configured response cache, or None if disabled."""
+    alias = getattr(settings, 'RECIPE_RESPONSE_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _version_key(user_id):
+    return f'recipe:version:{user_id}'
+
+
+def _new_version():
+    # Start from the clock rather than 1 so an evicted version key never
+    # brings back entries cached under an earlier version.
+    return time.time_ns()
+
+
+def get_data_version(user_id):
+    """Return the current data version for a user."""
+    cache = get_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_data_version(user_id):
+    """Invalidate every cached response for a user."""
+    cache = get_cache()
+    if cache is None:
+        return
+
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), _new_version(), None)
+
+
+def schedule_version_bump(user_id):
+    """Bump the user's data version once the current transaction commits."""
+    transaction.on_commit(lambda: bump_data_version(user_id))
+
+
+def response_cache_key(request):
+    """Return the cache key for a request at the user's current version."""
+    user_id = request.user.pk
+    version = get_data_version(user_id)
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'recipe:response:{user_id}:{version}:{path}'
@@ -0,0 +1,87 @@
+"""
+Streaming export of recipes as NDJSON or CSV.
+"""
+import csv
+import json
+
+
+from django.db.models import prefetch_related_objects
+from rest_framework.utils.encoders import JSONEncoder
+
+
+from recipe.serializers import RecipeDetailSerializer
+
+
+CHUNK_SIZE = 1000
+
+CSV_FIELDS = [
+    'id', 'title', 'time_minutes', 'price', 'link', 'description',
+    'image', 'tags', 'ingredients',
+]
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class Echo:
+    """File-like object that returns what is written to it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_chunks(queryset, chunk_size=None):
+    """
+    Yield lists of recipes with tags and ingredients prefetched.
+
+    Recipes are read through a server-side cursor and related rows are
+    fetched once per chunk, so memory use does not grow with the table.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    chunk = []
+    for recipe in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(recipe)
+        if len(chunk) == chunk_size:
+            prefetch_related_objects(chunk, 'tags', 'ingredients')
+            yield chunk
+            chunk = []
+
+    if chunk:
+        prefetch_related_objects(chunk, 'tags', 'ingredients')
+        yield chunk
+
+
+def iter_records(queryset, context, chunk_size=None):
+    """Yield the detail representation of every recipe in queryset."""
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield from RecipeDetailSerializer(
+            chunk,
+            many=True,
+            context=context,
+        ).data
+
+
+def iter_ndjson(queryset, context, chunk_size=None):
+    """Yield one JSON document per line for each recipe."""
+    for record in iter_records(queryset, context, chunk_size):
+        yield json.dumps(record, cls=JSONEncoder) + '\n'
+
+
+def iter_csv(queryset, context, chunk_size=None):
+    """Yield CSV rows, with tag and ingredient names joined by ';'."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for record in iter_records(queryset, context, chunk_size):
+        record['tags'] = ';'.join(tag['name'] for tag in record['tags'])
+        record['ingredients'] = ';'.join(
+            ingredient['name'] for ingredient in record['ingredients']
+        )
+        yield writer.writerow([record[field] for field in CSV_FIELDS])
+
+
+EXPORTERS = {
+    'ndjson': iter_ndjson,
+    'csv': iter_csv,
+}
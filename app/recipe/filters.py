@@ -0,0 +1,84 @@
+"""
+Filter backends for the recipe API.
+"""
+from django.db.models import Exists, OuterRef
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+from core.models import Recipe
+
+
+class RecipeRelationFilter(BaseFilterBackend):
+    """
+    Filter recipes by tag and ingredient ids.
+
+    ``?tags=1,2`` keeps recipes having any of the tags, and adding
+    ``?tags_match=all`` keeps recipes having all of them. ``ingredients``
+    works the same way. Each condition is an EXISTS subquery on the
+    through table, so recipes are never duplicated and no DISTINCT is
+    needed.
+    """
+    # (query parameter and Recipe field, through table column)
+    relations = [
+        ('tags', 'tag_id'),
+        ('ingredients', 'ingredient_id'),
+    ]
+
+    def _parse_ids(self, request, param):
+        value = request.query_params.get(param)
+        if not value:
+            return []
+
+        try:
+            return sorted({int(part) for part in value.split(',')})
+        except ValueError:
+            msg = _('Enter a comma separated list of ids.')
+            raise ValidationError({param: [msg]})
+
+    def filter_queryset(self, request, queryset, view):
+        for field, column in self.relations:
+            ids = self._parse_ids(request, field)
+            if not ids:
+                continue
+
+            links = getattr(Recipe, field).through.objects.filter(
+                recipe_id=OuterRef('pk'),
+            )
+            match = request.query_params.get(f'{field}_match', 'any')
+            if match == 'any':
+                queryset = queryset.filter(
+                    Exists(links.filter(**{f'{column}__in': ids}))
+                )
+            elif match == 'all':
+                for related_id in ids:
+                    queryset = queryset.filter(
+                        Exists(links.filter(**{column: related_id}))
+                    )
+            else:
+                msg = _('Must be "any" or "all".')
+                raise ValidationError({f'{field}_match': [msg]})
+
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        parameters = []
+        for field, _column in self.relations:
+            parameters += [
+                {
+                    'name': field,
+                    'required': False,
+                    'in': 'query',
+                    'description': f'Comma separated list of {field} ids.',
+                    'schema': {'type': 'string'},
+                },
+                {
+                    'name': f'{field}_match',
+                    'required': False,
+                    'in': 'query',
+                    'description': f'Match any (default) or all {field}.',
+                    'schema': {'type': 'string', 'enum': ['any', 'all']},
+                },
+            ]
+        return parameters
@@ -0,0 +1,201 @@
+"""
+Background processing of uploaded recipe images.
+
+Uploads are stored as received under PRIVATE_MEDIA_ROOT and queued here
+once the request's transaction commits. A small thread pool then decodes
+each image, drops its metadata, and writes re-encoded variants to
+MEDIA_ROOT at the sizes configured in RECIPE_IMAGE_VARIANTS, plus an
+"original" variant capped at RECIPE_IMAGE_ORIGINAL_SIZE. Only variants are
+served, so the upload itself, EXIF and GPS tags included, never is; the
+variant paths repeat the upload's name, but that name does not resolve
+anywhere under MEDIA_URL. Pillow releases the
+GIL while decoding, resizing and encoding, so threads are enough to keep
+this off the request path.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+
+from core.models import Recipe
+from recipe.uploads import check_dimensions
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VARIANTS = {'large': 1600, 'medium': 800, 'small': 320}
+ORIGINAL_VARIANT = 'original'
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_sizes():
+    """Return {variant name: longest edge in pixels}."""
+    sizes = dict(getattr(settings, 'RECIPE_IMAGE_VARIANTS', DEFAULT_VARIANTS))
+    sizes[ORIGINAL_VARIANT] = getattr(
+        settings, 'RECIPE_IMAGE_ORIGINAL_SIZE', 4096,
+    )
+    return sizes
+
+
+def output_format():
+    """Return the Pillow format variants are encoded with."""
+    fmt = getattr(settings, 'RECIPE_IMAGE_FORMAT', 'WEBP')
+    if fmt == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return fmt
+
+
+def _encode_options(fmt):
+    """Return the Pillow save options for fmt."""
+    options = {'quality': getattr(settings, 'RECIPE_IMAGE_QUALITY', 80)}
+    if fmt == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    elif fmt == 'WEBP':
+        options.update(method=4)
+    return options
+
+
+def _encode(image, fmt):
+    """Encode image without any of the source metadata."""
+    if fmt == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **_encode_options(fmt))
+    return buffer.getvalue()
+
+
+def variant_path(stem, label, size, fmt):
+    """Return the storage name of a variant.
+
+    The name changes with the size and encoding settings, so a stored
+    variant is never rewritten and can be cached as immutable.
+    """
+    options = sorted(_encode_options(fmt).items())
+    key = hashlib.sha256(f'{size}:{fmt}:{options}'.encode()).hexdigest()
+    ext = EXTENSIONS.get(fmt, fmt.lower())
+    return f'{stem}/{label}-{key[:12]}.{ext}'
+
+
+def render_variants(name):
+    """Write the variants of the stored image name, returning their names."""
+    sizes = variant_sizes()
+    fmt = output_format()
+    stem = os.path.splitext(name)[0]
+    paths = {
+        label: variant_path(stem, label, size, fmt)
+        for label, size in sizes.items()
+    }
+
+    # Identical uploads share a stored image and therefore its variants.
+    if all(default_storage.exists(path) for path in paths.values()):
+        return paths
+
+    uploads = Recipe._meta.get_field('image').storage
+    with uploads.open(name) as source:
+        image = Image.open(source)
+        check_dimensions(image)
+        # Let JPEG decode at a reduced scale when the largest variant is
+        # much smaller than the upload.
+        longest = max(sizes.values())
+        image.draft('RGB', (longest, longest))
+        image.load()
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            alpha = 'A' in image.getbands()
+            image = image.convert('RGBA' if alpha else 'RGB')
+
+    variants = {}
+    for label, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        path = paths[label]
+        if default_storage.exists(path):
+            variants[label] = path
+            continue
+        variant = image.copy()
+        variant.thumbnail((size, size), Image.LANCZOS)
+        variants[label] = default_storage.save(
+            path, ContentFile(_encode(variant, fmt))
+        )
+    return variants
+
+
+def process_recipe_image(recipe_id):
+    """Process the recipe's current image if it is still pending."""
+    name = Recipe.objects.filter(pk=recipe_id).values_list(
+        'image', flat=True
+    ).first()
+    if not name:
+        return None
+
+    current = Recipe.objects.filter(pk=recipe_id, image=name)
+    claimed = current.filter(
+        image_status=Recipe.ImageStatus.PENDING,
+    ).update(image_status=Recipe.ImageStatus.PROCESSING)
+    if not claimed:
+        return None
+
+    try:
+        variants = render_variants(name)
+    except Exception:
+        logger.exception('Failed to process image %s', name)
+        current.update(image_status=Recipe.ImageStatus.FAILED)
+        return Recipe.ImageStatus.FAILED
+
+    # The image may have been replaced while this one was processed, in
+    # which case the newer upload owns the recipe's status.
+    current.update(
+        image_status=Recipe.ImageStatus.READY,
+        image_variants=variants,
+    )
+    return Recipe.ImageStatus.READY
+
+
+def _run(recipe_id):
+    try:
+        process_recipe_image(recipe_id)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'RECIPE_IMAGE_WORKERS', 2),
+                thread_name_prefix='recipe-image',
+            )
+    return _executor
+
+
+def submit(recipe_id):
+    """Process a recipe image in the pool, or inline with no workers."""
+    if getattr(settings, 'RECIPE_IMAGE_WORKERS', 2) <= 0:
+        process_recipe_image(recipe_id)
+        return None
+
+    return _get_executor().submit(_run, recipe_id)
+
+
+def schedule_processing(recipe):
+    """Mark the recipe's image pending and queue it after commit."""
+    recipe.image_status = Recipe.ImageStatus.PENDING
+    recipe.image_variants = {}
+    Recipe.objects.filter(pk=recipe.pk).update(
+        image_status=recipe.image_status,
+        image_variants=recipe.image_variants,
+    )
+    transaction.on_commit(lambda: submit(recipe.pk))
@@ -0,0 +1,51 @@
+"""
+Pagination classes for the recipe API.
+"""
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination rejecting positions of the wrong type.
+
+    The position is compared with the first ordering field, so a tampered
+    cursor holding, say, text for an integer field is answered with 404
+    like any other invalid cursor, not a 500 from the query.
+    """
+    position_type = str
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is not None and cursor.position is not None:
+            try:
+                self.position_type(cursor.position)
+            except (TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+
+class RecipeCursorPagination(KeysetCursorPagination):
+    """Keyset pagination for recipes, newest first."""
+    ordering = ['-id']
+    position_type = int
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class RecipeAttrCursorPagination(KeysetCursorPagination):
+    """Keyset pagination for tags and ingredients, ordered by name."""
+    ordering = ['-name', '-id']
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class RecipeSearchCursorPagination(KeysetCursorPagination):
+    """Keyset pagination for search results, best match first."""
+    ordering = ['-rank', '-id']
+    position_type = float
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
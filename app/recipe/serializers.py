@@ -1,29 +1,40 @@
 """Serializers for recipe API."""
+from django.core.files.storage import default_storage
+from django.db import transaction
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
 
+from core import metrics
 from core.models import Recipe, Tag, Ingredient
+from core.serializers import TimedListSerializer, TimedSerializerMixin
+from recipe.cache import schedule_version_bump
+from recipe.images import ORIGINAL_VARIANT
+from recipe.uploads import InvalidImage, inspect_image
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for tags"""
 
     class Meta:
         model = Tag
         fields = ['id', 'name']
         read_only_fields = ['id']
+        list_serializer_class = TimedListSerializer
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     """Serializer for ingredients."""
 
     class Meta:
         model = Ingredient
         fields = ['id', 'name', ]
         read_only_fields = ['id']
+        list_serializer_class = TimedListSerializer
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for recipes."""
 
     tags = TagSerializer(many=True, required=False)
@@ -35,27 +46,39 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'tags', 'ingredients'
                   ]
         read_only_fields = ['id']
+        list_serializer_class = TimedListSerializer
 
-    def _link_tags(self, instance, tags):
-        """Handle getting or creating tags as needed."""
+    def _get_or_create_named(self, model, items):
+        """Return objects matching item names, creating missing ones."""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            instance.tags.add(tag_obj)
+        return model.objects.get_or_create_many(
+            auth_user,
+            (item['name'] for item in items),
+        )
+
+    def _link(self, manager, model, items, replace=False):
+        """Link named objects through manager, touching only changed rows."""
+        wanted = {obj.id for obj in self._get_or_create_named(model, items)}
+
+        if replace:
+            current = set(manager.values_list('id', flat=True))
+            stale = current - wanted
+            if stale:
+                manager.remove(*stale)
+            wanted -= current
+
+        if wanted:
+            manager.add(*wanted)
 
-    def _link_ingredients(self, instance, ingredients):
+    def _link_tags(self, instance, tags, replace=False):
+        """Handle getting or creating tags as needed."""
+        self._link(instance.tags, Tag, tags, replace)
+
+    def _link_ingredients(self, instance, ingredients, replace=False):
         """Handle getting or creating ingredients as needed."""
-        auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient
-            )
-            instance.ingredients.add(ingredient_obj)
+        self._link(instance.ingredients, Ingredient, ingredients, replace)
 
+    @transaction.atomic
     def create(self, validated_data):
         """Create a recipe."""
         tags = validated_data.pop('tags', [])
@@ -63,40 +86,209 @@ class RecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         self._link_tags(recipe, tags)
         self._link_ingredients(recipe, ingredients)
+        Recipe.objects.filter(pk=recipe.pk).update_search_vector()
+        schedule_version_bump(recipe.user_id)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update a recipe."""
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
 
         if tags is not None:
-            instance.tags.clear()
-            self._link_tags(instance, tags)
+            self._link_tags(instance, tags, replace=True)
 
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._link_ingredients(instance, ingredients)
+            self._link_ingredients(instance, ingredients, replace=True)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
         instance.save()
+        Recipe.objects.filter(pk=instance.pk).update_search_vector()
+        schedule_version_bump(instance.user_id)
         return instance
 
 
+@extend_schema_field({
+    'type': 'object',
+    'additionalProperties': {'type': 'string', 'format': 'uri'},
+})
+class ImageVariantsField(serializers.Field):
+    """Represent {variant: stored name} as {variant: URL}."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for label, name in (value or {}).items():
+            url = default_storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[label] = url
+        return urls
+
+
+@extend_schema_field({'type': 'string', 'format': 'uri', 'nullable': True})
+class OriginalImageField(ImageVariantsField):
+    """Represent the re-encoded original image, never the raw upload."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'image_variants')
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return super().to_representation(value).get(ORIGINAL_VARIANT)
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for recipe detail view."""
+    image = OriginalImageField()
+    image_variants = ImageVariantsField()
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image', ]
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_status', 'image_variants',
+        ]
+
+
+class RecipeRowSerializer:
+    """
+    Read-only fast path producing the same output as RecipeSerializer.
 
+    Takes values() rows instead of model instances and fetches tags and
+    ingredients as pre-grouped (id, name) tuples, skipping DRF's per-field
+    machinery for plain columns. Only fields whose representation differs
+    from the database value (decimals, files) go through their DRF field.
+    """
+    base_serializer = RecipeSerializer
+    related_fields = ['tags', 'ingredients']
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @classmethod
+    def value_fields(cls):
+        """Return the model fields to select with values()."""
+        return [
+            name for name in cls.base_serializer.Meta.fields
+            if name not in cls.related_fields
+        ]
+
+    def _converters(self):
+        """Return {field name: (column, callable)} for fields to convert."""
+        fields = self.base_serializer(context=self.context).fields
+        converters = {}
+        for name in self.value_fields():
+            field = fields[name]
+            if isinstance(field, serializers.FileField):
+                model_field = Recipe._meta.get_field(name)
+                converters[name] = (
+                    name, self._file_converter(field, model_field),
+                )
+            elif isinstance(field, (serializers.DecimalField,
+                                    ImageVariantsField)):
+                converters[name] = (field.source, field.to_representation)
+        return converters
+
+    @staticmethod
+    def _file_converter(field, model_field):
+        def convert(name):
+            value = model_field.attr_class(None, model_field, name)
+            return field.to_representation(value)
+        return convert
+
+    def _group_related(self, recipe_ids):
+        """Return {field: {recipe id: [(id, name), ...]}} ordered by id."""
+        grouped = {}
+        for field in self.related_fields:
+            through = getattr(Recipe, field).through
+            column = Recipe._meta.get_field(field).m2m_reverse_name()
+            target = column[:-len('_id')]
+            rows = through.objects.filter(
+                recipe_id__in=recipe_ids,
+            ).order_by(column).values_list(
+                'recipe_id', column, f'{target}__name',
+            )
+            by_recipe = {}
+            for recipe_id, related_id, name in rows:
+                by_recipe.setdefault(recipe_id, []).append((related_id, name))
+            grouped[field] = by_recipe
+        return grouped
+
+    def _represent(self, rows):
+        rows = list(rows)
+        if not rows:
+            return []
+
+        converters = self._converters()
+        grouped = self._group_related([row['id'] for row in rows])
+
+        data = []
+        for row in rows:
+            item = {}
+            for name in self.base_serializer.Meta.fields:
+                if name in grouped:
+                    item[name] = [
+                        {'id': related_id, 'name': related_name}
+                        for related_id, related_name
+                        in grouped[name].get(row['id'], ())
+                    ]
+                elif name in converters:
+                    column, convert = converters[name]
+                    item[name] = convert(row[column])
+                else:
+                    item[name] = row[name]
+            data.append(item)
+        return data
+
+    @property
+    def data(self):
+        with metrics.timed('serialize'):
+            if self.many:
+                return self._represent(self.instance)
+            return self._represent([self.instance])[0]
+
+
+class RecipeDetailRowSerializer(RecipeRowSerializer):
+    """Read-only fast path producing the same output as the detail view."""
+    base_serializer = RecipeDetailSerializer
+
+
+class HeaderValidatedImageField(serializers.FileField):
+    """Image field that validates uploads without decoding them."""
+
+    def to_internal_value(self, data):
+        upload = super().to_internal_value(data)
+        try:
+            inspect_image(upload)
+        except InvalidImage as exc:
+            raise serializers.ValidationError(str(exc))
+        return upload
+
+
+class RecipeImageSerializer(TimedSerializerMixin,
+                            serializers.ModelSerializer):
     """Seruializer for uploading images to recipes."""
+    image = HeaderValidatedImageField(required=True, write_only=True)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # The upload has no URL; only its stripped re-encode is served,
+        # once processed.
+        field = OriginalImageField()
+        field.bind('image', self)
+        data['image'] = field.to_representation(instance.image_variants)
+        return data
 
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
-        read_only_fields = ['id']
-        extra_kwargs = {'image': {'required': 'True'}}    
+        fields = ['id', 'image', 'image_status']
+        read_only_fields = ['id', 'image_status']
+        extra_kwargs = {'image': {'required': 'True'}}
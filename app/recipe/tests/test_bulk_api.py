@@ -0,0 +1,211 @@
+"""
+Tests for the bulk recipe API.
+"""
+from decimal import Decimal
+
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+from core.models import Recipe, Tag, Ingredient
+
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def create_recipe(user, **kwargs):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(kwargs)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def recipe_payload(index, **kwargs):
+    """Return a recipe payload for the bulk endpoint."""
+    payload = {
+        'title': f'Recipe {index}',
+        'time_minutes': 10,
+        'price': '1.50',
+        'tags': [{'name': 'Dinner'}, {'name': f'Tag {index}'}],
+        'ingredients': [{'name': 'Salt'}],
+    }
+    payload.update(kwargs)
+    return payload
+
+
+class PublicBulkApiTests(TestCase):
+    """Test unauthenticated bulk requests."""
+
+    def setUp(self):
+        self.client = APIClient()
+        return super().setUp()
+
+    def test_auth_required(self):
+        """Test auth is required to call the bulk API."""
+        resp = self.client.post(BULK_URL, [], format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBulkApiTests(TestCase):
+    """Test authenticated bulk requests."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123', is_active=True
+        )
+        self.client.force_authenticate(self.user)
+        return super().setUp()
+
+    def test_bulk_create(self):
+        """Test creating several recipes with shared tags."""
+        payload = [recipe_payload(i) for i in range(3)]
+
+        resp = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.data), 3)
+        self.assertTrue(all(r['status'] == 'created' for r in resp.data))
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        self.assertEqual(Tag.objects.filter(name='Dinner').count(), 1)
+        self.assertEqual(Ingredient.objects.filter(name='Salt').count(), 1)
+        for result in resp.data:
+            recipe = recipes.get(id=result['id'])
+            self.assertEqual(result['data']['title'], recipe.title)
+            self.assertEqual(recipe.tags.count(), 2)
+            self.assertEqual(recipe.ingredients.count(), 1)
+
+    def test_bulk_update_and_delete(self):
+        """Test updating and deleting recipes in one request."""
+        tag = Tag.objects.create(user=self.user, name='Old')
+        keep = Tag.objects.create(user=self.user, name='Keep')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag, keep)
+        doomed = create_recipe(user=self.user)
+
+        payload = [
+            {
+                'id': recipe.id,
+                'title': 'Updated',
+                'tags': [{'name': 'Keep'}, {'name': 'New'}],
+            },
+            {'id': doomed.id, 'delete': True},
+        ]
+        resp = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data[0]['status'], 'updated')
+        self.assertEqual(resp.data[1]['status'], 'deleted')
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Updated')
+        self.assertEqual(recipe.time_minutes, 22)
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)),
+            {'Keep', 'New'},
+        )
+        self.assertFalse(Recipe.objects.filter(id=doomed.id).exists())
+
+    def test_bulk_delete_flag_validated(self):
+        """Test only a true delete flag on a bare id deletes a recipe."""
+        recipe = create_recipe(user=self.user)
+
+        kept = self.client.post(BULK_URL, [
+            {'id': recipe.id, 'delete': 'false', 'title': 'Keep me'},
+        ], format='json')
+        invalid = [
+            {'id': recipe.id, 'delete': True, 'title': 'x' * 300},
+            {'id': recipe.id, 'delete': 'maybe'},
+            {'id': True, 'delete': True},
+        ]
+        rejected = [
+            self.client.post(BULK_URL, [item], format='json')
+            for item in invalid
+        ]
+
+        self.assertEqual(kept.status_code, status.HTTP_200_OK)
+        self.assertEqual(kept.data[0]['status'], 'updated')
+        for resp, field in zip(rejected, ['delete', 'delete', 'id']):
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(field, resp.data[0])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Keep me')
+
+    def test_bulk_errors_roll_back(self):
+        """Test an invalid item reports errors and nothing is applied."""
+        recipe = create_recipe(user=self.user)
+        payload = [
+            recipe_payload(1),
+            {'id': recipe.id, 'time_minutes': 'soon'},
+            {'title': 'Missing fields'},
+        ]
+
+        resp = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(resp.data[0], {})
+        self.assertIn('time_minutes', resp.data[1])
+        self.assertIn('price', resp.data[2])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_bulk_other_users_recipe_not_found(self):
+        """Test items cannot reference another user's recipes."""
+        other_user = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123'
+        )
+        recipe = create_recipe(user=other_user)
+
+        payload = [{'id': recipe.id, 'delete': True}]
+        resp = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', resp.data[0])
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_bulk_rejects_non_list(self):
+        """Test the payload must be a list of items."""
+        resp = self.client.post(BULK_URL, {'title': 'x'}, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('non_field_errors', resp.data)
+
+    def test_bulk_query_count_is_constant(self):
+        """Test the number of queries does not grow with the batch."""
+        counts = []
+        for size in [2, 20]:
+            existing = [
+                create_recipe(user=self.user, title=f'Existing {i}')
+                for i in range(size)
+            ]
+            payload = [
+                recipe_payload(
+                    f'{size}-{i}',
+                    tags=[{'name': f'Tag {size}-{i}'}],
+                    ingredients=[{'name': f'Ingredient {size}'}],
+                )
+                for i in range(size)
+            ]
+            payload += [
+                {'id': recipe.id, 'tags': [{'name': f'Edit {size}'}]}
+                for recipe in existing
+            ]
+
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.post(BULK_URL, payload, format='json')
+
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
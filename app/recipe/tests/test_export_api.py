@@ -0,0 +1,116 @@
+"""
+Tests for the recipe export API.
+"""
+import csv
+import io
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+from core.models import Recipe, Tag, Ingredient
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def create_recipe(user, **kwargs):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(kwargs)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeExportApiTests(TestCase):
+    """Test streaming recipe exports."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123', is_active=True
+        )
+        self.client.force_authenticate(self.user)
+        return super().setUp()
+
+    def _seed(self, count):
+        """Create recipes, each with a tag and an ingredient."""
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'T{i}'))
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'I{i}')
+            )
+
+    def _content(self, resp):
+        return b''.join(resp.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        """Test exporting recipes as newline delimited JSON."""
+        self._seed(3)
+        other_user = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123'
+        )
+        create_recipe(user=other_user)
+
+        resp = self.client.get(EXPORT_URL)
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp['Content-Type'], 'application/x-ndjson')
+        records = [
+            json.loads(line)
+            for line in self._content(resp).splitlines()
+        ]
+        self.assertEqual(
+            [record['title'] for record in records],
+            ['Recipe 2', 'Recipe 1', 'Recipe 0'],
+        )
+        self.assertEqual(records[0]['tags'][0]['name'], 'T2')
+        self.assertEqual(records[0]['ingredients'][0]['name'], 'I2')
+        self.assertEqual(records[0]['price'], '5.25')
+
+    def test_export_csv(self):
+        """Test exporting recipes as CSV."""
+        self._seed(2)
+
+        resp = self.client.get(EXPORT_URL, {'type': 'csv'})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(self._content(resp))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['title'], 'Recipe 1')
+        self.assertEqual(rows[0]['tags'], 'T1')
+        self.assertEqual(rows[0]['ingredients'], 'I1')
+
+    def test_export_unknown_type(self):
+        """Test an unsupported export type is rejected."""
+        resp = self.client.get(EXPORT_URL, {'type': 'xml'})
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch('recipe.export.CHUNK_SIZE', 2)
+    def test_export_queries_per_chunk(self):
+        """Test related rows are fetched once per chunk, not per recipe."""
+        self._seed(5)
+
+        resp = self.client.get(EXPORT_URL)
+        with CaptureQueriesContext(connection) as ctx:
+            lines = self._content(resp).splitlines()
+
+        self.assertEqual(len(lines), 5)
+        # one cursor over recipes, then tags and ingredients per chunk
+        self.assertEqual(len(ctx.captured_queries), 1 + 2 * 3)
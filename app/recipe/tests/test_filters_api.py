@@ -0,0 +1,169 @@
+"""
+Tests for filtering recipes by tags and ingredients.
+"""
+from decimal import Decimal
+
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.request import Request
+
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.filters import RecipeRelationFilter
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, **kwargs):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(kwargs)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeFilterApiTests(TestCase):
+    """Test the tag and ingredient filters on the recipe list."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123', is_active=True
+        )
+        self.client.force_authenticate(self.user)
+
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+        self.both = create_recipe(user=self.user, title='Both')
+        self.both.tags.add(self.vegan, self.quick)
+        self.both.ingredients.add(self.salt)
+        self.vegan_only = create_recipe(user=self.user, title='Vegan only')
+        self.vegan_only.tags.add(self.vegan)
+        self.untagged = create_recipe(user=self.user, title='Untagged')
+        return super().setUp()
+
+    def _titles(self, params):
+        resp = self.client.get(RECIPES_URL, params)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return sorted(recipe['title'] for recipe in resp.data['results'])
+
+    def test_filter_any_tags(self):
+        """Test recipes with any of the tags are returned once each."""
+        titles = self._titles({'tags': f'{self.vegan.id},{self.quick.id}'})
+
+        self.assertEqual(titles, ['Both', 'Vegan only'])
+
+    def test_filter_all_tags(self):
+        """Test recipes must have every tag with tags_match=all."""
+        titles = self._titles({
+            'tags': f'{self.vegan.id},{self.quick.id}',
+            'tags_match': 'all',
+        })
+
+        self.assertEqual(titles, ['Both'])
+
+    def test_filter_tags_and_ingredients(self):
+        """Test tag and ingredient filters combine."""
+        titles = self._titles({
+            'tags': f'{self.vegan.id}',
+            'ingredients': f'{self.salt.id}',
+        })
+
+        self.assertEqual(titles, ['Both'])
+
+    def test_filter_invalid_ids(self):
+        """Test a malformed id list is rejected."""
+        resp = self.client.get(RECIPES_URL, {'tags': '1,abc'})
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_invalid_match(self):
+        """Test an unknown match mode is rejected."""
+        resp = self.client.get(
+            RECIPES_URL,
+            {'tags': f'{self.vegan.id}', 'tags_match': 'some'},
+        )
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeFilterPlanTests(TestCase):
+    """Test the filters compile to index-backed EXISTS subqueries."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        return super().setUp()
+
+    def _filtered(self, params):
+        request = Request(APIRequestFactory().get(RECIPES_URL, params))
+        queryset = Recipe.objects.filter(user=self.user).order_by('-id')
+        return RecipeRelationFilter().filter_queryset(request, queryset, None)
+
+    def _plan(self, queryset):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        try:
+            return queryset.explain()
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = on')
+
+    def test_any_uses_exists_without_distinct(self):
+        """Test any-of filtering needs no DISTINCT and uses the index."""
+        queryset = self._filtered({'tags': '1,2', 'ingredients': '3'})
+
+        sql = str(queryset.query).upper()
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+        plan = self._plan(queryset)
+        self.assertNotIn('Unique', plan)
+        self.assertNotIn('HashAggregate', plan)
+        self.assertIn('core_recipe_tags', plan)
+        self.assertIn('core_recipe_ingredients', plan)
+        self.assertNotIn('Seq Scan', plan)
+
+    def test_all_uses_one_exists_per_id(self):
+        """Test all-of filtering adds one EXISTS per id."""
+        queryset = self._filtered({'tags': '1,2,3', 'tags_match': 'all'})
+
+        sql = str(queryset.query).upper()
+        self.assertEqual(sql.count('EXISTS'), 3)
+        self.assertNotIn('DISTINCT', sql)
+        self.assertNotIn('Seq Scan', self._plan(queryset))
+
+    def test_reverse_lookup_index_exists(self):
+        """Test the through tables have (related, recipe) indexes."""
+        with connection.cursor() as cursor:
+            constraints = {
+                table: connection.introspection.get_constraints(
+                    cursor, table,
+                )
+                for table in ['core_recipe_tags', 'core_recipe_ingredients']
+            }
+
+        self.assertEqual(
+            constraints['core_recipe_tags'][
+                'core_recipe_tags_tag_recipe_idx'
+            ]['columns'],
+            ['tag_id', 'recipe_id'],
+        )
+        self.assertEqual(
+            constraints['core_recipe_ingredients'][
+                'core_recipe_ingr_ingr_recipe_idx'
+            ]['columns'],
+            ['ingredient_id', 'recipe_id'],
+        )
@@ -0,0 +1,372 @@
+"""
+Tests for background recipe image processing.
+"""
+import io
+import os
+import struct
+import tempfile
+import zlib
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+
+from PIL import Image, ImageFile
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+from core.models import Recipe
+from recipe import images, uploads
+
+
+MEDIA_URL = '/static/media/'
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL."""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def jpeg_bytes(size=(1200, 900), exif=True):
+    """Return JPEG bytes, optionally carrying EXIF with an orientation."""
+    image = Image.new('RGB', size, color=(200, 30, 30))
+    buffer = io.BytesIO()
+    options = {}
+    if exif:
+        data = Image.Exif()
+        data[0x0112] = 6  # Orientation: rotate 90 degrees clockwise.
+        data[0x010F] = 'Camera maker'
+        options['exif'] = data.tobytes()
+    image.save(buffer, format='JPEG', **options)
+    return buffer.getvalue()
+
+
+def png_claiming_size(width, height):
+    """Return a tiny PNG whose header claims the given dimensions."""
+    buffer = io.BytesIO()
+    Image.new('L', (1, 1)).save(buffer, format='PNG')
+    data = bytearray(buffer.getvalue())
+    # IHDR chunk data starts at byte 16: width, height, then 5 more bytes.
+    data[16:24] = struct.pack('>II', width, height)
+    crc = zlib.crc32(bytes(data[12:29]))
+    data[29:33] = struct.pack('>I', crc)
+    return bytes(data)
+
+
+class ImageProcessingTests(TestCase):
+    """Test variants rendered from uploaded images."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.private = tempfile.TemporaryDirectory()
+        self.addCleanup(self.private.cleanup)
+        settings = self.settings(
+            MEDIA_ROOT=self.media.name,
+            PRIVATE_MEDIA_ROOT=self.private.name,
+            RECIPE_IMAGE_WORKERS=0,
+            RECIPE_IMAGE_FORMAT='JPEG',
+            RECIPE_IMAGE_VARIANTS={'large': 600, 'small': 100},
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.recipe = create_recipe(self.user)
+
+    def _store(self, data, name='photo.jpg'):
+        self.recipe.image.save(name, ContentFile(data))
+        images.schedule_processing(self.recipe)
+
+    def test_variants_resized_and_stripped(self):
+        """Test variants are resized, rotated and carry no EXIF."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self._store(jpeg_bytes())
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.ImageStatus.READY)
+        self.assertEqual(
+            set(self.recipe.image_variants), {'original', 'large', 'small'},
+        )
+
+        path = os.path.join(
+            self.media.name, self.recipe.image_variants['large'],
+        )
+        with Image.open(path) as variant:
+            self.assertEqual(variant.format, 'JPEG')
+            # 1200x900 rotated by the EXIF orientation, then fit in 600.
+            self.assertEqual(variant.size, (450, 600))
+            self.assertEqual(len(variant.getexif()), 0)
+
+        path = os.path.join(
+            self.media.name, self.recipe.image_variants['small'],
+        )
+        with Image.open(path) as variant:
+            self.assertEqual(max(variant.size), 100)
+
+        path = os.path.join(
+            self.media.name, self.recipe.image_variants['original'],
+        )
+        with Image.open(path) as variant:
+            self.assertEqual(variant.size, (900, 1200))
+            self.assertEqual(len(variant.getexif()), 0)
+
+    def test_changed_settings_write_new_variants(self):
+        """Test variants are never rewritten in place, as they are cached."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self._store(jpeg_bytes())
+        self.recipe.refresh_from_db()
+        before = self.recipe.image_variants
+        path = os.path.join(self.media.name, before['large'])
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        with self.settings(RECIPE_IMAGE_QUALITY=40):
+            after = images.render_variants(self.recipe.image.name)
+
+        self.assertNotEqual(after['large'], before['large'])
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(
+            images.render_variants(self.recipe.image.name), before,
+        )
+
+    def test_corrupt_image_marked_failed(self):
+        """Test an image that cannot be decoded is marked failed."""
+        with self.assertLogs('recipe.images', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self._store(b'not really a jpeg')
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.ImageStatus.FAILED)
+        self.assertEqual(self.recipe.image_variants, {})
+
+    def test_replaced_image_not_overwritten(self):
+        """Test a job finishing after the image was replaced is dropped."""
+        self._store(jpeg_bytes(exif=False))
+
+        def replace_image(name):
+            Recipe.objects.filter(pk=self.recipe.pk).update(
+                image='uploads/recipe/newer.jpg',
+                image_status=Recipe.ImageStatus.PENDING,
+            )
+            return {'large': 'uploads/recipe/stale.jpg'}
+
+        with patch.object(images, 'render_variants', replace_image):
+            images.process_recipe_image(self.recipe.pk)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.ImageStatus.PENDING)
+        self.assertEqual(self.recipe.image_variants, {})
+
+    def test_process_images_command(self):
+        """Test the command processes images left pending."""
+        self._store(jpeg_bytes(exif=False))
+        out = StringIO()
+
+        call_command('process_images', stdout=out)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.ImageStatus.READY)
+        self.assertIn('Processed 1 images, 0 failed.', out.getvalue())
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=0, RECIPE_IMAGE_FORMAT='JPEG')
+class ImageUploadProcessingApiTests(TestCase):
+    """Test image processing through the API."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.private = tempfile.TemporaryDirectory()
+        self.addCleanup(self.private.cleanup)
+        settings = self.settings(
+            MEDIA_ROOT=self.media.name,
+            PRIVATE_MEDIA_ROOT=self.private.name,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+
+    def test_upload_queues_processing(self):
+        """Test uploads return pending and expose variants once ready."""
+        upload = io.BytesIO(jpeg_bytes())
+        upload.name = 'photo.jpg'
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            resp = self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': upload},
+                format='multipart',
+            )
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['image_status'], 'pending')
+        self.assertIsNone(resp.data['image'])
+
+        for callback in callbacks:
+            callback()
+
+        resp = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(resp.data['image_status'], 'ready')
+        self.assertEqual(
+            set(resp.data['image_variants']),
+            {'original', 'large', 'medium', 'small'},
+        )
+        # The raw upload, metadata and all, is never linked.
+        self.assertEqual(
+            resp.data['image'], resp.data['image_variants']['original'],
+        )
+        for url in resp.data['image_variants'].values():
+            self.assertTrue(url.startswith('http://testserver/'))
+
+    @override_settings(MEDIA_SERVE_MODE='django')
+    def test_raw_upload_not_served(self):
+        """Test the upload's own path 404s while its variants are served."""
+        upload = io.BytesIO(jpeg_bytes())
+        upload.name = 'photo.jpg'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': upload},
+                format='multipart',
+            )
+        self.recipe.refresh_from_db()
+
+        raw = self.client.get(f'{MEDIA_URL}{self.recipe.image.name}')
+        variant = self.client.get(
+            f'{MEDIA_URL}{self.recipe.image_variants["original"]}',
+        )
+
+        self.assertEqual(raw.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(variant.status_code, status.HTTP_200_OK)
+        self.assertNotIn(
+            b'Camera maker', b''.join(variant.streaming_content),
+        )
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=0)
+class ImageUploadValidationTests(TestCase):
+    """Test uploads are bounded and validated from the image header."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.private = tempfile.TemporaryDirectory()
+        self.addCleanup(self.private.cleanup)
+        settings = self.settings(
+            MEDIA_ROOT=self.media.name,
+            PRIVATE_MEDIA_ROOT=self.private.name,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+
+    def _upload(self, data, name='photo.jpg'):
+        upload = io.BytesIO(data)
+        upload.name = name
+        return self.client.post(
+            image_upload_url(self.recipe.id),
+            {'image': upload},
+            format='multipart',
+        )
+
+    def test_upload_streamed_to_temporary_file(self):
+        """Test uploads are validated from a temporary file on disk."""
+        with patch.object(
+            uploads, 'inspect_image', wraps=uploads.inspect_image,
+        ) as inspect:
+            with patch('recipe.serializers.inspect_image', inspect):
+                resp = self._upload(jpeg_bytes(exif=False))
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        upload = inspect.call_args[0][0]
+        self.assertTrue(hasattr(upload, 'temporary_file_path'))
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=2048)
+    def test_upload_too_large(self):
+        """Test uploads over the size cap are refused."""
+        resp = self._upload(os.urandom(4096))
+
+        self.assertEqual(
+            resp.status_code,
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=64 * 1024)
+    def test_upload_too_large_streamed(self):
+        """Test the cap holds when the body size is not declared upfront."""
+        handler = uploads.LimitedTemporaryFileUploadHandler()
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', None)
+        handler.receive_data_chunk(b'x' * 60 * 1024, 0)
+
+        with self.assertRaises(uploads.UploadTooLarge):
+            handler.receive_data_chunk(b'x' * 8 * 1024, 60 * 1024)
+        self.assertTrue(handler.file.closed)
+
+    def test_decompression_bomb_rejected(self):
+        """Test images with huge dimensions are rejected undecoded."""
+        with patch.object(ImageFile.ImageFile, 'load') as load:
+            resp = self._upload(png_claiming_size(60000, 60000), 'bomb.png')
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', resp.data)
+        load.assert_not_called()
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=10_000)
+    def test_dimensions_over_limit_rejected(self):
+        """Test images over the configured pixel count are rejected."""
+        resp = self._upload(png_claiming_size(200, 200), 'large.png')
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unsupported_format_rejected(self):
+        """Test formats outside RECIPE_IMAGE_FORMATS are rejected."""
+        buffer = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(buffer, format='GIF')
+
+        resp = self._upload(buffer.getvalue(), 'photo.gif')
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
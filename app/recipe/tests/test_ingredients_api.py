@@ -13,6 +13,7 @@ from recipe.serializers import IngredientSerializer
 
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
+AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
 
 
 def detail_url(ingredeient_id):
@@ -62,7 +63,7 @@ class PrivateIngredientTests(TestCase):
         ingredeints = Ingredient.objects.all().order_by('-name')
         serializer = IngredientSerializer(ingredeints, many=True)
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
-        self.assertEqual(resp.data, serializer.data)
+        self.assertEqual(resp.data['results'], serializer.data)
 
     def test_ingredients_limited_to_user(self):
         """Test list of ingredients is limited to authenticated user."""
@@ -73,9 +74,9 @@ class PrivateIngredientTests(TestCase):
         resp = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(resp.data), 1)
-        self.assertEqual(resp.data[0]['id'], ingredient.id)
-        self.assertEqual(resp.data[0]['name'], ingredient.name)
+        self.assertEqual(len(resp.data['results']), 1)
+        self.assertEqual(resp.data['results'][0]['id'], ingredient.id)
+        self.assertEqual(resp.data['results'][0]['name'], ingredient.name)
 
     def test_update_ingredeient(self):
         """Test updating an ingredient."""
@@ -99,3 +100,17 @@ class PrivateIngredientTests(TestCase):
         self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
         ingredeints = Ingredient.objects.filter(user=self.user)
         self.assertFalse(ingredeints.exists())
+
+    def test_autocomplete_ingredients(self):
+        """Test ingredient suggestions match prefixes and misspellings."""
+        for name in ['Cinnamon', 'Cilantro', 'Salt']:
+            Ingredient.objects.create(user=self.user, name=name)
+
+        resp = self.client.get(AUTOCOMPLETE_URL, {'q': 'cin'})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data[0]['name'], 'Cinnamon')
+
+        resp = self.client.get(AUTOCOMPLETE_URL, {'q': 'cilantor'})
+
+        self.assertEqual(resp.data[0]['name'], 'Cilantro')
@@ -1,19 +1,34 @@
 """Tests for recipes API."""
+import base64
 from decimal import Decimal
 import tempfile
 import os
+from unittest.mock import patch
 
 
 from PIL import Image
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Prefetch
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 
 
 from core.models import Recipe, Tag, Ingredient
-from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.cache import get_data_version
+from recipe.pagination import RecipeCursorPagination
+from recipe.serializers import (
+    RecipeSerializer,
+    RecipeDetailSerializer,
+    RecipeRowSerializer,
+    RecipeDetailRowSerializer,
+)
 
 
 RECIPES_URL = reverse('recipe:recipe-list')
@@ -45,6 +60,11 @@ def create_recipe(user, **kwargs):
     return recipe
 
 
+def through_table(field):
+    """Return the quoted M2M through table name for a related field."""
+    return connection.ops.quote_name(field.through._meta.db_table)
+
+
 def create_user(**kwargs):
     """"Create and return a new user."""
     return get_user_model().objects.create_user(**kwargs)
@@ -88,7 +108,7 @@ class PrivateRcipeAPITests(TestCase):
         recipes = Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
 
-        self.assertEqual(resp.data, serializer.data)
+        self.assertEqual(resp.data['results'], serializer.data)
 
     def test_recipe_list_limited_to_user(self):
         """Test list of recipes is limited to authenticated user."""
@@ -104,7 +124,7 @@ class PrivateRcipeAPITests(TestCase):
 
         recipes = Recipe.objects.filter(user=self.user)
         serializer = RecipeSerializer(recipes, many=True)
-        self.assertEqual(resp.data, serializer.data)
+        self.assertEqual(resp.data['results'], serializer.data)
 
     def test_get_recipe_url(self):
         """Test get recipe detail."""
@@ -404,6 +424,72 @@ class PrivateRcipeAPITests(TestCase):
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.ingredients.count(), 0)
 
+    def test_create_recipe_links_in_constant_queries(self):
+        """Test linking tags and ingredients does not query per item."""
+        counts = []
+        for size in [1, 30]:
+            payload = {
+                'title': f'Recipe {size}',
+                'time_minutes': 10,
+                'price': Decimal('1.00'),
+                'tags': [{'name': f'Tag {i}'} for i in range(size)],
+                'ingredients': [
+                    {'name': f'Ingredient {i}'} for i in range(size)
+                ],
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.post(RECIPES_URL, payload, format='json')
+
+            self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+            recipe = Recipe.objects.get(id=resp.data['id'])
+            self.assertEqual(recipe.tags.count(), size)
+            self.assertEqual(recipe.ingredients.count(), size)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_update_recipe_tags_only_changes_diff(self):
+        """Test updating tags keeps links that did not change."""
+        tag_keep = Tag.objects.create(user=self.user, name='Keep')
+        tag_drop = Tag.objects.create(user=self.user, name='Drop')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag_keep, tag_drop)
+        through = Recipe.tags.through
+        kept_link = through.objects.get(recipe=recipe, tag=tag_keep)
+
+        payload = {'tags': [{'name': 'Keep'}, {'name': 'New'}]}
+        url = detail_url(recipe.id)
+        resp = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)),
+            {'Keep', 'New'},
+        )
+        self.assertTrue(through.objects.filter(id=kept_link.id).exists())
+        self.assertFalse(
+            through.objects.filter(recipe=recipe, tag=tag_drop).exists()
+        )
+
+    def test_update_recipe_unchanged_tags_skips_writes(self):
+        """Test resending the same tags does not write link rows."""
+        tag = Tag.objects.create(user=self.user, name='Same')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+
+        payload = {'tags': [{'name': 'Same'}]}
+        url = detail_url(recipe.id)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        link_writes = [
+            query['sql'] for query in ctx.captured_queries
+            if through_table(Recipe.tags) in query['sql']
+            and not query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(link_writes, [])
+
 
 class ImageUploadTests(TestCase):
     """Tests for the image upload API."""
@@ -416,10 +502,19 @@ class ImageUploadTests(TestCase):
         )
         self.client.force_authenticate(self.user)
         self.recipe = create_recipe(self.user)
+        self.media = tempfile.TemporaryDirectory()
+        self.private = tempfile.TemporaryDirectory()
+        settings = self.settings(
+            MEDIA_ROOT=self.media.name,
+            PRIVATE_MEDIA_ROOT=self.private.name,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
         return super().setUp()
 
     def tearDown(self) -> None:
-        self.recipe.image.delete()
+        self.media.cleanup()
+        self.private.cleanup()
         return super().tearDown()
 
     def test_upload_image(self):
@@ -447,3 +542,402 @@ class ImageUploadTests(TestCase):
         resp = self.client.post(url, payload, format='multipart')
 
         self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipePaginationTests(TestCase):
+    """Test cursor pagination of the recipe list."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com', password='testpass123', is_active=True
+        )
+        self.client.force_authenticate(self.user)
+        return super().setUp()
+
+    def test_page_size_param(self):
+        """Test clients can choose the page size."""
+        for i in range(5):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+
+        resp = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.data['results']), 2)
+        self.assertIsNotNone(resp.data['next'])
+        self.assertIsNone(resp.data['previous'])
+
+    def test_page_size_capped(self):
+        """Test the page size is limited by the server maximum."""
+        for i in range(3):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+
+        with patch.object(RecipeCursorPagination, 'max_page_size', 2):
+            resp = self.client.get(RECIPES_URL, {'page_size': 100})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.data['results']), 2)
+
+    def test_follow_cursor_returns_all_recipes(self):
+        """Test following next links walks every recipe once in order."""
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(7)
+        ]
+
+        seen = []
+        url = RECIPES_URL + '?page_size=3'
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            seen.extend(item['id'] for item in resp.data['results'])
+            url = resp.data['next']
+
+        expected = [recipe.id for recipe in reversed(recipes)]
+        self.assertEqual(seen, expected)
+
+    def test_tampered_cursor_not_found(self):
+        """Test a cursor with a non-integer position is a 404."""
+        create_recipe(user=self.user)
+        cursor = base64.b64encode(b'p=abc').decode()
+
+        resp = self.client.get(RECIPES_URL, {'cursor': cursor})
+
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_later_page_query_count(self):
+        """Test fetching a later page costs the same as the first."""
+        for i in range(6):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {i}')
+            )
+
+        resp = self.client.get(RECIPES_URL, {'page_size': 2})
+        next_url = resp.data['next']
+
+        with self.assertNumQueries(3):
+            resp = self.client.get(next_url)
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.data['results']), 2)
+
+
+class RecipeRowSerializerTests(TestCase):
+    """Test the fast read path matches the model serializers exactly."""
+
+    def setUp(self):
+        self.user = create_user(
+            email='user@example.com', password='testpass123', is_active=True
+        )
+        request = APIRequestFactory().get(RECIPES_URL)
+        self.context = {'request': Request(request)}
+        for i in range(4):
+            recipe = create_recipe(
+                user=self.user,
+                title=f'Recipe {i}',
+                price=Decimal(f'{i}.5'),
+                link='' if i % 2 else f'https://example.com/{i}',
+            )
+            tags = [
+                Tag.objects.get_or_create(user=self.user, name=name)[0]
+                for name in [f'Tag {i}', 'Shared', f'Zed {i}']
+            ]
+            recipe.tags.add(*reversed(tags))
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'Ing {i}')
+            )
+        Recipe.objects.filter(title='Recipe 1').update(
+            image='uploads/recipe/some image.jpg',
+        )
+        return super().setUp()
+
+    def _instances(self):
+        return Recipe.objects.filter(user=self.user).order_by(
+            '-id'
+        ).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.order_by('id'),
+            ),
+        )
+
+    def _rows(self, serializer_class):
+        return Recipe.objects.filter(user=self.user).order_by(
+            '-id'
+        ).values(*serializer_class.value_fields())
+
+    def test_list_output_identical(self):
+        """Test list rendering is byte-for-byte the same."""
+        expected = RecipeSerializer(
+            self._instances(), many=True, context=self.context,
+        ).data
+        fast = RecipeRowSerializer(
+            self._rows(RecipeRowSerializer), many=True, context=self.context,
+        ).data
+
+        self.assertEqual(
+            JSONRenderer().render(fast),
+            JSONRenderer().render(expected),
+        )
+
+    def test_detail_output_identical(self):
+        """Test detail rendering, including image URLs, is the same."""
+        for instance, row in zip(
+            self._instances(),
+            self._rows(RecipeDetailRowSerializer),
+        ):
+            expected = RecipeDetailSerializer(
+                instance, context=self.context,
+            ).data
+            fast = RecipeDetailRowSerializer(row, context=self.context).data
+
+            self.assertEqual(
+                JSONRenderer().render(fast),
+                JSONRenderer().render(expected),
+            )
+
+    def test_list_endpoint_uses_fast_path(self):
+        """Test the list endpoint output matches the model serializer."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        resp = client.get(RECIPES_URL)
+
+        expected = RecipeSerializer(
+            self._instances(), many=True, context=self.context,
+        ).data
+        self.assertEqual(
+            JSONRenderer().render(resp.data['results']),
+            JSONRenderer().render(expected),
+        )
+
+
+@override_settings(RECIPE_RESPONSE_CACHE=None)
+class RecipeQueryCountTests(TestCase):
+    """Test the recipe endpoints run in a constant number of queries."""
+
+    # (number of recipes, tags and ingredients per recipe)
+    SIZES = [(1, 1), (10, 3), (30, 10)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com', password='testpass123', is_active=True
+        )
+        self.client.force_authenticate(self.user)
+        return super().setUp()
+
+    def _clear(self):
+        """Remove recipes, tags and ingredients from previous rounds."""
+        Recipe.objects.all().delete()
+        Tag.objects.all().delete()
+        Ingredient.objects.all().delete()
+
+    def _seed(self, count, fan_out):
+        """Create recipes with tags and ingredients and return the last."""
+        recipe = None
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            for j in range(fan_out):
+                tag = Tag.objects.create(user=self.user, name=f'Tag {i}-{j}')
+                ingredient = Ingredient.objects.create(
+                    user=self.user,
+                    name=f'Ingredient {i}-{j}',
+                )
+                recipe.tags.add(tag)
+                recipe.ingredients.add(ingredient)
+        return recipe
+
+    def test_list_query_count_is_constant(self):
+        """Test listing recipes does not issue per-recipe queries."""
+        for size, fan_out in self.SIZES:
+            self._clear()
+            self._seed(size, fan_out)
+
+            # recipes, tags and ingredients
+            with self.assertNumQueries(3):
+                resp = self.client.get(RECIPES_URL)
+
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            results = resp.data['results']
+            self.assertEqual(len(results), size)
+            self.assertEqual(len(results[0]['tags']), fan_out)
+            self.assertEqual(len(results[0]['ingredients']), fan_out)
+
+    def test_detail_query_count_is_constant(self):
+        """Test retrieving a recipe does not issue per-relation queries."""
+        for size, fan_out in self.SIZES:
+            self._clear()
+            recipe = self._seed(size, fan_out)
+
+            with self.assertNumQueries(3):
+                resp = self.client.get(detail_url(recipe.id))
+
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(resp.data['tags']), fan_out)
+            self.assertEqual(len(resp.data['ingredients']), fan_out)
+
+
+class ResponseCacheTests(TestCase):
+    """Test list responses are cached per user and data version."""
+
+    BACKENDS = {
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'recipe-response-tests',
+        },
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': None,
+        },
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com', password='testpass123', is_active=True
+        )
+        self.client.force_authenticate(self.user)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        return super().setUp()
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+        return super().tearDown()
+
+    def _caches(self, backend):
+        """Return CACHES settings using the given backend as default."""
+        config = dict(self.BACKENDS[backend])
+        if config['LOCATION'] is None:
+            config['LOCATION'] = self.cache_dir.name
+        return {'default': config}
+
+    def _use_backend(self, backend):
+        """Switch the default cache to backend and empty it."""
+        settings = self.settings(CACHES=self._caches(backend))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        caches['default'].clear()
+
+    def test_list_served_from_cache(self):
+        """Test a repeated list request does not hit the database."""
+        create_recipe(user=self.user)
+
+        for backend in self.BACKENDS:
+            self._use_backend(backend)
+
+            first = self.client.get(RECIPES_URL)
+
+            with self.assertNumQueries(0):
+                second = self.client.get(RECIPES_URL)
+
+            self.assertEqual(second.status_code, status.HTTP_200_OK)
+            self.assertEqual(second.data, first.data)
+
+    def test_cache_is_per_user(self):
+        """Test cached responses are not shared between users."""
+        other_user = create_user(
+            email='other@example.com', password='testpass123', is_active=True
+        )
+        create_recipe(user=other_user, title='Other recipe')
+
+        for backend in self.BACKENDS:
+            self._use_backend(backend)
+
+            self.client.get(RECIPES_URL)
+            self.client.force_authenticate(other_user)
+
+            resp = self.client.get(RECIPES_URL)
+
+            self.assertEqual(len(resp.data['results']), 1)
+            self.assertEqual(resp.data['results'][0]['title'], 'Other recipe')
+            self.client.force_authenticate(self.user)
+
+    def test_writes_invalidate_cache(self):
+        """Test creating, updating and deleting bump the data version."""
+        for backend in self.BACKENDS:
+            self._use_backend(backend)
+
+            Recipe.objects.all().delete()
+            self.client.get(RECIPES_URL)
+
+            payload = {
+                'title': 'Cached recipe',
+                'time_minutes': 5,
+                'price': Decimal('1.00'),
+                'tags': [{'name': 'Quick'}],
+            }
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = self.client.post(RECIPES_URL, payload, format='json')
+            recipe_id = resp.data['id']
+
+            resp = self.client.get(RECIPES_URL)
+            self.assertEqual(len(resp.data['results']), 1)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(detail_url(recipe_id), {'title': 'New'})
+
+            resp = self.client.get(RECIPES_URL)
+            self.assertEqual(resp.data['results'][0]['title'], 'New')
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(detail_url(recipe_id))
+
+            resp = self.client.get(RECIPES_URL)
+            self.assertEqual(resp.data['results'], [])
+
+    def test_tag_update_invalidates_recipe_list(self):
+        """Test renaming a tag refreshes cached recipes that use it."""
+        tag = Tag.objects.create(user=self.user, name='Old')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+        url = reverse('recipe:tag-detail', args=[tag.id])
+
+        for backend in self.BACKENDS:
+            self._use_backend(backend)
+
+            tag.name = 'Old'
+            tag.save()
+            self.client.get(RECIPES_URL)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(url, {'name': 'New'})
+
+            resp = self.client.get(RECIPES_URL)
+            tags = resp.data['results'][0]['tags']
+            self.assertEqual(tags[0]['name'], 'New')
+
+    def test_image_upload_invalidates_cache(self):
+        """Test uploading an image bumps the data version."""
+        recipe = create_recipe(user=self.user)
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        private = tempfile.TemporaryDirectory()
+        self.addCleanup(private.cleanup)
+        settings = self.settings(
+            MEDIA_ROOT=media.name,
+            PRIVATE_MEDIA_ROOT=private.name,
+            RECIPE_IMAGE_WORKERS=0,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        for backend in self.BACKENDS:
+            self._use_backend(backend)
+
+            self.client.get(RECIPES_URL)
+            version = get_data_version(self.user.pk)
+
+            with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+                Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+                image_file.seek(0)
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.post(
+                        image_upload_url(recipe.id),
+                        {'image': image_file},
+                        format='multipart',
+                    )
+
+            self.assertNotEqual(get_data_version(self.user.pk), version)
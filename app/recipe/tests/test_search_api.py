@@ -0,0 +1,160 @@
+"""
+Tests for the recipe full-text search API.
+"""
+import base64
+from decimal import Decimal
+
+
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+from core.models import Recipe, Tag
+
+
+SEARCH_URL = reverse('recipe:recipe-search')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def tag_detail_url(tag_id):
+    """Create and return a tag detail URL."""
+    return reverse('recipe:tag-detail', args=[tag_id])
+
+
+class RecipeSearchApiTests(TestCase):
+    """Test searching recipes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123', is_active=True
+        )
+        self.client.force_authenticate(self.user)
+        return super().setUp()
+
+    def _create(self, **payload):
+        """Create a recipe through the API so it is indexed."""
+        defaults = {'time_minutes': 10, 'price': Decimal('1.00')}
+        defaults.update(payload)
+        resp = self.client.post(RECIPES_URL, defaults, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        return resp.data['id']
+
+    def _search(self, **params):
+        resp = self.client.get(SEARCH_URL, params)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in resp.data['results']]
+
+    def test_search_ranks_title_above_description(self):
+        """Test title matches rank above description matches."""
+        self._create(title='Weeknight dinner', description='Uses curry')
+        self._create(title='Green curry', description='Spicy')
+        self._create(title='Pancakes', description='Sweet')
+
+        self.assertEqual(
+            self._search(q='curry'),
+            ['Green curry', 'Weeknight dinner'],
+        )
+
+    def test_search_matches_tags_and_ingredients(self):
+        """Test tag and ingredient names are searchable."""
+        self._create(title='Soup', tags=[{'name': 'Vegan'}])
+        self._create(title='Salad', ingredients=[{'name': 'Cucumbers'}])
+
+        self.assertEqual(self._search(q='vegan'), ['Soup'])
+        self.assertEqual(self._search(q='cucumber'), ['Salad'])
+
+    def test_search_follows_tag_rename(self):
+        """Test renaming a tag updates the recipes that use it."""
+        self._create(title='Soup', tags=[{'name': 'Winter'}])
+        tag = Tag.objects.get(user=self.user, name='Winter')
+
+        self.client.patch(tag_detail_url(tag.id), {'name': 'Autumn'})
+
+        self.assertEqual(self._search(q='winter'), [])
+        self.assertEqual(self._search(q='autumn'), ['Soup'])
+
+    def test_search_follows_tag_delete(self):
+        """Test deleting a tag removes it from the search index."""
+        self._create(title='Soup', tags=[{'name': 'Winter'}])
+        tag = Tag.objects.get(user=self.user, name='Winter')
+
+        self.client.delete(tag_detail_url(tag.id))
+
+        self.assertEqual(self._search(q='winter'), [])
+
+    def test_search_limited_to_user(self):
+        """Test other users' recipes are not returned."""
+        other_user = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123'
+        )
+        recipe = Recipe.objects.create(
+            user=other_user, title='Curry', time_minutes=5, price='1.00',
+        )
+        Recipe.objects.filter(id=recipe.id).update_search_vector()
+
+        self.assertEqual(self._search(q='curry'), [])
+
+    def test_search_paginates(self):
+        """Test search results are paginated with a cursor."""
+        for i in range(5):
+            self._create(title=f'Curry {i}')
+
+        resp = self.client.get(SEARCH_URL, {'q': 'curry', 'page_size': 3})
+        titles = [recipe['title'] for recipe in resp.data['results']]
+        resp = self.client.get(resp.data['next'])
+        titles += [recipe['title'] for recipe in resp.data['results']]
+
+        self.assertEqual(len(titles), 5)
+        self.assertEqual(len(set(titles)), 5)
+        self.assertIsNone(resp.data['next'])
+
+    def test_search_pages_cover_every_match_once(self):
+        """Test following next visits each match once, ranks distinct."""
+        ids = [
+            self._create(
+                title=f'Recipe {n}',
+                description=' '.join(['curry'] * n + ['rice'] * (12 - n)),
+            )
+            for n in range(1, 13)
+        ]
+        ranks = Recipe.objects.filter(id__in=ids).annotate(
+            rank=SearchRank(F('search_vector'), SearchQuery('curry')),
+        ).values_list('rank', flat=True)
+        self.assertEqual(len(set(ranks)), len(ids))
+
+        for page_size in (1, 5):
+            with self.subTest(page_size=page_size):
+                seen = []
+                resp = self.client.get(
+                    SEARCH_URL, {'q': 'curry', 'page_size': page_size},
+                )
+                while True:
+                    seen.extend(
+                        recipe['id'] for recipe in resp.data['results']
+                    )
+                    if not resp.data['next'] or len(seen) > len(ids):
+                        break
+                    resp = self.client.get(resp.data['next'])
+
+                self.assertCountEqual(seen, ids)
+
+    def test_search_tampered_cursor_not_found(self):
+        """Test a cursor whose rank is not a number is a 404."""
+        self._create(title='Curry')
+        cursor = base64.b64encode(b'p=abc').decode()
+
+        resp = self.client.get(SEARCH_URL, {'q': 'curry', 'cursor': cursor})
+
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_requires_query(self):
+        """Test a search term is required."""
+        resp = self.client.get(SEARCH_URL)
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
@@ -2,8 +2,9 @@
 Tests for the tags API.
 """
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 
 from rest_framework import status
@@ -15,6 +16,7 @@ from recipe.serializers import TagSerializer
 
 
 TAGS_URL = reverse('recipe:tag-list')
+AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
 
 
 def detail_url(tag_id):
@@ -63,7 +65,7 @@ class PrivateTagsApiTest(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
-        self.assertEqual(resp.data, serializer.data)
+        self.assertEqual(resp.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """Test list of tags is limited to authenticated user."""
@@ -74,9 +76,9 @@ class PrivateTagsApiTest(TestCase):
         resp = self.client.get(TAGS_URL)
 
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
-        self.assertEqual(resp.data.__len__(), 1)
-        self.assertEqual(resp.data[0]['name'], tag.name)
-        self.assertEqual(resp.data[0]['id'], tag.id)
+        self.assertEqual(resp.data['results'].__len__(), 1)
+        self.assertEqual(resp.data['results'][0]['name'], tag.name)
+        self.assertEqual(resp.data['results'][0]['id'], tag.id)
 
     def test_update_tag(self):
         """Test updating a tag."""
@@ -100,3 +102,121 @@ class PrivateTagsApiTest(TestCase):
         self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
         tags = Tag.objects.filter(user=self.user)
         self.assertFalse(tags.exists())
+
+    def test_tags_cursor_pagination(self):
+        """Test tags are paginated by name with a client page size."""
+        for name in ['Alpha', 'Beta', 'Gamma']:
+            Tag.objects.create(user=self.user, name=name)
+
+        resp = self.client.get(TAGS_URL, {'page_size': 2})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        names = [tag['name'] for tag in resp.data['results']]
+        self.assertEqual(names, ['Gamma', 'Beta'])
+
+        resp = self.client.get(resp.data['next'])
+
+        names = [tag['name'] for tag in resp.data['results']]
+        self.assertEqual(names, ['Alpha'])
+        self.assertIsNone(resp.data['next'])
+
+    def test_update_tag_duplicate_name(self):
+        """Test renaming a tag to an existing name returns an error."""
+        Tag.objects.create(user=self.user, name='Lunch')
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+
+        payload = {'name': 'Lunch'}
+        url = detail_url(tag.id)
+        resp = self.client.patch(url, payload)
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Dinner')
+
+
+@override_settings(
+    RECIPE_RESPONSE_CACHE='default',
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'tag-autocomplete-tests',
+        },
+    },
+)
+class TagAutocompleteTests(TestCase):
+    """Test the tag autocomplete endpoint."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for name in ['Tomato', 'Tomatillo', 'Potato', 'Dessert']:
+            Tag.objects.create(user=self.user, name=name)
+        caches['default'].clear()
+
+    def test_autocomplete_prefix_first(self):
+        """Test prefix matches rank ahead of other names."""
+        resp = self.client.get(AUTOCOMPLETE_URL, {'q': 'tom'})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        names = [tag['name'] for tag in resp.data]
+        self.assertEqual(names, ['Tomato', 'Tomatillo'])
+
+    def test_autocomplete_fuzzy(self):
+        """Test misspelled names are matched by similarity."""
+        resp = self.client.get(AUTOCOMPLETE_URL, {'q': 'Desert'})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data[0]['name'], 'Dessert')
+
+    def test_autocomplete_limit(self):
+        """Test the number of suggestions is capped by limit."""
+        resp = self.client.get(AUTOCOMPLETE_URL, {'q': 'tom', 'limit': 1})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.data), 1)
+
+        resp = self.client.get(AUTOCOMPLETE_URL, {'q': 'tom', 'limit': 0})
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_autocomplete_requires_query(self):
+        """Test an empty query is rejected."""
+        resp = self.client.get(AUTOCOMPLETE_URL)
+
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_autocomplete_escapes_wildcards(self):
+        """Test LIKE wildcards in the query are matched literally."""
+        Tag.objects.create(user=self.user, name='100% Rye')
+
+        resp = self.client.get(AUTOCOMPLETE_URL, {'q': '%'})
+
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data, [])
+
+    def test_autocomplete_limited_to_user(self):
+        """Test suggestions only include the user's tags."""
+        other = create_user(email='other@example.com')
+        Tag.objects.create(user=other, name='Tomahawk')
+
+        resp = self.client.get(AUTOCOMPLETE_URL, {'q': 'tom'})
+
+        names = [tag['name'] for tag in resp.data]
+        self.assertNotIn('Tomahawk', names)
+
+    def test_autocomplete_cached_until_write(self):
+        """Test repeated queries hit the cache until the user writes."""
+        self.client.get(AUTOCOMPLETE_URL, {'q': 'tom'})
+
+        with self.assertNumQueries(0):
+            resp = self.client.get(AUTOCOMPLETE_URL, {'q': 'tom'})
+        self.assertEqual(len(resp.data), 2)
+
+        tag = Tag.objects.get(user=self.user, name='Potato')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(detail_url(tag.id), {'name': 'Tomcat'})
+
+        resp = self.client.get(AUTOCOMPLETE_URL, {'q': 'tom'})
+        names = [tag['name'] for tag in resp.data]
+        self.assertIn('Tomcat', names)
@@ -0,0 +1,99 @@
+"""
+Memory-bounded handling of recipe image uploads.
+
+Uploads are streamed to a temporary file and aborted as soon as they pass
+RECIPE_IMAGE_MAX_UPLOAD_SIZE. They are then validated from the image
+header alone: Pillow's open() is lazy and only reads the format and
+dimensions, so oversized images and decompression bombs are rejected
+before any pixel data is decoded.
+"""
+import warnings
+
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.utils.translation import gettext_lazy as _
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+DEFAULT_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+DEFAULT_MAX_PIXELS = 40_000_000
+DEFAULT_FORMATS = ['JPEG', 'PNG', 'WEBP']
+
+# Room for multipart boundaries and part headers around the file itself.
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('Upload exceeds the maximum allowed size.')
+    default_code = 'upload_too_large'
+
+
+class InvalidImage(ValueError):
+    """The upload is not an image this API accepts."""
+
+
+def max_upload_size():
+    return getattr(
+        settings, 'RECIPE_IMAGE_MAX_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE,
+    )
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Stream uploads to disk, aborting once they exceed max_size."""
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or max_upload_size()
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        # Refuse bodies that cannot fit before reading any of them.
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            raise UploadTooLarge()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            self.file.close()
+            raise UploadTooLarge()
+        return super().receive_data_chunk(raw_data, start)
+
+
+def check_dimensions(image):
+    """Reject images whose pixel count could exhaust memory on decode."""
+    width, height = image.size
+    max_pixels = getattr(
+        settings, 'RECIPE_IMAGE_MAX_PIXELS', DEFAULT_MAX_PIXELS,
+    )
+    if width * height > max_pixels:
+        raise InvalidImage(
+            _('Image dimensions exceed %(max)d pixels.') % {'max': max_pixels}
+        )
+
+
+def inspect_image(upload):
+    """Validate an uploaded file from its header, returning its format."""
+    source = (
+        upload.temporary_file_path()
+        if hasattr(upload, 'temporary_file_path') else upload
+    )
+    formats = getattr(settings, 'RECIPE_IMAGE_FORMATS', DEFAULT_FORMATS)
+    try:
+        with warnings.catch_warnings():
+            # Our own pixel limit applies; Pillow's is only a warning below
+            # twice its limit.
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            with Image.open(source, formats=formats) as image:
+                check_dimensions(image)
+                return image.format
+    except (Image.UnidentifiedImageError, Image.DecompressionBombError):
+        raise InvalidImage(
+            _('Upload a valid image. Supported formats: %(formats)s.')
+            % {'formats': ', '.join(formats)}
+        )
+    finally:
+        if hasattr(upload, 'seek'):
+            upload.seek(0)
@@ -1,10 +1,13 @@
 """
 URL mappings for the recipe app.
 """
+from django.conf import settings
 from django.urls import path, include
+from django.urls.resolvers import URLPattern
 from rest_framework.routers import DefaultRouter
 
 
+from core.offload import offload_safe_methods
 from recipe import views
 
 
@@ -14,9 +17,25 @@ router.register('tags', views.TagViewSet)
 router.register('ingredient', views.IngredeientViewSet)
 
 
+def async_reads(patterns):
+    """Return patterns whose views serve safe methods from the DB pool."""
+    return [
+        URLPattern(
+            pattern.pattern,
+            offload_safe_methods(pattern.callback),
+            pattern.default_args,
+            pattern.name,
+        )
+        for pattern in patterns
+    ]
+
+
 app_name = 'recipe'
 
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(
+        async_reads(router.urls) if settings.ASYNC_READ_VIEWS
+        else router.urls
+    )),
 ]
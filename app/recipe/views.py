@@ -1,32 +1,137 @@
 """
 Views for the Recipe API.
 """
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db.models import (
+    BooleanField,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Prefetch,
+    Q,
+)
+from django.db.models.functions import Cast
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext as _
+from drf_spectacular.utils import (
+    OpenApiParameter,
+    extend_schema,
+    extend_schema_view,
+)
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 
-from core.models import Recipe, Tag, Ingredient
-from recipe import serializers
+from core.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
+from core.models import Recipe, Tag, Ingredient, SEARCH_CONFIG
+from core.routers import ReplicaReadMixin
+from recipe import cache, export, images, serializers, uploads
+from recipe.bulk import RecipeBulkOperation
+from recipe.filters import RecipeRelationFilter
+from recipe.pagination import (
+    RecipeCursorPagination,
+    RecipeAttrCursorPagination,
+    RecipeSearchCursorPagination,
+)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class VersionedCacheMixin:
+    """Cache list responses per user and invalidate them on writes."""
+
+    def list(self, request, *args, **kwargs):
+        """List objects, serving from the response cache when possible."""
+        response_cache = cache.get_cache()
+        if response_cache is None:
+            return super().list(request, *args, **kwargs)
+
+        key = cache.response_cache_key(request)
+        data = response_cache.get(key)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            response_cache.set(
+                key,
+                response.data,
+                getattr(settings, 'RECIPE_RESPONSE_CACHE_TTL', 300),
+            )
+            return response
+
+        return Response(data)
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        cache.schedule_version_bump(self.request.user.pk)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        cache.schedule_version_bump(self.request.user.pk)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        cache.schedule_version_bump(self.request.user.pk)
+
+
+@extend_schema_view(
+    list=extend_schema(responses=serializers.RecipeSerializer(many=True)),
+    retrieve=extend_schema(responses=serializers.RecipeDetailSerializer),
+)
+class RecipeViewSet(ReplicaReadMixin,
+                    VersionedCacheMixin,
+                    viewsets.ModelViewSet):
     """View for manage recipe APIs."""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
+    filter_backends = [RecipeRelationFilter]
+
+    @property
+    def throttle_scope(self):
+        """Throttle writes, which cost the most database time."""
+        if self.request.method in SAFE_METHODS:
+            return None
+        return 'recipe-write'
 
     def get_queryset(self):
         """Retrieve recipes for authenticated user."""
-        return self.queryset.filter(user=self.request.user).order_by('-id')
+        queryset = self.queryset.filter(
+            user=self.request.user
+        ).order_by('-id')
+
+        if self.action in ('list', 'retrieve'):
+            return queryset.values(
+                *self.get_serializer_class().value_fields()
+            )
+
+        return queryset.prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.order_by('id'),
+            ),
+        )
 
     def get_serializer_class(self):
         """Return the serializer class for the request."""
         if self.action == 'list':
-            return serializers.RecipeSerializer
+            return serializers.RecipeRowSerializer
+        elif self.action == 'retrieve':
+            return serializers.RecipeDetailRowSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
 
@@ -36,38 +141,217 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create a new recipe."""
         serializer.save(user=self.request.user)
 
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Create, update and delete many recipes in one transaction."""
+        with transaction.atomic():
+            operation = RecipeBulkOperation(
+                request.data,
+                context=self.get_serializer_context(),
+            )
+            if not operation.is_valid():
+                return Response(
+                    operation.errors,
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            results = operation.save()
+
+        return Response(results, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[OpenApiParameter('q', str, required=True)],
+        responses=serializers.RecipeSerializer(many=True),
+    )
+    @action(methods=['GET'], detail=False, url_path='search')
+    def search(self, request):
+        """Full-text search over the user's recipes, best match first."""
+        terms = request.query_params.get('q', '').strip()
+        if not terms:
+            raise ValidationError({'q': [_('This field is required.')]})
+
+        query = SearchQuery(
+            terms,
+            config=SEARCH_CONFIG,
+            search_type='websearch',
+        )
+        queryset = self.filter_queryset(
+            self.queryset.filter(user=request.user, search_vector=query)
+        ).annotate(
+            # ts_rank is a float4, which does not round-trip through the
+            # cursor; the float8 value does, so pages never repeat a match.
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField()),
+        ).values(*serializers.RecipeRowSerializer.value_fields(), 'rank')
+
+        paginator = RecipeSearchCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = serializers.RecipeRowSerializer(
+            page,
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream all of the user's recipes as NDJSON or CSV."""
+        export_type = request.query_params.get('type', 'ndjson')
+        if export_type not in export.EXPORTERS:
+            msg = _('Unsupported export type.')
+            raise ValidationError({'type': [msg]})
+
+        queryset = self.filter_queryset(
+            self.queryset.filter(user=request.user).order_by('-id')
+        )
+        rows = export.EXPORTERS[export_type](
+            queryset,
+            self.get_serializer_context(),
+        )
+        response = StreamingHttpResponse(
+            rows,
+            content_type=export.CONTENT_TYPES[export_type],
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{export_type}"'
+        return response
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """Upload an image to recipe."""
+        # Must be set before request.data is first read.
+        request.upload_handlers = [
+            uploads.LimitedTemporaryFileUploadHandler(request),
+        ]
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                images.schedule_processing(recipe)
+            cache.schedule_version_bump(request.user.pk)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)    
 
 
-class BaseRecipeAttrClass(mixins.DestroyModelMixin,
+class BaseRecipeAttrClass(ReplicaReadMixin,
+                          VersionedCacheMixin,
+                          mixins.DestroyModelMixin,
                           mixins.UpdateModelMixin,
                           mixins.ListModelMixin,
                           viewsets.GenericViewSet):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeAttrCursorPagination
 
     def get_queryset(self):
         """Filter queryset to authenticated user."""
-        return self.queryset.filter(user=self.request.user).order_by('-name')
+        return self.queryset.filter(
+            user=self.request.user
+        ).order_by('-name', '-id')
+
+    autocomplete_limit = 10
+    max_autocomplete_limit = 50
+
+    def _autocomplete_limit(self, request):
+        """Return the validated number of suggestions to return."""
+        limit = request.query_params.get('limit', self.autocomplete_limit)
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            limit = 0
+        if not 0 < limit <= self.max_autocomplete_limit:
+            msg = _('Ensure this value is between 1 and %(max)d.') % {
+                'max': self.max_autocomplete_limit,
+            }
+            raise ValidationError({'limit': [msg]})
+
+        return limit
+
+    def _suggest(self, user, prefix, limit):
+        """Return the user's best matching names, prefix matches first."""
+        # Both conditions are served by the (user, name) trigram index.
+        matches = Q(name__iprefix=prefix) | Q(name__trigram_similar=prefix)
+        return list(
+            self.queryset.filter(matches, user=user).annotate(
+                is_prefix=ExpressionWrapper(
+                    Q(name__iprefix=prefix),
+                    output_field=BooleanField(),
+                ),
+                similarity=TrigramSimilarity('name', prefix),
+            ).order_by(
+                '-is_prefix', '-similarity', 'name'
+            ).values('id', 'name')[:limit]
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('q', str, required=True),
+            OpenApiParameter('limit', int),
+        ],
+    )
+    @action(methods=['GET'], detail=False, url_path='autocomplete')
+    def autocomplete(self, request):
+        """Suggest names matching a prefix or a misspelling of one."""
+        prefix = request.query_params.get('q', '').strip()
+        if not prefix:
+            raise ValidationError({'q': [_('This field is required.')]})
+        limit = self._autocomplete_limit(request)
+
+        response_cache = cache.get_cache()
+        if response_cache is None:
+            return Response(self._suggest(request.user, prefix, limit))
+
+        # Keystrokes arrive in bursts, so even a short TTL absorbs most
+        # repeats; writes still invalidate through the data version.
+        key = cache.response_cache_key(request)
+        data = response_cache.get(key)
+        if data is None:
+            data = self._suggest(request.user, prefix, limit)
+            response_cache.set(
+                key,
+                data,
+                getattr(settings, 'RECIPE_AUTOCOMPLETE_CACHE_TTL', 30),
+            )
+
+        return Response(data)
+
+    def _recipes(self, instance):
+        """Return the recipes linked to instance."""
+        return Recipe.objects.filter(**{self.recipe_field: instance})
+
+    def perform_update(self, serializer):
+        """Update the object, rejecting names the user already has."""
+        try:
+            with transaction.atomic():
+                super().perform_update(serializer)
+                self._recipes(serializer.instance).update_search_vector()
+        except IntegrityError:
+            msg = _('An item with this name already exists.')
+            raise ValidationError({'name': [msg]})
+
+    def perform_destroy(self, instance):
+        """Delete the object and reindex the recipes that used it."""
+        with transaction.atomic():
+            recipe_ids = list(
+                self._recipes(instance).values_list('id', flat=True)
+            )
+            super().perform_destroy(instance)
+            Recipe.objects.filter(id__in=recipe_ids).update_search_vector()
 
 
 class TagViewSet(BaseRecipeAttrClass):
     """Manage Tags in the database,"""
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
+    recipe_field = 'tags'
 
 
 class IngredeientViewSet(BaseRecipeAttrClass):
     """Manage ingredients in the database."""
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
+    recipe_field = 'ingredients'
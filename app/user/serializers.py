@@ -8,7 +8,11 @@ from django.utils.translation import gettext as _
 from rest_framework import serializers
 
 
-class UserSerializer(serializers.ModelSerializer):
+from core import tokens
+from core.serializers import TimedSerializerMixin
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for the user object."""
 
     class Meta:
@@ -56,3 +60,32 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class SignedTokenSerializer(serializers.Serializer):
+    """Serializer for a signed access or refresh token."""
+    token = serializers.CharField()
+
+
+class RefreshTokenSerializer(SignedTokenSerializer):
+    """Serializer trading a refresh token for a new token pair."""
+
+    def validate(self, attrs):
+        """Spend the refresh token and issue a new pair."""
+        try:
+            attrs['pair'] = tokens.refresh(attrs['token'])
+        except tokens.InvalidToken as exc:
+            raise serializers.ValidationError(str(exc), code='invalid')
+        return attrs
+
+
+class RevokeTokenSerializer(SignedTokenSerializer):
+    """Serializer revoking an access or refresh token."""
+
+    def validate(self, attrs):
+        """Revoke the token."""
+        try:
+            tokens.revoke(attrs['token'])
+        except tokens.InvalidToken as exc:
+            raise serializers.ValidationError(str(exc), code='invalid')
+        return attrs
@@ -1,29 +1,88 @@
 """
 Views for the user API.
 """
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import NotFound
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
 
-from user.serializers import UserSerializer, AuthTokenSerializer
+from core.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
+from core import tokens
+from core.routers import ReplicaReadMixin
+from user.serializers import (
+    AuthTokenSerializer,
+    RefreshTokenSerializer,
+    RevokeTokenSerializer,
+    UserSerializer,
+)
 
 
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system."""
     serializer_class = UserSerializer
+    throttle_scope = 'auth'
 
 
 class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user."""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = 'auth'
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class SignedTokenView(generics.GenericAPIView):
+    """Base view for signed tokens, missing unless they are enabled."""
+
+    def initial(self, request, *args, **kwargs):
+        if not tokens.enabled():
+            raise NotFound()
+        super().initial(request, *args, **kwargs)
+
+
+class CreateSignedTokenView(SignedTokenView):
+    """Create a signed access and refresh token pair for user."""
+    serializer_class = AuthTokenSerializer
+    throttle_scope = 'auth'
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(tokens.issue(serializer.validated_data['user']))
+
+
+class RefreshSignedTokenView(SignedTokenView):
+    """Trade a refresh token for a new signed token pair."""
+    serializer_class = RefreshTokenSerializer
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.validated_data['pair'])
+
+
+class RevokeSignedTokenView(SignedTokenView):
+    """Revoke a signed access or refresh token."""
+    serializer_class = RevokeTokenSerializer
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ManageUserView(ReplicaReadMixin, generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):